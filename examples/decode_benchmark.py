@@ -0,0 +1,66 @@
+"""
+Measure how fast a recorded video stream decodes with different decoder threading
+settings, to pick `decoder_thread_type` and `decoder_thread_count` for a session.
+
+Record a stream by writing the raw frames from `recv_video_data` to a file:
+
+```python
+with open("stream.h265", "wb") as f:
+    for frame_data, frame_info in sess.recv_video_data():
+        f.write(frame_data)
+```
+
+then run `python examples/decode_benchmark.py stream.h265 --codec hevc`.
+"""
+
+import argparse
+import os
+import time
+
+try:
+    import av
+except ImportError:
+    av = None
+
+
+def decode_fps(data, codec_name, thread_type, thread_count):
+    codec = av.CodecContext.create(codec_name, "r")
+    codec.thread_type = thread_type
+    codec.thread_count = thread_count
+
+    frames = 0
+    start = time.perf_counter()
+    for packet in codec.parse(data):
+        frames += len(codec.decode(packet))
+    frames += len(codec.decode(None))
+    return frames, frames / (time.perf_counter() - start)
+
+
+def main():
+    assert av, "missing PyAV, required for this example"
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("path", help="a raw h264 or hevc stream")
+    parser.add_argument("--codec", default="h264", choices=["h264", "hevc"])
+    parser.add_argument(
+        "--thread-types", default="SLICE,FRAME,AUTO", help="comma separated"
+    )
+    parser.add_argument("--max-threads", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    with open(args.path, "rb") as f:
+        data = f.read()
+
+    print(f"{'thread_type':>12} {'threads':>8} {'frames':>8} {'fps':>10}")
+    for thread_type in args.thread_types.split(","):
+        for thread_count in range(1, args.max_threads + 1):
+            frames, fps = decode_fps(
+                data, args.codec, thread_type, thread_count
+            )
+            print(
+                f"{thread_type:>12} {thread_count:>8} {frames:>8} {fps:>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
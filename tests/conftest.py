@@ -1,3 +1,3 @@
 import pytest
 
-from .fixtures import account, camera, iotc, tutk_platform_lib
+from .fixtures import account, camera, h264_frames, iotc, tutk_platform_lib
@@ -40,3 +40,25 @@ def camera():
         nickname="nickname",
         timezone_name="timezone_name",
     )
+
+
+@pytest.fixture
+def h264_frames():
+    """12 frames of 64x48 h264 video, with a keyframe every 5 frames.
+
+    Each item is a tuple of (frame_data, is_keyframe).
+    """
+    av = pytest.importorskip("av")
+    np = pytest.importorskip("numpy")
+    encoder = av.CodecContext.create("libx264", "w")
+    encoder.width, encoder.height, encoder.pix_fmt = 64, 48, "yuv420p"
+    encoder.options = {"g": "5", "tune": "zerolatency"}
+    packets = []
+    for i in range(12):
+        frame = av.VideoFrame.from_ndarray(
+            np.full((48, 64, 3), i * 20, np.uint8), format="rgb24"
+        )
+        frame.pts = i
+        packets.extend(encoder.encode(frame))
+    packets.extend(encoder.encode(None))
+    return [(bytes(packet), packet.is_keyframe) for packet in packets]
@@ -0,0 +1,191 @@
+import asyncio
+import threading
+
+import pytest
+from wyzecam.aio import AsyncWyzeIOTC
+from wyzecam.decode import DecodeMode
+from wyzecam.iotc import WyzeIOTCSessionState
+from wyzecam.tutk import tutk
+from wyzecam.wait_policy import FixedWaitPolicy
+
+
+@pytest.mark.usefixtures("tutk_platform_lib", "account", "camera")
+def test_async_recv_video_data(tutk_platform_lib, account, camera):
+    tutk_platform_lib.IOTC_Connect_ByUID_Parallel.set_retval(None)
+    tutk_platform_lib.queue_frame(b"one")
+    tutk_platform_lib.queue_error(tutk.AV_ER_DATA_NOREADY)
+    tutk_platform_lib.queue_frame(b"two")
+
+    async def stream():
+        frames = []
+        async with AsyncWyzeIOTC(tutk_platform_lib, max_workers=2) as wyze:
+            session = wyze.connect_and_auth(
+                account, camera, wait_policy=FixedWaitPolicy(0.001)
+            )
+            async with session:
+                assert session.state == (
+                    WyzeIOTCSessionState.AUTHENTICATION_SUCCEEDED
+                )
+                with pytest.raises(tutk.TutkError):
+                    async for (
+                        frame_data,
+                        frame_info,
+                    ) in session.recv_video_data():
+                        frames.append(frame_data)
+                assert session.session.wait_policy.wait_count == 1
+        return frames
+
+    assert asyncio.run(stream()) == [b"one", b"two"]
+    assert tutk_platform_lib.session_closed_called
+    assert tutk_platform_lib.deinitialize_called
+
+
+@pytest.mark.usefixtures("tutk_platform_lib", "account", "camera")
+def test_async_recv_video_data_cancelled(tutk_platform_lib, account, camera):
+    tutk_platform_lib.IOTC_Connect_ByUID_Parallel.set_retval(None)
+    tutk_platform_lib.queue_frame(b"one")
+    tutk_platform_lib.queue_frame(b"two")
+    recv_frame_data = tutk_platform_lib.avRecvFrameData2
+    receiving = threading.Event()
+    unblock = threading.Event()
+    lock = threading.Lock()
+    concurrent = [0, 0]  # receives running now, and the most ever at once
+
+    def blocking_recv(*args):
+        with lock:
+            concurrent[0] += 1
+            concurrent[1] = max(concurrent)
+        try:
+            if tutk_platform_lib.frames_sent == 1 and not unblock.is_set():
+                receiving.set()
+                unblock.wait()
+            return recv_frame_data(*args)
+        finally:
+            with lock:
+                concurrent[0] -= 1
+
+    tutk_platform_lib.avRecvFrameData2 = blocking_recv
+
+    async def stream():
+        async with AsyncWyzeIOTC(tutk_platform_lib, max_workers=2) as wyze:
+            async with wyze.connect_and_auth(account, camera) as session:
+                pool = session.session.recv_buffer_pool
+                frames = []
+
+                async def consume():
+                    async for frame_data, _ in session.recv_video_data():
+                        frames.append(frame_data)
+
+                task = asyncio.create_task(consume())
+                while not receiving.is_set():
+                    await asyncio.sleep(0.001)
+                task.cancel()
+                with pytest.raises(asyncio.CancelledError):
+                    await task
+                # the worker thread is still receiving into the buffer
+                assert pool._free.qsize() == pool.allocated - 1
+
+                # the next call finishes the cancelled receive, rather than
+                # starting another one alongside it, and returns its frame
+                tutk_platform_lib.queue_frame(b"three")
+                loop = asyncio.get_running_loop()
+                loop.call_later(0.05, unblock.set)
+                with pytest.raises(tutk.TutkError):
+                    async for frame_data, _ in session.recv_video_data():
+                        frames.append(frame_data)
+                assert pool._free.qsize() == pool.allocated
+        return frames
+
+    assert asyncio.run(stream()) == [b"one", b"two", b"three"]
+    assert concurrent[1] == 1
+
+
+@pytest.mark.usefixtures(
+    "tutk_platform_lib", "account", "camera", "h264_frames"
+)
+def test_async_recv_video_frame(
+    tutk_platform_lib, account, camera, h264_frames
+):
+    tutk_platform_lib.IOTC_Connect_ByUID_Parallel.set_retval(None)
+    for frame_data, is_keyframe in h264_frames:
+        tutk_platform_lib.queue_frame(frame_data, is_keyframe=int(is_keyframe))
+
+    async def stream():
+        frame_nos = []
+        async with AsyncWyzeIOTC(tutk_platform_lib, max_workers=2) as wyze:
+            async with wyze.connect_and_auth(account, camera) as session:
+                session.session.decoder_thread_type = "FRAME"
+                with pytest.raises(tutk.TutkError):
+                    async for frame, frame_info in session.recv_video_frame(
+                        thread_count=4
+                    ):
+                        assert (frame.width, frame.height) == (64, 48)
+                        frame_nos.append(frame_info.frame_no)
+        return frame_nos
+
+    assert asyncio.run(stream()) == list(range(len(h264_frames)))
+
+
+@pytest.mark.usefixtures(
+    "tutk_platform_lib", "account", "camera", "h264_frames"
+)
+def test_async_recv_video_frame_ndarray(
+    tutk_platform_lib, account, camera, h264_frames
+):
+    tutk_platform_lib.IOTC_Connect_ByUID_Parallel.set_retval(None)
+    for frame_data, is_keyframe in h264_frames:
+        tutk_platform_lib.queue_frame(frame_data, is_keyframe=int(is_keyframe))
+
+    async def stream():
+        images = []
+        async with AsyncWyzeIOTC(tutk_platform_lib, max_workers=2) as wyze:
+            async with wyze.connect_and_auth(account, camera) as session:
+                with pytest.raises(tutk.TutkError):
+                    async for (
+                        img,
+                        frame_info,
+                    ) in session.recv_video_frame_ndarray(
+                        decode_mode=DecodeMode.KEYFRAMES, width=32, height=24
+                    ):
+                        images.append((frame_info.frame_no, img))
+        return images
+
+    images = asyncio.run(stream())
+    assert [frame_no for frame_no, _ in images] == [0, 5, 10]
+    assert all(img.shape == (24, 32, 3) for _, img in images)
+    # the test video gets brighter with every frame
+    assert images[0][1].mean() < images[1][1].mean() < images[2][1].mean()
+
+
+@pytest.mark.usefixtures("tutk_platform_lib", "account", "camera")
+def test_async_recv_video_data_from_receiver(
+    tutk_platform_lib, account, camera
+):
+    tutk_platform_lib.IOTC_Connect_ByUID_Parallel.set_retval(None)
+    for i in range(4):
+        tutk_platform_lib.queue_frame(bytes([i]), is_keyframe=int(i == 0))
+    recv_frame_data = tutk_platform_lib.avRecvFrameData2
+    unblock = threading.Event()
+
+    def pausing_recv(*args):
+        if tutk_platform_lib.frames_sent == 2:
+            unblock.wait()
+        return recv_frame_data(*args)
+
+    tutk_platform_lib.avRecvFrameData2 = pausing_recv
+
+    async def stream():
+        frames = []
+        async with AsyncWyzeIOTC(tutk_platform_lib, max_workers=2) as wyze:
+            async with wyze.connect_and_auth(account, camera) as session:
+                session.session.start_receiver()
+                with pytest.raises(tutk.TutkError):
+                    async for frame_data, _ in session.recv_video_data():
+                        frames.append(frame_data)
+                        if len(frames) == 2:
+                            # the receiver thread wakes the waiting iterator
+                            loop = asyncio.get_running_loop()
+                            loop.call_later(0.05, unblock.set)
+        return frames
+
+    assert asyncio.run(stream()) == [bytes([i]) for i in range(4)]
@@ -0,0 +1,107 @@
+import pytest
+from wyzecam.decode import DecodeMode, FrameDecimator, frame_to_ndarray
+from wyzecam.tutk import tutk
+
+
+def stream(seconds, fps=20, gop=20):
+    for i in range(seconds * fps):
+        yield tutk.FrameInfoStruct(
+            frame_no=i,
+            is_keyframe=int(i % gop == 0),
+            timestamp=1000 + i // fps,
+            timestamp_ms=(i % fps) * (1_000_000 // fps),
+        )
+
+
+def run(decimator, frame_infos):
+    decoded, output = [], []
+    for frame_info in frame_infos:
+        decode, out = decimator.plan(frame_info)
+        if decode:
+            decoded.append(frame_info.frame_no)
+        if out:
+            assert decode
+            output.append(frame_info.frame_no)
+    return decoded, output
+
+
+def test_all_frames():
+    decoded, output = run(FrameDecimator(), stream(2))
+    assert decoded == output == list(range(40))
+
+
+def test_keyframes_only():
+    decoded, output = run(FrameDecimator(DecodeMode.KEYFRAMES), stream(3))
+    assert decoded == output == [0, 20, 40]
+
+
+def test_target_fps_below_keyframe_rate_skips_whole_gops():
+    decimator = FrameDecimator(DecodeMode.TARGET_FPS, target_fps=0.5)
+    decoded, output = run(decimator, stream(6))
+    assert output == [0, 40, 80]
+    # the first gop has to be decoded to learn how long gops are
+    assert decoded == list(range(20)) + [40, 80]
+    assert decimator.frames_in == 120
+    assert decimator.frames_decoded == 22
+    assert decimator.frames_out == 3
+
+
+def test_target_fps_above_keyframe_rate_decodes_reference_frames():
+    decimator = FrameDecimator(DecodeMode.TARGET_FPS, target_fps=5)
+    decoded, output = run(decimator, stream(2))
+    assert output == list(range(0, 40, 4))
+    # nothing after frame 36 is due before the next keyframe
+    assert decoded == list(range(37))
+    assert decimator.skip_frame(output=False) == "NONREF"
+    assert decimator.skip_frame(output=True) == "DEFAULT"
+
+
+def test_reports_input_and_output_rates():
+    decimator = FrameDecimator(DecodeMode.TARGET_FPS, target_fps=5)
+    assert decimator.input_fps == decimator.output_fps == 0
+    run(decimator, stream(10))
+    assert decimator.input_fps == pytest.approx(20)
+    assert decimator.output_fps == pytest.approx(5, rel=0.05)
+
+
+def test_target_fps_requires_a_target():
+    with pytest.raises(AssertionError):
+        FrameDecimator(DecodeMode.TARGET_FPS)
+
+
+def test_frame_to_ndarray_formats_sizes_and_roi():
+    av = pytest.importorskip("av")
+    np = pytest.importorskip("numpy")
+    rows, cols = np.mgrid[0:48, 0:64]
+    rgb = np.stack([cols * 4, rows * 5, (cols + rows) * 2], -1).astype(np.uint8)
+    frame = av.VideoFrame.from_ndarray(rgb, format="rgb24").reformat(
+        format="yuv420p"
+    )
+    full = frame.to_ndarray(format="bgr24")
+
+    assert frame_to_ndarray(frame, "gray").shape == (48, 64)
+    assert frame_to_ndarray(frame, "yuv420p").shape == (72, 64)
+    assert frame_to_ndarray(frame, "rgb24", width=32).shape == (24, 32, 3)
+    assert np.array_equal(
+        frame_to_ndarray(frame, roi=(10, 8, 20, 16)), full[8:24, 10:30]
+    )
+
+    # rotated (doorbell) frames: sizes and regions refer to the rotated image
+    rotated = np.rot90(full, 3)
+    assert np.array_equal(frame_to_ndarray(frame, rotate=True), rotated)
+    assert np.array_equal(
+        frame_to_ndarray(frame, roi=(10, 8, 20, 16), rotate=True),
+        rotated[8:24, 10:30],
+    )
+    assert frame_to_ndarray(frame, height=32, rotate=True).shape == (32, 24, 3)
+    yuv = frame_to_ndarray(frame, "yuv420p", rotate=True)
+    assert np.array_equal(yuv[:64], np.rot90(frame.to_ndarray()[:48], 3))
+
+    # callers that accept non-contiguous arrays get a free rotated view
+    assert frame_to_ndarray(frame, rotate=True).flags.c_contiguous
+    view = frame_to_ndarray(frame, rotate=True, contiguous=False)
+    assert not view.flags.c_contiguous
+    assert np.array_equal(view, rotated)
+    gray = frame_to_ndarray(frame, "gray", rotate=True)
+    assert gray.flags.c_contiguous
+    assert np.array_equal(gray, np.rot90(frame_to_ndarray(frame, "gray"), 3))
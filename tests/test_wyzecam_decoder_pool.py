@@ -0,0 +1,95 @@
+from typing import Any, List, Tuple
+
+import pytest
+from wyzecam.tutk import tutk
+
+av = pytest.importorskip("av")
+np = pytest.importorskip("numpy")
+
+from wyzecam.decoder_pool import DecoderPool  # noqa: E402
+
+
+@pytest.mark.usefixtures("h264_frames")
+def test_decoder_pool_matches_local_decoding(h264_frames):
+    codec = av.CodecContext.create("h264", "r")
+    expected = []
+    for frame_data, _ in h264_frames:
+        for frame in codec.decode(av.Packet(frame_data)):
+            expected.append(frame.to_ndarray(format="bgr24"))
+
+    with DecoderPool(workers=2, slots_per_stream=3, max_in_flight=3) as pool:
+        streams = [pool.open_stream("h264") for _ in range(2)]
+        for stream in streams:
+            decoded: List[Tuple[int, Any]] = []
+            for i, (frame_data, _) in enumerate(h264_frames):
+                images = stream.decode(
+                    frame_data, tutk.FrameInfoStruct(frame_no=i)
+                )
+                decoded.extend(
+                    (info.frame_no, img.copy()) for img, info in images
+                )
+            decoded.extend(
+                (info.frame_no, img.copy()) for img, info in stream.flush()
+            )
+            assert [frame_no for frame_no, _ in decoded] == list(
+                range(len(expected))
+            )
+            for (_, img), expected_img in zip(decoded, expected):
+                # converted straight into shared memory, with opencv if it's installed
+                assert np.abs(img.astype(int) - expected_img).max() <= 3
+            stream.close()
+
+
+@pytest.mark.usefixtures("h264_frames")
+def test_decoder_pool_skips_output(h264_frames):
+    with DecoderPool(workers=1) as pool:
+        with pool.open_stream("h264") as stream:
+            frame_nos: List[int] = []
+            for i, (frame_data, _) in enumerate(h264_frames):
+                images = stream.decode(
+                    frame_data,
+                    tutk.FrameInfoStruct(frame_no=i),
+                    output=i % 2 == 0,
+                )
+                frame_nos.extend(info.frame_no for _, info in images)
+            frame_nos.extend(info.frame_no for _, info in stream.flush())
+            assert frame_nos == list(range(0, len(h264_frames), 2))
+
+
+@pytest.mark.usefixtures("h264_frames")
+def test_decoder_pool_reports_errors(h264_frames):
+    with DecoderPool(workers=1, max_width=32, max_height=32) as pool:
+        with pool.open_stream("h264") as stream:
+            with pytest.raises(RuntimeError):
+                stream.decode(h264_frames[0][0], tutk.FrameInfoStruct())
+                stream.flush()
+
+
+@pytest.mark.usefixtures("iotc", "account", "camera", "h264_frames")
+def test_recv_video_frame_ndarray_with_decoder_pool(
+    iotc, account, camera, h264_frames
+):
+    iotc.tutk_platform_lib.IOTC_Connect_ByUID_Parallel.set_retval(None)
+    with DecoderPool(workers=1) as pool:
+        with iotc.connect_and_auth(account, camera) as session:
+            for frame_data, is_keyframe in h264_frames:
+                session.tutk_platform_lib.queue_frame(
+                    frame_data, is_keyframe=int(is_keyframe)
+                )
+            frame_nos: List[int] = []
+            with pytest.raises(tutk.TutkError):
+                for img, frame_info in session.recv_video_frame_ndarray(
+                    decoder_pool=pool
+                ):
+                    assert img.shape == (48, 64, 3)
+                    frame_nos.append(frame_info.frame_no)
+            assert frame_nos == list(range(12))
+
+
+@pytest.mark.usefixtures("h264_frames")
+def test_decoder_pool_output_options(h264_frames):
+    with DecoderPool(workers=1) as pool:
+        with pool.open_stream("h264", format="gray", width=32) as stream:
+            stream.decode(h264_frames[0][0], tutk.FrameInfoStruct())
+            images = stream.flush()
+            assert images[0][0].shape == (24, 32)
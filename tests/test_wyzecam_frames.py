@@ -0,0 +1,93 @@
+import pytest
+from wyzecam.decode import OUTPUT_FORMATS, frame_to_ndarray
+from wyzecam.frames import FrameBatch, FrameInfoStore, NdarrayRing
+from wyzecam.tutk import tutk
+
+
+def test_frame_batch():
+    batch = FrameBatch()
+    batch.append(b"abc", tutk.FrameInfoStruct(frame_no=1))
+    batch.append(memoryview(b"defg"), tutk.FrameInfoStruct(frame_no=2))
+
+    assert len(batch) == 2
+    assert batch.nbytes == 7
+    assert [(bytes(data), info.frame_no) for data, info in batch] == [
+        (b"abc", 1),
+        (b"defg", 2),
+    ]
+
+
+def test_frame_info_store():
+    np = pytest.importorskip("numpy")
+    store = FrameInfoStore(capacity=2)
+    store.append(
+        tutk.FrameInfo3Struct(frame_no=1, face_width=7, ac_mac_addr=b"2CAABB")
+    )
+    store.clear()
+    for i in range(5):
+        store.append(
+            tutk.FrameInfoStruct(frame_no=i, frame_len=100 * i, is_keyframe=1)
+        )
+    store.append(tutk.FrameInfo3Struct(frame_no=5, face_width=7, timestamp=9))
+
+    assert len(store) == 6
+    assert store.nbytes == 6 * 48
+    np.testing.assert_array_equal(store["frame_no"], np.arange(6))
+    np.testing.assert_array_equal(store["face_width"], [0, 0, 0, 0, 0, 7])
+    assert store[2]["frame_len"] == 200
+    assert store[-1]["timestamp"] == 9
+
+
+def test_ndarray_ring_reuses_arrays():
+    pytest.importorskip("numpy")
+    ring = NdarrayRing(size=2)
+    a, b, c = (ring.acquire((4, 6, 3)) for _ in range(3))
+    assert a is c and a is not b
+    assert ring.allocations == 2
+
+    # a new shape replaces the array in its slot
+    d = ring.acquire((2, 2))
+    assert d.shape == (2, 2)
+    assert ring.allocations == 3
+
+
+def test_ndarray_ring_explicit_release():
+    pytest.importorskip("numpy")
+    ring = NdarrayRing(size=2, explicit_release=True)
+    a = ring.acquire((4, 4))
+    b = ring.acquire((4, 4))
+    with pytest.raises(RuntimeError):
+        ring.acquire((4, 4))
+    ring.release(b)
+    assert ring.acquire((4, 4)) is b
+    with pytest.raises(ValueError):
+        ring.release(a.copy())
+
+
+def test_frame_to_ndarray_into_ring():
+    av = pytest.importorskip("av")
+    np = pytest.importorskip("numpy")
+    pytest.importorskip("cv2")
+    rows, cols = np.mgrid[0:48, 0:64]
+    rgb = np.stack([cols * 4, rows * 5, (cols + rows) * 2], -1).astype(np.uint8)
+    frame = av.VideoFrame.from_ndarray(rgb, format="rgb24").reformat(
+        format="yuv420p"
+    )
+    ring = NdarrayRing(size=2)
+    for rotate in (False, True):
+        for format in OUTPUT_FORMATS:
+            expected = frame_to_ndarray(frame, format, rotate=rotate)
+            for _ in range(3):
+                img = frame_to_ndarray(
+                    frame, format, rotate=rotate, out_ring=ring
+                )
+                assert img.shape == expected.shape
+                # opencv and swscale round slightly differently
+                assert np.abs(img.astype(int) - expected).max() <= 3
+
+        # once every array in the ring has the right shape, nothing is allocated
+        for _ in range(ring.size):
+            frame_to_ndarray(frame, "bgr24", rotate=rotate, out_ring=ring)
+        allocations = ring.allocations
+        frame_to_ndarray(frame, "bgr24", rotate=rotate, out_ring=ring)
+        assert ring.allocations == allocations
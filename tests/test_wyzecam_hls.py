@@ -0,0 +1,140 @@
+import io
+import struct
+
+import pytest
+from wyzecam.tutk import tutk
+
+av = pytest.importorskip("av")
+
+from wyzecam.hls import HlsSegmenter, MemoryStore, _FragmentWriter  # noqa: E402
+
+
+def frame_infos(h264_frames, frame_size=0):
+    for i, (frame_data, is_keyframe) in enumerate(h264_frames):
+        yield frame_data, tutk.FrameInfoStruct(
+            codec_id=78,
+            is_keyframe=int(is_keyframe),
+            frame_no=i,
+            framerate=20,
+            frame_size=frame_size,
+            timestamp=1000 + i // 20,
+            timestamp_ms=(i % 20) * 50_000,
+        )
+
+
+def decode(init, segment):
+    with av.open(io.BytesIO(init + segment)) as container:
+        stream = container.streams.video[0]
+        return [
+            (float(frame.pts * stream.time_base), frame.key_frame)
+            for frame in container.decode(stream)
+        ]
+
+
+@pytest.mark.usefixtures("h264_frames")
+def test_segments_start_on_keyframes(h264_frames):
+    store = MemoryStore()
+    with HlsSegmenter(store, fragment_duration=0.2, window=3) as segmenter:
+        for frame_data, frame_info in frame_infos(h264_frames):
+            segmenter.write(frame_data, frame_info)
+            if frame_info.frame_no == 5:
+                # the first fragment is published once the second keyframe arrives
+                assert "segment-000000.m4s" in store.files
+                assert "#EXT-X-ENDLIST" not in store.get("live.m3u8").decode()
+
+    init = store.get("init-0.mp4")
+    assert init[4:8] == b"ftyp"
+    frames = [decode(init, store.get(f"segment-{i:06d}.m4s")) for i in range(3)]
+    assert [len(f) for f in frames] == [5, 5, 2]
+    assert all(f[0][1] for f in frames)
+    # fragments carry on the stream's timeline
+    assert frames[1][0][0] == pytest.approx(0.25)
+
+    assert store.get("live.m3u8").decode().splitlines()[1:] == [
+        "#EXT-X-VERSION:7",
+        "#EXT-X-TARGETDURATION:1",
+        "#EXT-X-MEDIA-SEQUENCE:0",
+        "#EXT-X-DISCONTINUITY-SEQUENCE:0",
+        "#EXT-X-INDEPENDENT-SEGMENTS",
+        '#EXT-X-MAP:URI="init-0.mp4"',
+        "#EXT-X-PROGRAM-DATE-TIME:1970-01-01T00:16:40.000+00:00",
+        "#EXTINF:0.250,",
+        "segment-000000.m4s",
+        "#EXT-X-PROGRAM-DATE-TIME:1970-01-01T00:16:40.250+00:00",
+        "#EXTINF:0.250,",
+        "segment-000001.m4s",
+        "#EXT-X-PROGRAM-DATE-TIME:1970-01-01T00:16:40.500+00:00",
+        "#EXTINF:0.100,",
+        "segment-000002.m4s",
+        "#EXT-X-ENDLIST",
+    ]
+
+
+@pytest.mark.usefixtures("h264_frames")
+def test_window_and_restart(tmp_path, h264_frames):
+    frames = list(frame_infos(h264_frames))
+    # the camera switches resolution after the second keyframe
+    frames[10:] = list(frame_infos(h264_frames, frame_size=1))[10:]
+    with HlsSegmenter(
+        str(tmp_path), fragment_duration=0.2, window=1
+    ) as segmenter:
+        for frame_data, frame_info in frames:
+            segmenter.write(frame_data, frame_info)
+
+    # segments are only deleted a window after they leave the playlist
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "init-0.mp4",
+        "init-1.mp4",
+        "live.m3u8",
+        "segment-000001.m4s",
+        "segment-000002.m4s",
+    ]
+    playlist = (tmp_path / "live.m3u8").read_text().splitlines()
+    assert playlist[3:10] == [
+        "#EXT-X-MEDIA-SEQUENCE:2",
+        "#EXT-X-DISCONTINUITY-SEQUENCE:0",
+        "#EXT-X-INDEPENDENT-SEGMENTS",
+        "#EXT-X-DISCONTINUITY",
+        '#EXT-X-MAP:URI="init-1.mp4"',
+        "#EXT-X-PROGRAM-DATE-TIME:1970-01-01T00:16:40.500+00:00",
+        "#EXTINF:0.100,",
+    ]
+    segment = decode(
+        (tmp_path / "init-1.mp4").read_bytes(),
+        (tmp_path / "segment-000002.m4s").read_bytes(),
+    )
+    assert segment == [(0.0, True), (0.05, False)]
+
+
+def test_memory_store_get_missing_file():
+    store = MemoryStore()
+    store.put("live.m3u8", b"#EXTM3U")
+    store.delete("live.m3u8")
+    with pytest.raises(KeyError):
+        store.get("live.m3u8")
+
+
+def box(box_type, payload=b"", size=None):
+    if size is None:
+        size = 8 + len(payload)
+    return struct.pack(">I4s", size, box_type) + payload
+
+
+def test_fragment_writer_rejects_invalid_box_sizes():
+    with pytest.raises(ValueError):
+        _FragmentWriter().write(box(b"free", size=4))
+    with pytest.raises(ValueError):
+        # a 64-bit size that doesn't even cover the 16 byte header
+        _FragmentWriter().write(box(b"free", struct.pack(">Q", 8), size=1))
+
+
+def test_fragment_writer_box_to_end_of_output():
+    writer = _FragmentWriter()
+    writer.write(box(b"moof", b"m"))
+    writer.write(box(b"mdat", b"12", size=0))
+    writer.write(b"34")
+    assert not writer.fragments
+    writer.close()
+    assert list(writer.fragments) == [
+        box(b"moof", b"m") + box(b"mdat", b"1234", 0)
+    ]
@@ -1,6 +1,10 @@
+import threading
+
 import pytest
+from wyzecam.decode import DecodeMode
 from wyzecam.iotc import WyzeIOTCSessionState
 from wyzecam.mock.mock_tutk_library import MockTutkLibrary  # type: ignore
+from wyzecam.receiver import GopCache
 from wyzecam.tutk import tutk
 
 
@@ -40,3 +44,318 @@ def test_auth_failed(iotc, account, camera):
     assert session.state == WyzeIOTCSessionState.CONNECTING_FAILED
     assert session.tutk_platform_lib.session_closed_called
     assert not session.tutk_platform_lib.client_stop_called
+
+
+@pytest.mark.usefixtures("iotc", "account", "camera")
+def test_recv_video_data_reuses_buffers(iotc, account, camera):
+    iotc.tutk_platform_lib.IOTC_Connect_ByUID_Parallel.set_retval(None)
+    with iotc.connect_and_auth(account, camera) as session:
+        for i in range(10):
+            session.tutk_platform_lib.queue_frame(bytes([i]) * (i + 1))
+        session.tutk_platform_lib.queue_error(tutk.AV_ER_INCOMPLETE_FRAME)
+
+        frames = []
+        with pytest.raises(tutk.TutkError):
+            for frame_data, frame_info in session.recv_video_data():
+                frames.append((frame_data, frame_info))
+
+        assert [data for data, _ in frames] == [
+            bytes([i]) * (i + 1) for i in range(10)
+        ]
+        assert [info.frame_no for _, info in frames] == list(range(10))
+        assert session.recv_buffer_pool.allocated == 1
+        stats = session.recv_stats.snapshot()
+        assert stats["frames_ok"] == 10
+        assert stats["bytes_received"] == sum(range(11))
+        assert stats["frames_incomplete"] == 1
+
+
+@pytest.mark.usefixtures("iotc", "account", "camera")
+def test_recv_video_data_view_leases(iotc, account, camera):
+    iotc.tutk_platform_lib.IOTC_Connect_ByUID_Parallel.set_retval(None)
+    with iotc.connect_and_auth(account, camera) as session:
+        for i in range(6):
+            session.tutk_platform_lib.queue_frame(bytes([i]) * 4)
+
+        frames = session.recv_video_data_view(lease_timeout=0)
+        lease, frame_info = next(frames)
+        with lease:
+            data = lease.data
+            assert data.tobytes() == bytes([0]) * 4
+        with pytest.raises(ValueError):
+            data.tobytes()  # released along with the lease
+
+        held = [next(frames)[0] for _ in range(session.recv_buffer_pool.size)]
+        assert [lease.data.tobytes() for lease in held] == [
+            bytes([i]) * 4 for i in range(1, 5)
+        ]
+        with pytest.raises(RuntimeError):
+            next(frames)
+        for lease in held:
+            lease.release()
+        assert (
+            session.recv_buffer_pool.allocated == session.recv_buffer_pool.size
+        )
+
+
+@pytest.mark.usefixtures("iotc", "account", "camera")
+def test_recv_video_data_batch(iotc, account, camera):
+    iotc.tutk_platform_lib.IOTC_Connect_ByUID_Parallel.set_retval(None)
+    with iotc.connect_and_auth(account, camera) as session:
+        lib = session.tutk_platform_lib
+        for i in range(5):
+            lib.queue_frame(bytes([i]) * 3)
+        lib.queue_error(tutk.AV_ER_DATA_NOREADY)
+        lib.queue_frame(b"late")
+
+        batch = session.recv_video_data_batch(max_frames=4)
+        assert len(batch) == 4
+        assert list(batch.offsets) == [0, 3, 6, 9, 12]
+        assert batch[-1][0].tobytes() == bytes([3]) * 3
+
+        batch = session.recv_video_data_batch()
+        assert [data.tobytes() for data, _ in batch] == [bytes([4]) * 3]
+
+        batch = session.recv_video_data_batch()
+        assert batch.payload == b"late"
+        with pytest.raises(tutk.TutkError):
+            session.recv_video_data_batch()
+
+
+@pytest.mark.usefixtures("iotc", "account", "camera", "h264_frames")
+def test_recv_video_frame_primed_from_gop_cache(
+    iotc, account, camera, h264_frames
+):
+    iotc.tutk_platform_lib.IOTC_Connect_ByUID_Parallel.set_retval(None)
+    lib = iotc.tutk_platform_lib
+    for frame_data, is_keyframe in h264_frames:
+        lib.queue_frame(frame_data, is_keyframe=int(is_keyframe))
+    recv_frame_data = lib.avRecvFrameData2
+    receiving = threading.Event()
+    resume = threading.Event()
+
+    def pausing_recv(*args):
+        if lib.frames_sent == 7 and not resume.is_set():
+            receiving.set()
+            resume.wait()
+        return recv_frame_data(*args)
+
+    lib.avRecvFrameData2 = pausing_recv
+
+    with iotc.connect_and_auth(account, camera) as session:
+        session.gop_cache = GopCache()
+        session.start_receiver()
+        raw = session.recv_video_data()
+        for _ in range(7):
+            next(raw)
+        raw.close()
+        assert receiving.wait(5)
+        assert [info.frame_no for _, info in session.gop_cache.frames()] == [
+            5,
+            6,
+        ]
+
+        decoded = session.recv_video_frame()
+        frame, frame_info = next(decoded)
+        resume.set()
+        # the first frame is available without waiting for the keyframe at 10
+        decoded_frame_nos = [frame_info.frame_no]
+        with pytest.raises(tutk.TutkError):
+            for frame, frame_info in decoded:
+                decoded_frame_nos.append(frame_info.frame_no)
+        assert decoded_frame_nos == [6, 7, 8, 9, 10, 11]
+
+
+@pytest.mark.usefixtures("iotc", "account", "camera", "h264_frames")
+def test_recv_video_frame_not_primed_without_receiver(
+    iotc, account, camera, h264_frames
+):
+    iotc.tutk_platform_lib.IOTC_Connect_ByUID_Parallel.set_retval(None)
+    with iotc.connect_and_auth(account, camera) as session:
+        session.gop_cache = GopCache()
+        for frame_data, is_keyframe in h264_frames:
+            session.tutk_platform_lib.queue_frame(
+                frame_data, is_keyframe=int(is_keyframe)
+            )
+
+        raw = session.recv_video_data()
+        for _ in range(10):
+            next(raw)
+        raw.close()
+        assert session.gop_cache.frames()
+
+        # nothing is received in between, so the cached frames (5 to 9) are stale
+        decoded = []
+        with pytest.raises(tutk.TutkError):
+            for frame, frame_info in session.recv_video_frame():
+                decoded.append(frame_info.frame_no)
+        assert decoded == [10, 11]
+
+
+@pytest.mark.usefixtures("iotc", "account", "camera")
+def test_recv_video_data_batch_alongside_receiver_reader(iotc, account, camera):
+    iotc.tutk_platform_lib.IOTC_Connect_ByUID_Parallel.set_retval(None)
+    with iotc.connect_and_auth(account, camera) as session:
+        lib = session.tutk_platform_lib
+        for i in range(6):
+            lib.queue_frame(bytes([i]), is_keyframe=int(i == 0))
+        session.gop_cache = GopCache()
+        session.start_receiver()
+        raw = session.recv_video_data()
+        received = [next(raw)[0] for _ in range(2)]
+
+        # the batch reader starts from the gop cache, and then keeps every frame
+        # received between calls
+        batches = []
+        with pytest.raises(tutk.TutkError):
+            while True:
+                batch = session.recv_video_data_batch(max_frames=2)
+                batches.append([bytes(data) for data, _ in batch])
+        with pytest.raises(tutk.TutkError):
+            for frame_data, _ in raw:
+                received.append(frame_data)
+
+    assert received == [bytes([i]) for i in range(6)]
+    assert [frame for batch in batches for frame in batch] == received
+
+
+@pytest.mark.usefixtures("iotc", "account", "camera", "h264_frames")
+def test_overlapping_consumers_each_get_every_frame(
+    iotc, account, camera, h264_frames
+):
+    iotc.tutk_platform_lib.IOTC_Connect_ByUID_Parallel.set_retval(None)
+    lib = iotc.tutk_platform_lib
+    for frame_data, is_keyframe in h264_frames:
+        lib.queue_frame(frame_data, is_keyframe=int(is_keyframe))
+    recv_frame_data = lib.avRecvFrameData2
+    receiving = threading.Event()
+    resume = threading.Event()
+
+    def pausing_recv(*args):
+        if lib.frames_sent == 7 and not resume.is_set():
+            receiving.set()
+            resume.wait()
+        return recv_frame_data(*args)
+
+    lib.avRecvFrameData2 = pausing_recv
+
+    with iotc.connect_and_auth(account, camera) as session:
+        session.gop_cache = GopCache()
+        session.start_receiver()
+        raw = session.recv_video_data()
+        received = [next(raw)[1].frame_no for _ in range(3)]
+        assert receiving.wait(5)
+
+        # a second consumer starts from the gop cache (frames 5 and 6) while the
+        # first is still reading
+        decoded = session.recv_video_frame()
+        frame, frame_info = next(decoded)
+        assert frame_info.frame_no == 6
+        resume.set()
+
+        decoded_frame_nos = [frame_info.frame_no]
+        with pytest.raises(tutk.TutkError):
+            for frame, frame_info in decoded:
+                decoded_frame_nos.append(frame_info.frame_no)
+        with pytest.raises(tutk.TutkError):
+            for _, frame_info in raw:
+                received.append(frame_info.frame_no)
+
+    assert received == list(range(12))
+    assert decoded_frame_nos == [6, 7, 8, 9, 10, 11]
+
+
+@pytest.mark.usefixtures("iotc", "account", "camera", "h264_frames")
+def test_recv_video_frame_decoder_threads(iotc, account, camera, h264_frames):
+    iotc.tutk_platform_lib.IOTC_Connect_ByUID_Parallel.set_retval(None)
+    with iotc.connect_and_auth(account, camera) as session:
+        session.decoder_thread_type = "FRAME"
+        session.decoder_thread_count = 2
+        codec = session._av_codec_from_frameinfo(
+            tutk.FrameInfoStruct(codec_id=78)
+        )
+        assert codec.thread_type.name == "FRAME"
+        assert codec.thread_count == 2
+
+        codec = session._av_codec_from_frameinfo(
+            tutk.FrameInfoStruct(codec_id=78),
+            thread_type="SLICE",
+            thread_count=3,
+        )
+        assert codec.thread_type.name == "SLICE"
+        assert codec.thread_count == 3
+
+        for frame_data, is_keyframe in h264_frames:
+            session.tutk_platform_lib.queue_frame(
+                frame_data, is_keyframe=int(is_keyframe)
+            )
+        decoded = []
+        with pytest.raises(tutk.TutkError):
+            for frame, frame_info in session.recv_video_frame(thread_count=4):
+                decoded.append(frame_info.frame_no)
+        # frame threading holds back a frame per extra thread, but each frame still
+        # comes out with its own frame_info, and the last ones are flushed at the end
+        assert decoded == list(range(len(h264_frames)))
+
+
+@pytest.mark.usefixtures("iotc", "account", "camera", "h264_frames")
+def test_recv_video_frame_keyframes_only(iotc, account, camera, h264_frames):
+    iotc.tutk_platform_lib.IOTC_Connect_ByUID_Parallel.set_retval(None)
+    with iotc.connect_and_auth(account, camera) as session:
+        for frame_data, is_keyframe in h264_frames:
+            session.tutk_platform_lib.queue_frame(
+                frame_data, is_keyframe=int(is_keyframe)
+            )
+
+        decoded = []
+        with pytest.raises(tutk.TutkError):
+            for frame, frame_info in session.recv_video_frame(
+                decode_mode=DecodeMode.KEYFRAMES
+            ):
+                assert frame.key_frame
+                decoded.append(frame_info.frame_no)
+        assert decoded == [0, 5, 10]
+
+
+@pytest.mark.usefixtures("iotc", "account", "camera", "h264_frames")
+def test_recv_video_frame_lazy(iotc, account, camera, h264_frames):
+    iotc.tutk_platform_lib.IOTC_Connect_ByUID_Parallel.set_retval(None)
+    with iotc.connect_and_auth(account, camera) as session:
+        for frame_data, is_keyframe in h264_frames:
+            session.tutk_platform_lib.queue_frame(
+                frame_data, is_keyframe=int(is_keyframe)
+            )
+        conversions = []
+        frame_to_ndarray = session._frame_to_ndarray
+
+        def counting_frame_to_ndarray(frame, frame_info, **kwargs):
+            conversions.append(frame_info.frame_no)
+            return frame_to_ndarray(frame, frame_info, **kwargs)
+
+        session._frame_to_ndarray = counting_frame_to_ndarray
+
+        frames = []
+        with pytest.raises(tutk.TutkError):
+            for frame in session.recv_video_frame_lazy(format="gray"):
+                frames.append(frame.frame_no)
+                if frame.is_keyframe:
+                    img = frame.ndarray()
+                    assert img.shape == (48, 64)
+                    assert frame.ndarray() is img
+                    assert frame.av_frame().key_frame
+        # every frame is decoded, but only the keyframes are converted
+        assert frames == list(range(len(h264_frames)))
+        assert conversions == [0, 5, 10]
+
+
+@pytest.mark.usefixtures("iotc", "account", "camera")
+def test_session_target_fps(iotc, account, camera):
+    iotc.tutk_platform_lib.IOTC_Connect_ByUID_Parallel.set_retval(None)
+    with iotc.connect_and_auth(account, camera) as session:
+        session.target_fps = 5
+        decimator = session._frame_decimator(DecodeMode.ALL, None)
+        assert session.decimator is decimator
+        assert decimator.mode == DecodeMode.TARGET_FPS
+        assert decimator.target_fps == 5
+        decimator = session._frame_decimator(DecodeMode.KEYFRAMES, None)
+        assert decimator.mode == DecodeMode.KEYFRAMES
@@ -0,0 +1,58 @@
+import random
+
+import pytest
+from wyzecam.latency import (
+    ClockOffsetEstimator,
+    FrameLatencyTracker,
+    LatencyHistogram,
+)
+from wyzecam.tutk import tutk
+
+
+def test_latency_histogram_percentiles():
+    histogram = LatencyHistogram(significant_figures=2)
+    values = list(range(1, 100_001))
+    random.shuffle(values)
+    for value in values:
+        histogram.record(value)
+
+    assert histogram.count == 100_000
+    assert histogram.min == 1
+    assert histogram.max == 100_000
+    for percentile in (50, 90, 99):
+        expected = percentile * 1000
+        assert (
+            abs(histogram.percentile(percentile) - expected) <= expected / 100
+        )
+
+
+def test_clock_offset_estimator_tracks_window_minimum():
+    estimator = ClockOffsetEstimator(window=3)
+    assert estimator.add_sample(100.0, 110.5) == pytest.approx(10.5)
+    assert estimator.add_sample(101.0, 111.1) == pytest.approx(10.1)
+    assert estimator.add_sample(102.0, 112.3) == pytest.approx(10.1)
+    assert estimator.add_sample(103.0, 113.4) == pytest.approx(10.1)
+    # the 10.1 sample has now left the window
+    assert estimator.add_sample(104.0, 114.6) == pytest.approx(10.3)
+
+
+def test_frame_latency_tracker():
+    tracker = FrameLatencyTracker()
+    for frame_no in range(10):
+        frame_info = tutk.FrameInfoStruct(
+            frame_no=frame_no, timestamp=1000 + frame_no
+        )
+        # host clock is 3600s ahead, plus up to 90ms of network delay
+        received = 4600 + frame_no + 0.01 * (frame_no % 10)
+        tracker.on_received(frame_info, now=received)
+        tracker.on_decoded(frame_info, now=received + 0.005)
+        tracker.on_delivered(frame_info, now=received + 0.007)
+
+    snapshot = tracker.snapshot()
+    assert snapshot["camera_to_receive"]["min"] == 0
+    assert 89_000 < snapshot["camera_to_receive"]["max"] <= 90_000
+    assert 4_900 < snapshot["receive_to_decoded"]["p50"] <= 5_000
+    assert 1_900 < snapshot["decoded_to_delivered"]["p99"] <= 2_000
+    times = tracker.times(frame_info)
+    assert times is not None
+    assert times.delivered == received + 0.007
@@ -0,0 +1,87 @@
+import threading
+import urllib.request
+
+import pytest
+from wyzecam.metrics import Counter, Histogram, MetricsRegistry
+
+
+def test_counter_is_exact_across_threads():
+    counter = Counter()
+
+    def work():
+        for _ in range(10_000):
+            counter.inc()
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert counter.value == 40_000
+
+
+def test_histogram_snapshot_is_cumulative():
+    histogram = Histogram(buckets=(1, 2, 5))
+    for value in (0.5, 1, 1.5, 3, 10):
+        histogram.observe(value)
+    counts, total = histogram.snapshot()
+    assert counts == [2, 3, 4, 5]
+    assert total == pytest.approx(16)
+
+
+def test_registry_renders_prometheus_text():
+    registry = MetricsRegistry()
+    frames = registry.counter("test_frames_total", "Frames.", ("camera",))
+    frames.labels('a "quoted"\ncamera').inc(3)
+    assert (
+        registry.counter("test_frames_total", "Frames.", ("camera",)) is frames
+    )
+    registry.histogram(
+        "test_seconds", "Time.", buckets=(0.1, 1)
+    ).labels().observe(0.5)
+    registry.set_collector(
+        "test", lambda: [("test_info", "gauge", "Info.", {"x": "1"}, 2.5)]
+    )
+    lines = registry.render().splitlines()
+    assert "# TYPE test_frames_total counter" in lines
+    assert 'test_frames_total{camera="a \\"quoted\\"\\ncamera"} 3' in lines
+    assert 'test_seconds_bucket{le="0.1"} 0' in lines
+    assert 'test_seconds_bucket{le="1"} 1' in lines
+    assert 'test_seconds_bucket{le="+Inf"} 1' in lines
+    assert "test_seconds_sum 0.5" in lines
+    assert "test_seconds_count 1" in lines
+    assert 'test_info{x="1"} 2.5' in lines
+
+    registry.set_collector("test", None)
+    assert "test_info" not in registry.render()
+
+
+def test_metrics_server():
+    registry = MetricsRegistry()
+    registry.counter("test_total", "Test.").labels().inc()
+    with registry.serve(port=0) as server:
+        url = f"http://127.0.0.1:{server.port}/metrics"
+        with urllib.request.urlopen(url) as response:
+            assert response.headers["Content-Type"].startswith("text/plain")
+            assert "test_total 1" in response.read().decode()
+
+
+@pytest.mark.usefixtures("iotc", "account", "camera")
+def test_session_metrics(iotc, account, camera):
+    registry = MetricsRegistry()
+    with iotc.connect_and_auth(account, camera, metrics=registry) as session:
+        for i in range(3):
+            session.tutk_platform_lib.queue_frame(bytes(i + 1))
+        session._poll_frame(session.recv_buffer_pool.acquire())
+        text = registry.render()
+
+    label = f'camera="{camera.mac}"'
+    assert f"wyzecam_frames_received_total{{{label}}} 1" in text
+    assert f"wyzecam_received_bytes_total{{{label}}} 1" in text
+    for phase in ("iotc_connect", "av_connect", "auth"):
+        assert (
+            f'wyzecam_session_phase_seconds_count{{{label},phase="{phase}"}} 1'
+            in text
+        )
+    assert f'wyzecam_ioctl_rtt_seconds_count{{{label},code="10000"}} 1' in text
+    assert "wyzecam_session_rx_packets_total" in text
@@ -0,0 +1,55 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+
+from wyzecam.overlay import TextOverlay  # noqa: E402
+
+
+def put_text(img, text):
+    for color, thickness in ((0, 2), (255, 1)):
+        cv2.putText(
+            img,
+            text,
+            (50, 50),
+            cv2.FONT_HERSHEY_DUPLEX,
+            1,
+            (color,) * 3,
+            thickness,
+            cv2.LINE_AA,
+        )
+    return img
+
+
+def test_text_overlay_matches_put_text():
+    rng = np.random.default_rng(0)
+    img = rng.integers(0, 256, (120, 640, 3), dtype=np.uint8)
+    overlay = TextOverlay()
+    drawn = overlay.draw(img.copy(), "640x120 123 kB/s 20 FPS")
+    expected = put_text(img.copy(), "640x120 123 kB/s 20 FPS")
+    assert np.abs(drawn.astype(int) - expected).max() <= 2
+
+    gray = overlay.draw(img[:, :, 0].copy(), "640x120 123 kB/s 20 FPS", "gray")
+    assert np.abs(gray.astype(int) - expected[:, :, 0]).max() <= 2
+
+
+def test_text_overlay_renders_each_string_once():
+    overlay = TextOverlay(cache_size=2)
+    img = np.zeros((120, 640, 3), np.uint8)
+    for text in ["a", "b", "a", "b", "a"]:
+        overlay.draw(img, text)
+    assert overlay.renders == 2
+    overlay.draw(img, "c")
+    overlay.draw(img, "a")
+    assert overlay.renders == 3
+    overlay.draw(img, "b")  # evicted by "c"
+    assert overlay.renders == 4
+
+
+def test_text_overlay_yuv420p_luma_and_clipping():
+    yuv = np.full((72, 64), 128, np.uint8)
+    TextOverlay(origin=(40, 20)).draw(yuv, "clipped", "yuv420p")
+    luma, chroma = yuv[:48], yuv[48:]
+    assert luma.min() >= 16 and luma.max() <= 235
+    assert luma.max() > 200 and luma.min() < 40
+    assert (chroma == 128).all()
@@ -0,0 +1,183 @@
+from types import SimpleNamespace
+
+import threading
+
+import pytest
+from wyzecam.receiver import (
+    DropPolicy,
+    FrameReceiver,
+    FrameRingBuffer,
+    GopCache,
+)
+from wyzecam.tutk import tutk
+
+
+def put_gop(ring_buffer, frame_no, length):
+    results = []
+    for i in range(length):
+        frame_info = tutk.FrameInfoStruct(
+            is_keyframe=int(i == 0), frame_no=frame_no + i
+        )
+        results.append(ring_buffer.put(b"x" * 10, frame_info))
+    return results
+
+
+def drain(ring_buffer):
+    frame_nos = []
+    while len(ring_buffer):
+        frame_nos.append(ring_buffer.get()[1].frame_no)
+    return frame_nos
+
+
+def test_drop_oldest_evicts_whole_gops():
+    ring_buffer = FrameRingBuffer(
+        max_frames=5, drop_policy=DropPolicy.DROP_OLDEST
+    )
+    put_gop(ring_buffer, 0, 3)
+    put_gop(ring_buffer, 10, 3)
+
+    assert drain(ring_buffer) == [10, 11, 12]
+    assert ring_buffer.dropped_frames == 3
+    assert ring_buffer.dropped_keyframes == 1
+
+
+def test_drop_oldest_never_delivers_orphaned_frames():
+    ring_buffer = FrameRingBuffer(
+        max_frames=3, drop_policy=DropPolicy.DROP_OLDEST
+    )
+    assert put_gop(ring_buffer, 0, 5) == [True, True, True, False, False]
+    put_gop(ring_buffer, 10, 2)
+
+    assert drain(ring_buffer) == [10, 11]
+
+
+def test_drop_until_keyframe():
+    ring_buffer = FrameRingBuffer(
+        max_frames=4, max_bytes=1000, drop_policy=DropPolicy.DROP_UNTIL_KEYFRAME
+    )
+    assert put_gop(ring_buffer, 0, 6) == [True, True, True, True, False, False]
+    put_gop(ring_buffer, 10, 2)
+
+    assert drain(ring_buffer) == [10, 11]
+    assert ring_buffer.dropped_frames == 6
+
+
+def test_close_wakes_consumer():
+    ring_buffer = FrameRingBuffer(drop_policy=DropPolicy.BLOCK)
+    ring_buffer.close()
+    assert ring_buffer.get() is None
+    assert not ring_buffer.put(b"", tutk.FrameInfoStruct(is_keyframe=1))
+
+
+def test_listeners_are_called_on_put_and_close():
+    ring_buffer = FrameRingBuffer()
+    calls = []
+    ring_buffer.add_listener(lambda: calls.append(len(ring_buffer)))
+    put_gop(ring_buffer, 0, 2)
+    ring_buffer.close()
+    assert calls == [1, 2, 2]
+
+
+@pytest.mark.usefixtures("iotc", "account", "camera")
+def test_session_receiver(iotc, account, camera):
+    iotc.tutk_platform_lib.IOTC_Connect_ByUID_Parallel.set_retval(None)
+    with iotc.connect_and_auth(account, camera) as session:
+        for i in range(10):
+            session.tutk_platform_lib.queue_frame(
+                bytes([i]), is_keyframe=int(i % 5 == 0)
+            )
+        session.start_receiver(max_frames=10)
+
+        frames = []
+        with pytest.raises(tutk.TutkError):
+            for frame_data, frame_info in session.recv_video_data():
+                frames.append(frame_data)
+        assert frames == [bytes([i]) for i in range(10)]
+        assert session.dropped_frames == 0
+    assert session.receiver is None
+
+
+def make_receiver(drop_policy):
+    session = SimpleNamespace(
+        camera=SimpleNamespace(nickname="test"), gop_cache=None
+    )
+    ring_buffer = FrameRingBuffer(2, drop_policy=drop_policy)
+    return FrameReceiver(session, ring_buffer)  # type: ignore[arg-type]
+
+
+def feed_gop(receiver, frame_no, length):
+    for i in range(length):
+        frame_info = tutk.FrameInfoStruct(
+            is_keyframe=int(i == 0), frame_no=frame_no + i
+        )
+        receiver._put_readers(b"x" * 10, frame_info)
+
+
+def test_closed_reader_is_no_longer_fed():
+    receiver = make_receiver(DropPolicy.BLOCK)
+    reader = receiver.open_reader()
+    feed_gop(receiver, 0, 1)
+    receiver.close_reader(reader)
+
+    # with nobody reading, a full buffer would block forever or drop frames
+    feed_gop(receiver, 1, 5)
+    assert len(receiver.ring_buffer) == 0
+    assert receiver.ring_buffer.dropped_frames == 0
+
+    reader = receiver.open_reader()
+    assert reader is receiver.ring_buffer
+    feed_gop(receiver, 6, 2)
+    assert drain(reader) == [6, 7]
+
+
+def test_slow_reader_does_not_block_others():
+    receiver = make_receiver(DropPolicy.BLOCK)
+    slow_reader = receiver.open_reader()
+    reader = receiver.open_reader()
+
+    feed_gop(receiver, 0, 2)
+    assert drain(reader) == [0, 1]
+
+    # slow_reader is full, which used to block the receiver until it was read
+    feeder = threading.Thread(
+        target=feed_gop, args=(receiver, 2, 2), daemon=True
+    )
+    feeder.start()
+    feeder.join(5)
+    assert not feeder.is_alive()
+    assert drain(reader) == [2, 3]
+    assert drain(slow_reader) == [2, 3]
+    assert slow_reader.dropped_frames == 2
+
+    # once it's the only reader left, it holds up the receiver again
+    receiver.close_reader(reader)
+    assert slow_reader._blocking
+
+
+def add_gop(gop_cache, frame_no, length):
+    for i in range(length):
+        frame_info = tutk.FrameInfoStruct(
+            is_keyframe=int(i == 0), frame_no=frame_no + i
+        )
+        gop_cache.add(b"x" * 10, frame_info)
+
+
+def test_gop_cache_keeps_latest_gop():
+    gop_cache = GopCache()
+    # frames before the first keyframe are useless to a decoder
+    gop_cache.add(b"p", tutk.FrameInfoStruct(frame_no=0))
+    assert gop_cache.frames() == []
+
+    add_gop(gop_cache, 1, 3)
+    add_gop(gop_cache, 10, 2)
+    assert [info.frame_no for _, info in gop_cache.frames()] == [10, 11]
+    assert gop_cache.cached_bytes == 20
+
+
+def test_gop_cache_clears_when_gop_is_too_long():
+    gop_cache = GopCache(max_frames=3)
+    add_gop(gop_cache, 0, 4)
+    assert len(gop_cache) == 0
+
+    add_gop(gop_cache, 10, 2)
+    assert [info.frame_no for _, info in gop_cache.frames()] == [10, 11]
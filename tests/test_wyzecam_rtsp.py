@@ -0,0 +1,240 @@
+from typing import List
+
+import socket
+import threading
+import time
+
+import pytest
+from wyzecam.receiver import FrameRingBuffer
+from wyzecam.rtsp import (
+    RtspServer,
+    RtspStream,
+    _RtpClient,
+    packetize,
+    split_nal_units,
+)
+from wyzecam.tutk import tutk
+
+
+def frame_info(i, is_keyframe, codec_id=78):
+    return tutk.FrameInfoStruct(
+        codec_id=codec_id,
+        is_keyframe=int(is_keyframe),
+        frame_no=i,
+        framerate=20,
+        timestamp=1000 + i // 20,
+        timestamp_ms=(i % 20) * 50_000,
+    )
+
+
+def test_split_nal_units():
+    data = (
+        b"\x00\x00\x00\x01\x67abc\x00\x00\x01\x68de\x00\x00\x00\x01\x65"
+        + b"f" * 10
+    )
+    assert [bytes(nal) for nal in split_nal_units(data)] == [
+        b"\x67abc",
+        b"\x68de",
+        b"\x65" + b"f" * 10,
+    ]
+
+
+@pytest.mark.parametrize(
+    "codec_name, nal",
+    [
+        ("h264", b"\x65" + bytes(range(256)) * 20),
+        ("hevc", b"\x26\x01" + bytes(range(256)) * 20),
+    ],
+)
+def test_packetize_fragments_large_nal_units(codec_name, nal):
+    sps = b"\x67\x42\x00\x1f" if codec_name == "h264" else b"\x42\x01\x01"
+    payloads = packetize(
+        codec_name, b"\x00\x00\x00\x01" + sps + b"\x00\x00\x01" + nal
+    )
+    assert payloads[0] == sps
+    assert all(len(payload) <= 1400 for payload in payloads)
+
+    # reassemble the fragmentation units
+    header_len = 2 if codec_name == "hevc" else 1
+    fu_headers = [payload[header_len] for payload in payloads[1:]]
+    assert fu_headers[0] & 0x80 and fu_headers[-1] & 0x40
+    assert not any(h & 0xC0 for h in fu_headers[1:-1])
+    body = b"".join(payload[header_len + 1 :] for payload in payloads[1:])
+    assert body == nal[header_len:]
+    if codec_name == "hevc":
+        assert payloads[1][0] >> 1 == 49 and fu_headers[0] & 0x3F == 19
+    else:
+        assert payloads[1][0] & 0x1F == 28 and fu_headers[0] & 0x1F == 5
+
+
+@pytest.mark.usefixtures("h264_frames")
+def test_slow_client_does_not_hold_up_others(h264_frames):
+    stream = RtspStream("cam")
+    sent: List[List[bytes]] = []
+    blocked = threading.Event()
+
+    def slow_send(packets):
+        blocked.wait()
+
+    clients = [
+        _RtpClient(stream, sent.append, lambda c: None, FrameRingBuffer(100)),
+        _RtpClient(stream, slow_send, lambda c: None, FrameRingBuffer(4)),
+    ]
+    for client in clients:
+        client.start()
+    for i, (frame_data, is_keyframe) in enumerate(h264_frames):
+        stream.write(frame_data, frame_info(i, is_keyframe))
+
+    deadline = time.monotonic() + 5
+    while len(sent) < len(h264_frames) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(sent) == len(h264_frames)
+    # the slow client only drops its own frames
+    assert clients[1].ring_buffer.dropped_frames > 0
+    assert len(clients[1].ring_buffer) <= 4
+    blocked.set()
+    stream.disconnect_clients()
+
+
+@pytest.mark.usefixtures("h264_frames")
+def test_gop_cache_fits_client_queue(h264_frames):
+    with RtspServer(port=0, queue_frames=4) as server:
+        stream = server.add_stream("cam")
+        for i, (frame_data, is_keyframe) in enumerate(h264_frames[:10]):
+            stream.write(frame_data, frame_info(i, is_keyframe))
+        # frames 5 to 9 wouldn't fit in a new client's queue
+        assert stream.gop_cache.frames() == []
+
+        for i, (frame_data, is_keyframe) in enumerate(h264_frames[10:], 10):
+            stream.write(frame_data, frame_info(i, is_keyframe))
+        assert [info.frame_no for _, info in stream.gop_cache.frames()] == [
+            10,
+            11,
+        ]
+
+
+@pytest.mark.parametrize("transport", ["tcp", "udp"])
+@pytest.mark.usefixtures("h264_frames")
+def test_clients_play_from_latest_keyframe(h264_frames, transport):
+    av = pytest.importorskip("av")
+    stopping = threading.Event()
+
+    with RtspServer(port=0) as server:
+        stream = server.add_stream("front door")
+
+        def feed():
+            i = 0
+            while not stopping.is_set():
+                frame_data, is_keyframe = h264_frames[i % len(h264_frames)]
+                stream.write(frame_data, frame_info(i, is_keyframe))
+                i += 1
+                time.sleep(0.01)
+
+        feeder = threading.Thread(target=feed, daemon=True)
+        feeder.start()
+        try:
+            assert stream.wait_ready(5)
+            assert "sprop-parameter-sets=" in stream.sdp()
+            with av.open(
+                server.url("front door"),
+                options={"rtsp_transport": transport, "timeout": "5000000"},
+            ) as container:
+                assert stream.clients == 1
+                frames = []
+                for frame in container.decode(video=0):
+                    frames.append(frame)
+                    if len(frames) == 10:
+                        break
+        finally:
+            stopping.set()
+            feeder.join()
+
+    assert frames[0].key_frame
+    assert (frames[0].width, frames[0].height) == (64, 48)
+
+
+def rtsp_request(conn, buffer, cseq, method, url, headers=""):
+    conn.sendall(
+        f"{method} {url} RTSP/1.0\r\nCSeq: {cseq}\r\n{headers}\r\n".encode()
+    )
+    # interleaved RTP packets may arrive around the response
+    marker = f"CSeq: {cseq}\r\n".encode()
+    while marker not in buffer:
+        data = conn.recv(65536)
+        assert data, "the server hung up"
+        buffer += data
+    end = buffer.index(marker)
+    return buffer[buffer.rindex(b"RTSP/1.0 ", 0, end) : end].split(b"\r\n")[0]
+
+
+@pytest.mark.usefixtures("h264_frames")
+def test_repeated_play_and_teardown(h264_frames, monkeypatch):
+    close = _RtpClient.close
+
+    def close_and_wait(self):
+        # let the client's thread stop before the handler carries on
+        close(self)
+        self._thread.join()
+
+    monkeypatch.setattr(_RtpClient, "close", close_and_wait)
+    with RtspServer(port=0) as server:
+        stream = server.add_stream("cam")
+        for i, (frame_data, is_keyframe) in enumerate(h264_frames):
+            stream.write(frame_data, frame_info(i, is_keyframe))
+        url = server.url("cam")
+        with socket.create_connection((server.host, server.port), 5) as conn:
+            buffer = bytearray()
+            assert rtsp_request(conn, buffer, 1, "DESCRIBE", url).endswith(
+                b"200 OK"
+            )
+            assert rtsp_request(
+                conn,
+                buffer,
+                2,
+                "SETUP",
+                url + "/trackID=0",
+                "Transport: RTP/AVP/TCP;unicast;interleaved=0-1\r\n",
+            ).endswith(b"200 OK")
+            for cseq in (3, 4):
+                assert rtsp_request(conn, buffer, cseq, "PLAY", url).endswith(
+                    b"200 OK"
+                )
+            assert stream.clients == 1
+            assert rtsp_request(conn, buffer, 5, "GET_PARAMETER", url).endswith(
+                b"200 OK"
+            )
+
+            # a TEARDOWN stops the client, but leaves the connection open
+            assert rtsp_request(conn, buffer, 6, "TEARDOWN", url).endswith(
+                b"200 OK"
+            )
+            assert rtsp_request(conn, buffer, 7, "GET_PARAMETER", url).endswith(
+                b"200 OK"
+            )
+            assert stream.clients == 0
+
+
+@pytest.mark.usefixtures("iotc", "account", "camera", "h264_frames")
+def test_close_stops_session_pump(iotc, account, camera, h264_frames):
+    lib = iotc.tutk_platform_lib
+    lib.IOTC_Connect_ByUID_Parallel.set_retval(None)
+    for frame_data, is_keyframe in h264_frames:
+        lib.queue_frame(frame_data, is_keyframe=int(is_keyframe))
+    recv_frame_data = lib.avRecvFrameData2
+
+    def recv_forever(*args):
+        if not lib.frames:
+            return tutk.AV_ER_DATA_NOREADY  # the camera is still connected
+        return recv_frame_data(*args)
+
+    lib.avRecvFrameData2 = recv_forever
+
+    with iotc.connect_and_auth(account, camera) as session:
+        server = RtspServer(port=0)
+        stream = server.add_session("cam", session)
+        assert stream.wait_ready(5)
+        pumps = list(server._pumps)
+        server.close()
+        assert not any(pump.is_alive() for pump in pumps)
+        # the receiver started for the server is stopped along with it
+        assert session.receiver is None
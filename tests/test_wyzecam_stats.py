@@ -0,0 +1,69 @@
+import pytest
+from wyzecam.stats import StreamStats
+from wyzecam.tutk import tutk
+
+
+def frame_info(i, fps=20, gop=20):
+    return tutk.FrameInfoStruct(
+        frame_no=i,
+        is_keyframe=int(i % gop == 0),
+        framerate=fps,
+        frame_len=10_000 if i % gop == 0 else 1_000 + i % 7,
+        timestamp=1000 + i // fps,
+        timestamp_ms=(i % fps) * (1_000_000 // fps),
+    )
+
+
+def test_stream_stats_matches_full_window_recomputation():
+    stream_stats = StreamStats(window_size=30)
+    infos = [frame_info(i) for i in range(100)]
+    for i, info in enumerate(infos):
+        stream_stats.add(info, now=i / 20)
+        window = infos[max(0, i - 29) : i + 1]
+        snapshot = stream_stats.snapshot()
+        if len(window) < 2:
+            assert snapshot["bytes_per_second"] == 0
+            continue
+        duration = (
+            window[-1].timestamp
+            + window[-1].timestamp_ms / 1_000_000
+            - window[0].timestamp
+            - window[0].timestamp_ms / 1_000_000
+        )
+        assert snapshot["window_duration"] == pytest.approx(duration)
+        assert snapshot["bytes_per_second"] == int(
+            sum(b.frame_len for b in window[:-1]) / duration
+        )
+        assert snapshot["frames_per_second"] == int(len(window) / duration)
+    assert stream_stats.frames == 30
+
+
+def test_stream_stats_gop_and_percentiles():
+    stream_stats = StreamStats(window_size=100)
+    for i in range(100):
+        stream_stats.add(frame_info(i), now=i / 20)
+    snapshot = stream_stats.snapshot()
+    assert snapshot["gop_length"] == 20
+    assert snapshot["keyframe_size"] == 10_000
+    # 95 of the 100 frames are P-frames of ~1000 bytes
+    assert snapshot["frame_size_p50"] == pytest.approx(1003, rel=0.07)
+    assert snapshot["frame_size_p99"] == pytest.approx(10_000, rel=0.07)
+    assert snapshot["inter_arrival_p50"] == pytest.approx(0.05, rel=0.07)
+
+    # old frames leave the histograms along with the window
+    for i in range(100, 200):
+        stream_stats.add(frame_info(i, gop=1000), now=i / 20 + (i - 100))
+    snapshot = stream_stats.snapshot()
+    assert snapshot["frame_size_p99"] < 2_000
+    assert snapshot["inter_arrival_p50"] == pytest.approx(1.05, rel=0.07)
+
+
+def test_stream_stats_doorbell_without_timestamp_ms():
+    stream_stats = StreamStats(window_size=10)
+    for i in range(10):
+        stream_stats.add(
+            tutk.FrameInfoStruct(frame_len=1000, framerate=20, timestamp=1000)
+        )
+    snapshot = stream_stats.snapshot()
+    assert snapshot["window_duration"] == pytest.approx(0.5)
+    assert snapshot["frames_per_second"] == 20
@@ -0,0 +1,54 @@
+import pytest
+from wyzecam.tutk import tutk
+from wyzecam.wait_policy import (
+    AdaptiveWaitPolicy,
+    FixedWaitPolicy,
+    SpinThenSleepWaitPolicy,
+    WaitPolicy,
+)
+
+
+def test_fixed_wait_policy():
+    policy = FixedWaitPolicy(0.001)
+    policy.wait()
+    policy.wait()
+    assert policy.next_delay() == 0.001
+    assert policy.wait_count == 2
+    assert policy.stats()["time_waiting"] > 0
+
+
+def test_spin_then_sleep_wait_policy():
+    policy = SpinThenSleepWaitPolicy(spin_duration=60, sleep_interval=0.5)
+    assert policy.next_delay() == 0
+
+    policy = SpinThenSleepWaitPolicy(spin_duration=0, sleep_interval=0.5)
+    assert policy.next_delay() == 0.5
+    policy.frame_received(tutk.FrameInfoStruct())
+    assert policy._spin_started is None
+
+
+def test_adaptive_wait_policy_predicts_next_frame():
+    policy = AdaptiveWaitPolicy(min_delay=0.001, max_delay=0.1, early=0.25)
+    policy.frame_received(tutk.FrameInfoStruct(framerate=10))
+
+    # first wait sleeps until shortly before the next frame is due (~75ms)
+    assert 0.05 < policy.next_delay() <= 0.075
+    # then backs off exponentially, capped at a fraction of the frame interval
+    delays = [policy.next_delay() for _ in range(10)]
+    assert delays[:3] == [0.001, 0.002, 0.004]
+    assert max(delays) == 0.025
+
+
+def test_adaptive_wait_policy_idle_camera():
+    policy = AdaptiveWaitPolicy(min_delay=0.001, max_delay=0.1)
+    delays = [policy.next_delay() for _ in range(12)]
+    assert delays[0] == 0.001
+    assert delays[-1] == 0.1
+
+
+def test_wait_policy_requires_next_delay():
+    class Incomplete(WaitPolicy):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()  # type: ignore[abstract]
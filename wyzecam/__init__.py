@@ -11,6 +11,8 @@ try:
 except PackageNotFoundError:  # pragma: no cover
     __version__ = "unknown"
 
+from wyzecam.aio import AsyncWyzeIOTC, AsyncWyzeIOTCSession
 from wyzecam.api import get_camera_list, get_user_info, login
 from wyzecam.api_models import WyzeAccount, WyzeCamera, WyzeCredential
+from wyzecam.decode import DecodedFrame, DecodeMode
 from wyzecam.iotc import WyzeIOTC, WyzeIOTCSession, WyzeIOTCSessionState
@@ -0,0 +1,455 @@
+from typing import Any, AsyncIterator, Callable, Optional, Tuple, TypeVar, Union
+
+import asyncio
+import functools
+from concurrent.futures import Future, ThreadPoolExecutor
+from ctypes import CDLL
+
+from wyzecam.api_models import WyzeAccount, WyzeCamera
+from wyzecam.decode import DecodedFrame, DecodeMode
+from wyzecam.frames import NdarrayRing
+from wyzecam.iotc import (
+    WyzeIOTC,
+    WyzeIOTCSession,
+    WyzeIOTCSessionState,
+    _DecodeLoop,
+)
+from wyzecam.receiver import FrameReceiver
+from wyzecam.tutk import tutk
+
+try:
+    import av
+except ImportError:
+    av = None  # type: ignore
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # type: ignore
+
+T = TypeVar("T")
+FrameInfo = Union[tutk.FrameInfoStruct, tutk.FrameInfo3Struct]
+
+
+class AsyncWyzeIOTC:
+    """An asyncio-friendly wrapper around [WyzeIOTC][wyzecam.iotc.WyzeIOTC].
+
+    All blocking calls into the TUTK library are run on a bounded thread pool, so
+    a single event loop can drive many cameras with a predictable number of threads:
+
+    ```python
+    async with AsyncWyzeIOTC(max_workers=4) as wyze:
+        async with wyze.connect_and_auth(account, camera) as session:
+            async for (frame, frame_info) in session.recv_video_data():
+                ...  # forward the raw video data somewhere
+    ```
+
+    Receiving frames never ties up a worker thread while waiting for the camera; the
+    waiting happens on the event loop, according to the session's
+    [wait_policy][wyzecam.wait_policy.WaitPolicy].  Only connecting to a camera blocks a
+    worker for the duration of the connection attempt, so `max_workers` should be at
+    least the number of cameras you expect to connect to at the same time.
+
+    :var iotc: the underlying [WyzeIOTC][wyzecam.iotc.WyzeIOTC] object.
+    :var executor: the thread pool blocking calls are run on.
+    """
+
+    def __init__(
+        self,
+        tutk_platform_lib: Optional[Union[str, CDLL]] = None,
+        udp_port: Optional[int] = None,
+        max_num_av_channels: Optional[int] = None,
+        debug: bool = False,
+        max_workers: int = 4,
+        executor: Optional[ThreadPoolExecutor] = None,
+    ) -> None:
+        """Construct an AsyncWyzeIOTC object
+
+        :param tutk_platform_lib: The underlying c library (from tutk.load_library()), or the path
+                                  to this library.
+        :param udp_port: Specify a UDP port. Random UDP port is used if it is specified as 0.
+        :param max_num_av_channels: The max number of AV channels.
+        :param debug: Enable debug logging.
+        :param max_workers: The number of threads used to run blocking calls, if no
+                            `executor` is specified.
+        :param executor: A thread pool to run blocking calls on.  If specified, it is not
+                         shut down when this object is closed.
+        """
+        self.iotc = WyzeIOTC(
+            tutk_platform_lib, udp_port, max_num_av_channels, debug
+        )
+        self._owns_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(
+            max_workers, thread_name_prefix="wyzecam"
+        )
+
+    async def __aenter__(self) -> "AsyncWyzeIOTC":
+        await run_blocking(self.executor, self.iotc.initialize)
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await run_blocking(self.executor, self.iotc.deinitialize)
+        if self._owns_executor:
+            self.executor.shutdown(wait=False)
+
+    def connect_and_auth(
+        self, account: WyzeAccount, camera: WyzeCamera, **kwargs: Any
+    ) -> "AsyncWyzeIOTCSession":
+        """Create a new session with the specified camera, for use with `async with`.
+
+        :param account: the account object returned from [wyzecam.api.get_user_info][]
+        :param camera: the camera object returned from [wyzecam.api.get_camera_list][]
+        :param kwargs: any other arguments to [WyzeIOTCSession][wyzecam.iotc.WyzeIOTCSession].
+        :returns: An [AsyncWyzeIOTCSession][wyzecam.aio.AsyncWyzeIOTCSession].
+        """
+        session = WyzeIOTCSession(
+            self.iotc.tutk_platform_lib, account, camera, **kwargs
+        )
+        return AsyncWyzeIOTCSession(session, self.executor)
+
+
+class AsyncWyzeIOTCSession:
+    """An asyncio-friendly wrapper around [WyzeIOTCSession][wyzecam.iotc.WyzeIOTCSession].
+
+    Constructed by [AsyncWyzeIOTC.connect_and_auth][wyzecam.aio.AsyncWyzeIOTC.connect_and_auth].
+    Cancelling a task that is connecting or streaming cleans up after itself: a pending
+    connection attempt is aborted, and receive buffers are only returned to the pool
+    once the worker thread is done with them.  A receive still running on a worker
+    thread when its task is cancelled is finished by the next `recv_video_data`, which
+    returns the frame it received, so that two receives never run on the same channel
+    at once.
+
+    :var session: the underlying, synchronous [WyzeIOTCSession][wyzecam.iotc.WyzeIOTCSession].
+    :var executor: the thread pool blocking calls are run on.
+    """
+
+    def __init__(
+        self, session: WyzeIOTCSession, executor: ThreadPoolExecutor
+    ) -> None:
+        self.session = session
+        self.executor = executor
+        # a receive left running by a cancelled recv_video_data, and the buffer it is
+        # receiving into; the next call picks up its frame.
+        self._pending_poll: Optional[
+            Tuple[
+                "Future[Tuple[int, Optional[bytes], Optional[FrameInfo]]]",
+                tutk.RecvBuffer,
+            ]
+        ] = None
+
+    @property
+    def state(self) -> WyzeIOTCSessionState:
+        """The current connection state of the underlying session."""
+        return self.session.state
+
+    async def __aenter__(self) -> "AsyncWyzeIOTCSession":
+        await self.connect()
+        await self.auth()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.disconnect()
+
+    async def connect(self) -> None:
+        """Connect to the camera; see `WyzeIOTCSession._connect`."""
+        future = self.executor.submit(self.session._connect)
+        try:
+            await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            if self.session.session_id is not None:
+                tutk.iotc_connect_stop_by_session_id(
+                    self.session.tutk_platform_lib, self.session.session_id
+                )
+            future.add_done_callback(lambda _: self.session._disconnect())
+            raise
+
+    async def auth(self) -> None:
+        """Authenticate with the camera; see `WyzeIOTCSession._auth`."""
+        future = self.executor.submit(self.session._auth)
+        try:
+            await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            future.add_done_callback(lambda _: self.session._disconnect())
+            raise
+
+    async def disconnect(self) -> None:
+        """Disconnect from the camera; see `WyzeIOTCSession._disconnect`."""
+        if self._pending_poll is not None:
+            (future, recv_buffer), self._pending_poll = self._pending_poll, None
+            future.add_done_callback(lambda _: recv_buffer.release())
+        await run_blocking(self.executor, self.session._disconnect)
+
+    async def session_check(self) -> tutk.SInfoStruct:
+        """See [WyzeIOTCSession.session_check][wyzecam.iotc.WyzeIOTCSession.session_check].
+
+        :returns: A [`tutk.SInfoStruct`][wyzecam.tutk.tutk.SInfoStruct]
+        """
+        return await run_blocking(self.executor, self.session.session_check)
+
+    async def recv_video_data(self) -> AsyncIterator[Tuple[bytes, FrameInfo]]:
+        """An async generator for returning raw video frames.
+
+        See [WyzeIOTCSession.recv_video_data][wyzecam.iotc.WyzeIOTCSession.recv_video_data].
+
+        ```python
+        async for (frame_data, frame_info) in session.recv_video_data():
+            ...
+        ```
+
+        :returns: An async generator, yielding tuples of the raw frame data (as bytes),
+                  and a [tutk.FrameInfoStruct][wyzecam.tutk.tutk.FrameInfoStruct].
+        """
+        session = self.session
+        assert session.av_chan_id is not None, "Please call connect() first!"
+
+        if session.receiver is not None:
+            async for frame in self._recv_from_receiver(session.receiver):
+                yield frame
+            return
+
+        future: Optional[
+            "Future[Tuple[int, Optional[bytes], Optional[FrameInfo]]]"
+        ] = None
+        if self._pending_poll is not None:
+            (future, recv_buffer), self._pending_poll = self._pending_poll, None
+        else:
+            acquiring = self.executor.submit(session.recv_buffer_pool.acquire)
+            try:
+                recv_buffer = await asyncio.wrap_future(acquiring)
+            except asyncio.CancelledError:
+                # the worker thread may still hand us a buffer nobody is waiting for.
+                acquiring.add_done_callback(_release_buffer)
+                raise
+        try:
+            while True:
+                if future is None:
+                    future = self.executor.submit(
+                        session._poll_frame_data, recv_buffer
+                    )
+                errno, frame_data, frame_info = await asyncio.wrap_future(
+                    future
+                )
+                future = None
+                if errno == tutk.AV_ER_DATA_NOREADY:
+                    await session.wait_policy.wait_async()
+                    continue
+                if frame_data is None or frame_info is None:
+                    continue
+                yield frame_data, frame_info
+        finally:
+            if (
+                future is not None
+                and not future.cancelled()
+                and (not future.done() or future.exception() is None)
+            ):
+                # cancelled while the worker thread is still receiving into this
+                # buffer: the next call waits for it, rather than receiving alongside.
+                self._pending_poll = future, recv_buffer
+            else:
+                recv_buffer.release()
+
+    async def recv_video_frame(
+        self,
+        thread_type: Optional[str] = None,
+        thread_count: Optional[int] = None,
+        decode_mode: DecodeMode = DecodeMode.ALL,
+        target_fps: Optional[float] = None,
+    ) -> AsyncIterator[Tuple["av.VideoFrame", FrameInfo]]:
+        """An async generator for returning decoded video frames.
+
+        See [WyzeIOTCSession.recv_video_frame][wyzecam.iotc.WyzeIOTCSession.recv_video_frame].
+        Decoding happens on the executor, including priming the decoder from the
+        session's gop cache, if it has one and the receiver is running.
+
+        :param thread_type: How the decoder should use threads; defaults to the
+                            session's `decoder_thread_type`.
+        :param thread_count: How many threads the decoder may use; defaults to the
+                             session's `decoder_thread_count`.
+        :param decode_mode: Which frames to decode and return.  See
+                            [DecodeMode][wyzecam.decode.DecodeMode].
+        :param target_fps: The maximum number of frames per second to return; defaults
+                           to the session's `target_fps`.  If set, `DecodeMode.ALL`
+                           becomes `DecodeMode.TARGET_FPS`.
+        :returns: An async generator, yielding tuples of a
+                  [PyAV VideoFrame](https://pyav.org/docs/stable/api/video.html#av.video.frame.VideoFrame),
+                  and a [tutk.FrameInfoStruct][wyzecam.tutk.tutk.FrameInfoStruct].
+        """
+        if av is None:
+            raise RuntimeError(
+                "recv_video_frame requires PyAv to parse video frames. "
+                "Install with `pip install av` and try again."
+            )
+
+        decoding = _DecodeLoop(
+            self.session, thread_type, thread_count, decode_mode, target_fps
+        )
+        for frame in await run_blocking(self.executor, decoding.prime):
+            yield frame
+        try:
+            async for frame_data, frame_info in self.recv_video_data():
+                frames = await run_blocking(
+                    self.executor, decoding.feed, frame_data, frame_info
+                )
+                for frame in frames:
+                    yield frame
+        except Exception:
+            for frame in await run_blocking(self.executor, decoding.flush):
+                yield frame
+            raise
+        for frame in await run_blocking(self.executor, decoding.flush):
+            yield frame
+
+    async def recv_video_frame_ndarray(
+        self,
+        thread_type: Optional[str] = None,
+        thread_count: Optional[int] = None,
+        decode_mode: DecodeMode = DecodeMode.ALL,
+        target_fps: Optional[float] = None,
+        format: str = "bgr24",
+        width: Optional[int] = None,
+        height: Optional[int] = None,
+        roi: Optional[Tuple[int, int, int, int]] = None,
+        output_ring: Optional[NdarrayRing] = None,
+        contiguous: bool = True,
+    ) -> AsyncIterator[Tuple["np.ndarray[Any, Any]", FrameInfo]]:
+        """An async generator for returning decoded video frames as numpy arrays.
+
+        See [WyzeIOTCSession.recv_video_frame_ndarray][wyzecam.iotc.WyzeIOTCSession.recv_video_frame_ndarray].
+        Decoding and color conversion happen on the executor.
+
+        :param thread_type: How the decoder should use threads; see `recv_video_frame`.
+        :param thread_count: How many threads the decoder may use; see `recv_video_frame`.
+        :param decode_mode: Which frames to decode and return; see `recv_video_frame`.
+        :param target_fps: The maximum number of frames per second to return; see
+                           `recv_video_frame`.
+        :param format: The pixel format of the images; see `recv_video_frame_ndarray`.
+        :param width: The width of the images.
+        :param height: The height of the images.
+        :param roi: A region of interest to crop the images to before scaling.
+        :param output_ring: An [NdarrayRing][wyzecam.frames.NdarrayRing] to convert
+                            images into, instead of allocating new arrays.
+        :param contiguous: If False, doorbell images may be returned as rotated views.
+        :returns: An async generator, yielding tuples of the decoded image (as a numpy array),
+                  and a [tutk.FrameInfoStruct][wyzecam.tutk.tutk.FrameInfoStruct].
+        """
+        if np is None:
+            raise RuntimeError(
+                "recv_video_frame_ndarray requires numpy to convert to a numpy array. "
+                "Install with `pip install numpy` and try again."
+            )
+
+        async for frame, frame_info in self.recv_video_frame(
+            thread_type, thread_count, decode_mode, target_fps
+        ):
+            img = await run_blocking(
+                self.executor,
+                self.session._frame_to_ndarray,
+                frame,
+                frame_info,
+                format,
+                width,
+                height,
+                roi,
+                output_ring,
+                contiguous,
+            )
+            yield img, frame_info
+
+    async def recv_video_frame_lazy(
+        self,
+        thread_type: Optional[str] = None,
+        thread_count: Optional[int] = None,
+        decode_mode: DecodeMode = DecodeMode.ALL,
+        target_fps: Optional[float] = None,
+        format: str = "bgr24",
+        width: Optional[int] = None,
+        height: Optional[int] = None,
+        roi: Optional[Tuple[int, int, int, int]] = None,
+        contiguous: bool = True,
+    ) -> AsyncIterator[DecodedFrame]:
+        """An async generator for returning decoded video frames, converted only on demand.
+
+        See [WyzeIOTCSession.recv_video_frame_lazy][wyzecam.iotc.WyzeIOTCSession.recv_video_frame_lazy].
+        Decoding happens on the executor; a handle's `ndarray()` converts on whichever
+        thread calls it, so use `run_in_executor` for large images.
+
+        :param thread_type: How the decoder should use threads; see `recv_video_frame`.
+        :param thread_count: How many threads the decoder may use; see `recv_video_frame`.
+        :param decode_mode: Which frames to decode and return; see `recv_video_frame`.
+        :param target_fps: The maximum number of frames per second to return; see
+                           `recv_video_frame`.
+        :param format: The pixel format `ndarray()` converts to.
+        :param width: The width of the images.
+        :param height: The height of the images.
+        :param roi: A region of interest to crop the images to before scaling.
+        :param contiguous: If False, doorbell images may be returned as rotated views.
+        :returns: An async generator of [DecodedFrame][wyzecam.decode.DecodedFrame]s.
+        """
+        if np is None:
+            raise RuntimeError(
+                "recv_video_frame_lazy requires numpy to convert to a numpy array. "
+                "Install with `pip install numpy` and try again."
+            )
+
+        convert = functools.partial(
+            self.session._frame_to_ndarray,
+            format=format,
+            width=width,
+            height=height,
+            roi=roi,
+            contiguous=contiguous,
+        )
+        async for frame, frame_info in self.recv_video_frame(
+            thread_type, thread_count, decode_mode, target_fps
+        ):
+            yield DecodedFrame(frame, frame_info, convert)
+
+    async def _recv_from_receiver(
+        self, receiver: FrameReceiver
+    ) -> AsyncIterator[Tuple[bytes, FrameInfo]]:
+        loop = asyncio.get_running_loop()
+        ready = asyncio.Event()
+
+        def wake() -> None:
+            # called from the receiver thread
+            try:
+                loop.call_soon_threadsafe(ready.set)
+            except RuntimeError:
+                pass  # the event loop has been closed
+
+        reader = receiver.open_reader()
+        reader.add_listener(wake)
+        try:
+            while True:
+                ready.clear()
+                frame = reader.get(timeout=0)
+                if frame is not None:
+                    yield frame
+                elif reader.closed:
+                    if receiver.error is not None:
+                        raise receiver.error
+                    return
+                else:
+                    await ready.wait()
+        finally:
+            reader.remove_listener(wake)
+            receiver.close_reader(reader)
+
+
+def _release_buffer(future: "Future[tutk.RecvBuffer]") -> None:
+    if not future.cancelled() and future.exception() is None:
+        future.result().release()
+
+
+async def run_blocking(
+    executor: ThreadPoolExecutor, fn: Callable[..., T], *args: Any
+) -> T:
+    """Run a blocking function on `executor`, without blocking the event loop.
+
+    :param executor: the thread pool to run `fn` on.
+    :param fn: the function to run.
+    :param args: the arguments to pass to `fn`.
+    :returns: the result of `fn`.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(fn, *args))
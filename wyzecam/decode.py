@@ -0,0 +1,667 @@
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Generic,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+import enum
+import warnings
+from collections import deque
+
+from wyzecam.latency import camera_timestamp
+from wyzecam.tutk import tutk
+
+try:
+    import av
+except ImportError:
+    av = None  # type: ignore
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None  # type: ignore
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # type: ignore
+
+if TYPE_CHECKING:
+    from wyzecam.frames import NdarrayRing
+
+FrameInfo = Union[tutk.FrameInfoStruct, tutk.FrameInfo3Struct]
+T = TypeVar("T")
+
+
+def codec_name_from_frameinfo(frame_info: FrameInfo) -> str:
+    """The name of the PyAV codec used to decode a frame.
+
+    :param frame_info: the metadata of the frame.
+    :returns: "h264" or "hevc".
+    """
+    if frame_info.codec_id == 75:
+        return "h264"
+    elif frame_info.codec_id == 78:
+        return "h264"
+    elif frame_info.codec_id == 80:
+        return "hevc"
+    warnings.warn(f"Unexpected codec! got {frame_info.codec_id}.")
+    return "h264"
+
+
+OUTPUT_FORMATS = ("bgr24", "rgb24", "gray", "yuv420p")
+"""
+The pixel formats [frame_to_ndarray][wyzecam.decode.frame_to_ndarray] can produce.
+"yuv420p" arrays hold the Y plane in the first `height` rows, followed by the U and V
+planes, each reshaped to `height / 4` rows of `width` pixels.
+"""
+
+
+def frame_to_ndarray(
+    frame: "av.VideoFrame",
+    format: str = "bgr24",
+    width: Optional[int] = None,
+    height: Optional[int] = None,
+    roi: Optional[Tuple[int, int, int, int]] = None,
+    rotate: bool = False,
+    out_ring: "Optional[NdarrayRing]" = None,
+    contiguous: bool = True,
+) -> "np.ndarray[Any, Any]":
+    """Convert a decoded frame to a numpy array, in a single pixel format conversion.
+
+    Cropping to `roi` happens on the decoded (yuv) planes, and scaling and pixel format
+    conversion are done together by swscale, so a full resolution BGR image is never
+    created unless that is what was asked for.
+
+    :param frame: a [PyAV VideoFrame](https://pyav.org/docs/stable/api/video.html#av.video.frame.VideoFrame).
+    :param format: the pixel format of the array; one of
+                   [OUTPUT_FORMATS][wyzecam.decode.OUTPUT_FORMATS].
+    :param width: the width of the array.  If only one of `width` and `height` is
+                  given, the other is chosen to keep the aspect ratio.
+    :param height: the height of the array.
+    :param roi: a region of interest to crop to before scaling, as (x, y, width,
+                height), in the coordinates of the (rotated) full resolution image.
+                Rounded to even numbers of pixels.
+    :param rotate: rotate the image 90 degrees clockwise (for the wyze doorbell,
+                   whose frames are sent sideways).  `width`, `height` and `roi` all
+                   refer to the rotated image.  The rotation is done on whichever is
+                   smaller of the decoded yuv planes and the converted image, so it
+                   costs no more than one extra copy of 1.5 bytes per pixel.
+    :param out_ring: an [NdarrayRing][wyzecam.frames.NdarrayRing] to convert into,
+                     instead of allocating a new array.  Full size conversions of
+                     yuv420p frames are done without allocating anything (color
+                     conversion requires [PyOpenCV](https://pypi.org/project/opencv-python/));
+                     anything else is converted as usual and copied into the ring.
+    :param contiguous: if False, a rotated "bgr24", "rgb24" or "gray" image is returned
+                       as a rotated (non-contiguous) view of the converted image,
+                       which costs nothing at all.  Not used with `out_ring`.
+    :returns: a numpy array; (height, width, 3) for "bgr24" and "rgb24", (height, width)
+              for "gray", and (height * 3 / 2, width) for "yuv420p".
+    """
+    assert format in OUTPUT_FORMATS, f"Unsupported output format {format}"
+    if out_ring is not None:
+        if (
+            width is None
+            and height is None
+            and roi is None
+            and frame.format.name == "yuv420p"
+            and frame.width % 2 == frame.height % 2 == 0
+            and (format in ("gray", "yuv420p") or cv2 is not None)
+        ):
+            return _convert_into_ring(frame, format, rotate, out_ring)
+        img = frame_to_ndarray(frame, format, width, height, roi, rotate)
+        out = out_ring.acquire(img.shape, img.dtype)
+        np.copyto(out, img)
+        return out
+
+    if roi is not None:
+        x, y, roi_width, roi_height = roi
+        if rotate:
+            x, y, roi_width, roi_height = (
+                y,
+                frame.height - x - roi_width,
+                roi_height,
+                roi_width,
+            )
+        frame = _crop(frame, x, y, roi_width, roi_height)
+
+    src_width, src_height = frame.width, frame.height
+    if rotate:
+        src_width, src_height = src_height, src_width
+    if width is None and height is not None:
+        width = _even(src_width * height / src_height)
+    elif height is None and width is not None:
+        height = _even(src_height * width / src_width)
+    width = width or src_width
+    height = height or src_height
+
+    if (
+        rotate
+        and (contiguous or format == "yuv420p")
+        and _rotate_planes_first(frame, format, width, height)
+    ):
+        frame, rotate = _rotate_planes(frame), False
+    if rotate:
+        img = frame.reformat(
+            width=height, height=width, format=format
+        ).to_ndarray()
+        return _rotate(img, format, contiguous)
+    return frame.reformat(
+        width=width, height=height, format=format
+    ).to_ndarray()
+
+
+def _convert_into_ring(
+    frame: "av.VideoFrame", format: str, rotate: bool, ring: "NdarrayRing"
+) -> "np.ndarray[Any, Any]":
+    width, height = frame.width, frame.height
+    out_width, out_height = (height, width) if rotate else (width, height)
+    if format == "gray":
+        # the Y plane is limited range; gray is full range, like swscale produces.
+        luma = ring.scratch(out_width * out_height).reshape(
+            out_height, out_width
+        )
+        _copy_plane(frame.planes[0], width, height, luma, rotate)
+        out = ring.acquire((out_height, out_width))
+        np.take(_limited_to_full_range(), luma, out=out, mode="clip")
+        return out
+
+    # gather (and rotate) the planes into one contiguous I420 image; rotating here
+    # moves 1.5 bytes per pixel, rather than 3 after color conversion.
+    i420_shape = (out_height * 3 // 2, out_width)
+    if format == "yuv420p":
+        i420 = ring.acquire(i420_shape)
+    else:
+        i420 = ring.scratch(out_width * i420_shape[0]).reshape(i420_shape)
+    flat = i420.reshape(-1)
+    y_size = out_width * out_height
+    _copy_plane(
+        frame.planes[0],
+        width,
+        height,
+        flat[:y_size].reshape(out_height, out_width),
+        rotate,
+    )
+    for i, start in ((1, y_size), (2, y_size * 5 // 4)):
+        _copy_plane(
+            frame.planes[i],
+            width // 2,
+            height // 2,
+            flat[start : start + y_size // 4].reshape(
+                out_height // 2, out_width // 2
+            ),
+            rotate,
+        )
+    if format == "yuv420p":
+        return i420
+
+    out = ring.acquire((out_height, out_width, 3))
+    code = (
+        cv2.COLOR_YUV2BGR_I420 if format == "bgr24" else cv2.COLOR_YUV2RGB_I420
+    )
+    cv2.cvtColor(i420, code, dst=out)
+    return out
+
+
+_LIMITED_TO_FULL_RANGE: "Optional[np.ndarray[Any, Any]]" = None
+
+
+def _limited_to_full_range() -> "np.ndarray[Any, Any]":
+    global _LIMITED_TO_FULL_RANGE
+    if _LIMITED_TO_FULL_RANGE is None:
+        levels = (np.arange(256) - 16) * 255 / 219
+        _LIMITED_TO_FULL_RANGE = np.clip(np.round(levels), 0, 255).astype(
+            np.uint8
+        )
+    return _LIMITED_TO_FULL_RANGE
+
+
+def _copy_plane(
+    plane: Any,
+    width: int,
+    height: int,
+    dst: "np.ndarray[Any, Any]",
+    rotate: bool,
+) -> None:
+    src = np.frombuffer(memoryview(plane), np.uint8)
+    src = src.reshape(-1, plane.line_size)[:height, :width]
+    np.copyto(dst, np.rot90(src, 3) if rotate else src)
+
+
+def _even(value: float) -> int:
+    return max(2, int(round(value / 2)) * 2)
+
+
+def _crop(
+    frame: "av.VideoFrame", x: int, y: int, width: int, height: int
+) -> "av.VideoFrame":
+    if frame.format.name not in ("yuv420p", "yuvj420p"):
+        frame = frame.reformat(format="yuv420p")
+    # chroma planes are subsampled 2x2, so the region must be aligned to 2 pixels.
+    x, y = max(x, 0) & ~1, max(y, 0) & ~1
+    width = min(width, frame.width - x) & ~1
+    height = min(height, frame.height - y) & ~1
+    cropped = av.VideoFrame(width, height, frame.format.name)
+    for i, (src, dst) in enumerate(zip(frame.planes, cropped.planes)):
+        shift = 1 if i else 0
+        src_rows = np.frombuffer(memoryview(src), np.uint8).reshape(
+            -1, src.line_size
+        )
+        dst_rows = np.frombuffer(memoryview(dst), np.uint8).reshape(
+            -1, dst.line_size
+        )
+        dst_rows[: height >> shift, : width >> shift] = src_rows[
+            y >> shift : (y + height) >> shift,
+            x >> shift : (x + width) >> shift,
+        ]
+    return cropped
+
+
+_BYTES_PER_PIXEL = {"bgr24": 3.0, "rgb24": 3.0, "gray": 1.0, "yuv420p": 1.5}
+
+
+def _rotate_planes_first(
+    frame: "av.VideoFrame", format: str, width: int, height: int
+) -> bool:
+    # rotating moves every byte once, so rotate whichever of the decoded planes and
+    # the converted image is smaller; e.g. 1.5 rather than 3 bytes per pixel for bgr24.
+    if frame.format.name not in ("yuv420p", "yuvj420p"):
+        return False
+    if frame.width % 2 or frame.height % 2:
+        return False
+    converted_bytes = width * height * _BYTES_PER_PIXEL[format]
+    return converted_bytes > frame.width * frame.height * 1.5
+
+
+def _rotate_planes(frame: "av.VideoFrame") -> "av.VideoFrame":
+    rotated = av.VideoFrame(frame.height, frame.width, frame.format.name)
+    for i, (src, dst) in enumerate(zip(frame.planes, rotated.planes)):
+        shift = 1 if i else 0
+        dst_rows = np.frombuffer(memoryview(dst), np.uint8).reshape(
+            -1, dst.line_size
+        )
+        _copy_plane(
+            src,
+            frame.width >> shift,
+            frame.height >> shift,
+            dst_rows[: frame.width >> shift, : frame.height >> shift],
+            rotate=True,
+        )
+    return rotated
+
+
+def _rotate(
+    img: "np.ndarray[Any, Any]", format: str, contiguous: bool = True
+) -> "np.ndarray[Any, Any]":
+    if format != "yuv420p":
+        rotated = np.rot90(img, 3)
+        return np.ascontiguousarray(rotated) if contiguous else rotated
+    width = img.shape[1]
+    height = img.shape[0] * 2 // 3
+    y_size = width * height
+    planes = [
+        img.reshape(-1)[:y_size].reshape(height, width),
+        img.reshape(-1)[y_size : y_size * 5 // 4].reshape(height // 2, -1),
+        img.reshape(-1)[y_size * 5 // 4 :].reshape(height // 2, -1),
+    ]
+    rotated = np.concatenate(
+        [np.rot90(plane, 3).reshape(-1) for plane in planes]
+    )
+    return rotated.reshape(-1, height)
+
+
+class FrameDecoder(Generic[T]):
+    """
+    Wraps a PyAV decoder, pairing each decoded frame with the metadata of the compressed
+    frame it was decoded from.
+
+    A decoder doesn't return one frame per packet: a frame-threaded decoder returns each
+    frame `thread_count - 1` packets late, and only hands over the last ones when it is
+    flushed.  Each packet is therefore stamped with a sequence number as its pts, and
+    every frame that comes out is looked up by its pts, rather than assumed to belong to
+    the packet that was just fed in.
+
+    ```python
+    decoder = FrameDecoder(av.CodecContext.create("h264", "r"))
+    for frame_data, frame_info in sess.recv_video_data():
+        for frame, info in decoder.decode(frame_data, frame_info):
+            ...
+    ```
+
+    :var codec: the PyAV codec context.
+    :var codec_name: the name of the codec, e.g. "h264" or "hevc".
+    :vartype codec_name: str
+    """
+
+    def __init__(self, codec: Any) -> None:
+        """Construct a FrameDecoder
+
+        :param codec: a PyAV codec context, opened for decoding.
+        """
+        self.codec = codec
+        self.codec_name: str = codec.name
+        self._next_pts = 0
+        # (metadata, output) of the packets whose frames haven't come out yet
+        self._pending: Dict[int, Tuple[T, bool]] = {}
+
+    def decode(
+        self,
+        frame_data: Union[bytes, memoryview],
+        frame_info: T,
+        output: bool = True,
+    ) -> "List[Tuple[av.VideoFrame, T]]":
+        """Feed a compressed frame to the decoder.
+
+        :param frame_data: the raw frame data; every frame from the camera is a complete
+                           access unit.
+        :param frame_info: the metadata of the frame, returned along with its decoded
+                           frame.
+        :param output: whether the decoded frame should be returned; if False, it is
+                       only decoded for the sake of the frames that depend on it.
+        :returns: a list of (frame, frame_info) tuples, for whichever frames the decoder
+                  returned; not necessarily including this one.
+        """
+        # running the data through codec.parse() would hold each frame back until the
+        # next one arrives.  The packet owns a copy of the data, as frame-threaded
+        # decoders keep referring to it after decode() returns.
+        packet = av.Packet(len(frame_data))
+        memoryview(packet)[:] = frame_data
+        packet.pts = self._next_pts
+        self._pending[self._next_pts] = (frame_info, output)
+        self._next_pts += 1
+        return self._match(self.codec.decode(packet))
+
+    def flush(self) -> "List[Tuple[av.VideoFrame, T]]":
+        """Drain the decoder of the frames it is still holding.
+
+        The decoder can't be used after this.
+
+        :returns: a list of (frame, frame_info) tuples.
+        """
+        frames = self._match(self.codec.decode(None))
+        self._pending.clear()
+        return frames
+
+    def _match(
+        self, frames: "List[av.VideoFrame]"
+    ) -> "List[Tuple[av.VideoFrame, T]]":
+        matched = []
+        for frame in frames:
+            if frame.pts is None or frame.pts not in self._pending:
+                continue
+            # frames come out in order, so any earlier packet that hasn't produced one
+            # by now was skipped (e.g. with skip_frame) or failed to decode
+            for pts in list(self._pending):
+                if pts >= frame.pts:
+                    break
+                del self._pending[pts]
+            frame_info, output = self._pending.pop(frame.pts)
+            if output:
+                matched.append((frame, frame_info))
+        return matched
+
+
+class DecodedFrame:
+    """
+    A handle to a decoded video frame, which is only converted to a numpy array if and
+    when it is needed.
+
+    Yielded by [WyzeIOTCSession.recv_video_frame_lazy][wyzecam.iotc.WyzeIOTCSession.recv_video_frame_lazy].
+    Every frame is still decoded (the decoder needs them all), but pixel format
+    conversion, scaling and rotation are pay-per-use, so filtering on the frame's
+    metadata first is cheap:
+
+    ```python
+    for frame in sess.recv_video_frame_lazy():
+        if frame.is_keyframe:
+            thumbnail(frame.ndarray())
+    ```
+
+    `ndarray()` converts the frame on its first call and caches the result.  Note that
+    each handle keeps its decoded frame alive, so don't hold on to many of them.
+
+    :var frame_info: the metadata of the frame, as a
+                     [tutk.FrameInfoStruct][wyzecam.tutk.tutk.FrameInfoStruct].
+    """
+
+    __slots__ = ("frame_info", "_frame", "_convert", "_ndarray")
+
+    def __init__(
+        self,
+        frame: "av.VideoFrame",
+        frame_info: FrameInfo,
+        convert: "Optional[Callable[[av.VideoFrame, FrameInfo], np.ndarray[Any, Any]]]" = None,
+    ) -> None:
+        """Construct a DecodedFrame
+
+        :param frame: the decoded [PyAV VideoFrame](https://pyav.org/docs/stable/api/video.html#av.video.frame.VideoFrame).
+        :param frame_info: the metadata of the frame.
+        :param convert: a function converting the frame to a numpy array, given the
+                        frame and its frame_info.  Defaults to a full size bgr24 image,
+                        rotated for doorbells.
+        """
+        self.frame_info = frame_info
+        self._frame = frame
+        self._convert = convert
+        self._ndarray: "Optional[np.ndarray[Any, Any]]" = None
+
+    @property
+    def frame_no(self) -> int:
+        """The frame number."""
+        return int(self.frame_info.frame_no)
+
+    @property
+    def is_keyframe(self) -> bool:
+        """Whether this is a keyframe."""
+        return bool(self.frame_info.is_keyframe)
+
+    @property
+    def timestamp(self) -> float:
+        """The camera's timestamp for this frame, in seconds since the epoch."""
+        return camera_timestamp(self.frame_info)
+
+    @property
+    def rotated(self) -> bool:
+        """Whether the frame is sent sideways, and rotated when converted (doorbells)."""
+        return self.frame_info.frame_size in (3, 4)
+
+    def av_frame(self) -> "av.VideoFrame":
+        """The decoded frame, as a PyAV VideoFrame, without any conversion."""
+        return self._frame
+
+    def ndarray(self) -> "np.ndarray[Any, Any]":
+        """The frame as a numpy array, converted on the first call."""
+        if self._ndarray is None:
+            if self._convert is not None:
+                self._ndarray = self._convert(self._frame, self.frame_info)
+            else:
+                self._ndarray = frame_to_ndarray(
+                    self._frame, rotate=self.rotated
+                )
+        return self._ndarray
+
+    def __repr__(self) -> str:
+        return (
+            f"<DecodedFrame frame_no={self.frame_no} keyframe={self.is_keyframe} "
+            f"converted={self._ndarray is not None}>"
+        )
+
+
+class DecodeMode(enum.Enum):
+    """Which frames a decode generator such as
+    [WyzeIOTCSession.recv_video_frame][wyzecam.iotc.WyzeIOTCSession.recv_video_frame]
+    decodes and returns."""
+
+    ALL = "all"
+    """Decode and return every frame"""
+
+    KEYFRAMES = "keyframes"
+    """Only decode and return keyframes; every other frame is dropped before it
+    reaches the decoder."""
+
+    TARGET_FPS = "target_fps"
+    """Return frames at no more than a target frame rate, decoding as few frames
+    as possible to do so; see [FrameDecimator][wyzecam.decode.FrameDecimator] for how
+    few that is."""
+
+
+class FrameDecimator:
+    """
+    Decides which compressed frames need to reach the decoder, and which decoded
+    frames are returned, for a given [DecodeMode][wyzecam.decode.DecodeMode].
+
+    With `DecodeMode.TARGET_FPS`, a frame is returned whenever at least
+    `1 / target_fps` seconds (by the camera's timestamps) have passed since the last one.
+    A P-frame can only be decoded if every frame since the last keyframe has been, so
+    frames between outputs are still decoded, but with the decoder's `skip_frame` set to
+    skip any that aren't used as a reference.  Once the next output is not due until
+    after the next keyframe is expected, the rest of the group of pictures is dropped
+    before it reaches the decoder.
+
+    Note that the cameras typically send I- and P-frames only, each P-frame a reference
+    for the next, so `skip_frame` rarely saves anything: within a group of pictures,
+    every frame up to the last output is decoded, whatever the target.  The savings
+    come from dropping the rest of each group of pictures, and so are largest when
+    `target_fps` is at or below the keyframe rate; then nothing but keyframes is
+    decoded.  This takes effect from the second keyframe, as the keyframe interval is
+    only known once a whole group of pictures has been seen.
+
+    The effective input and output frame rates, over the last `rate_window` frames,
+    are available as `input_fps` and `output_fps`.
+
+    :var mode: the [DecodeMode][wyzecam.decode.DecodeMode].
+    :var target_fps: the maximum number of frames per second to return.
+    :vartype target_fps: float
+    :var frames_in: the number of frames passed to `plan()`.
+    :vartype frames_in: int
+    :var frames_decoded: the number of frames that had to be decoded.
+    :vartype frames_decoded: int
+    :var frames_out: the number of frames that were to be returned.
+    :vartype frames_out: int
+    :var rate_window: the number of frames the input and output rates are measured over.
+    :vartype rate_window: int
+    """
+
+    def __init__(
+        self,
+        mode: DecodeMode = DecodeMode.ALL,
+        target_fps: Optional[float] = None,
+        rate_window: int = 100,
+    ) -> None:
+        """Construct a FrameDecimator
+
+        :param mode: the [DecodeMode][wyzecam.decode.DecodeMode].
+        :param target_fps: the maximum number of frames per second to return; required
+                           for `DecodeMode.TARGET_FPS`.
+        :param rate_window: the number of frames the input and output rates are
+                            measured over.
+        """
+        if mode == DecodeMode.TARGET_FPS:
+            assert target_fps, "DecodeMode.TARGET_FPS requires a target_fps"
+        self.mode = mode
+        self.target_fps = target_fps
+        self.frames_in = 0
+        self.frames_decoded = 0
+        self.frames_out = 0
+        self.rate_window = rate_window
+        # (camera time, output) of recent frames, and how many of them are output
+        self._recent: Deque[Tuple[float, bool]] = deque(maxlen=rate_window)
+        self._recent_outputs = 0
+        self._next_due: Optional[float] = None
+        self._last_keyframe: Optional[float] = None
+        self._gop_duration: Optional[float] = None
+        self._skipping_gop = False
+
+    def plan(self, frame_info: FrameInfo) -> Tuple[bool, bool]:
+        """Decide what to do with the next compressed frame.
+
+        :param frame_info: the metadata of the frame.
+        :returns: a tuple of (decode, output): whether the frame must be passed to the
+                  decoder, and whether its decoded image should be returned.
+        """
+        self.frames_in += 1
+        if self.mode == DecodeMode.ALL:
+            decode = output = True
+        elif self.mode == DecodeMode.KEYFRAMES:
+            decode = output = bool(frame_info.is_keyframe)
+        else:
+            decode, output = self._plan_target_fps(frame_info)
+        self.frames_decoded += decode
+        self.frames_out += output
+        if len(self._recent) == self.rate_window:
+            self._recent_outputs -= self._recent[0][1]
+        self._recent.append((camera_timestamp(frame_info), output))
+        self._recent_outputs += output
+        return decode, output
+
+    @property
+    def input_fps(self) -> float:
+        """The recent rate of frames passed to `plan()`, by the camera's timestamps."""
+        return self._rate(len(self._recent) - 1)
+
+    @property
+    def output_fps(self) -> float:
+        """The recent rate of frames to be returned, by the camera's timestamps."""
+        if not self._recent:
+            return 0.0
+        return self._rate(self._recent_outputs - self._recent[0][1])
+
+    def _rate(self, frames: int) -> float:
+        # the first frame in the window only marks when the window starts
+        if len(self._recent) < 2:
+            return 0.0
+        duration = self._recent[-1][0] - self._recent[0][0]
+        return frames / duration if duration > 0 else 0.0
+
+    def skip_frame(self, output: bool) -> str:
+        """The decoder `skip_frame` setting to use for a frame.
+
+        :param output: whether the frame's decoded image will be returned.
+        :returns: "DEFAULT", or "NONREF" if the frame is only decoded for the sake of
+                  the frames that depend on it.  On streams where every frame is a
+                  reference, as from the cameras, "NONREF" skips nothing.
+        """
+        if self.mode == DecodeMode.TARGET_FPS and not output:
+            return "NONREF"
+        return "DEFAULT"
+
+    def _plan_target_fps(self, frame_info: FrameInfo) -> Tuple[bool, bool]:
+        assert self.target_fps is not None
+        interval = 1 / self.target_fps
+        now = camera_timestamp(frame_info)
+
+        if frame_info.is_keyframe:
+            if self._last_keyframe is not None and now > self._last_keyframe:
+                self._gop_duration = now - self._last_keyframe
+            self._last_keyframe = now
+            self._skipping_gop = False
+        elif self._skipping_gop or self._last_keyframe is None:
+            return False, False
+        last_keyframe = self._last_keyframe
+
+        due = self._next_due
+        # allow for camera timestamps that jitter a little around the frame interval
+        if due is None or now >= due - interval / 10:
+            if due is None or due + interval <= now:
+                # don't try to catch up after a gap in the stream
+                self._next_due = now + interval
+            else:
+                self._next_due = due + interval
+            return True, True
+
+        if (
+            self._gop_duration is not None
+            and due >= last_keyframe + self._gop_duration
+        ):
+            # nothing in the rest of this group of pictures will be returned
+            self._skipping_gop = True
+            return False, False
+        return True, False
@@ -0,0 +1,501 @@
+from typing import Any, Deque, Dict, List, Optional, Tuple, Union
+
+import collections
+import itertools
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future
+from multiprocessing import resource_tracker
+from multiprocessing.connection import Connection
+from multiprocessing.shared_memory import SharedMemory
+
+from wyzecam.decode import FrameDecoder, frame_to_ndarray
+from wyzecam.frames import NdarrayRing
+from wyzecam.tutk import tutk
+
+try:
+    import av
+except ImportError:
+    av = None  # type: ignore
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # type: ignore
+
+FrameInfo = Union[tutk.FrameInfoStruct, tutk.FrameInfo3Struct]
+
+
+class DecoderPool:
+    """
+    A pool of worker processes that decode video frames, and hand the decoded images
+    back through shared memory.
+
+    Decoding in the consuming process means every camera's decoder competes for the
+    same GIL.  With a DecoderPool, each stream is assigned to one of the worker
+    processes (a stream's frames must all go through the same decoder), so decoding many
+    cameras scales across cores.  Decoded images are written straight into a ring of
+    slots in a `multiprocessing.shared_memory` block belonging to the stream, so no image
+    is ever pickled; only the compressed frame is sent to the worker.  Each stream keeps
+    up to `max_in_flight` frames queued up for its worker, so receiving the next frame
+    overlaps with decoding the last one.
+
+    ```python
+    with DecoderPool(workers=4) as pool:
+        with wyze_iotc.connect_and_auth(account, camera) as sess:
+            for (frame, frame_info) in sess.recv_video_frame_ndarray(decoder_pool=pool):
+                ...
+    ```
+
+    Images are returned as numpy arrays viewing a stream's shared memory, in the format
+    and size requested when the stream was opened.  Each one is only valid until
+    `slots_per_stream` more images have been returned from the same stream; copy it if
+    you need to keep it for longer.
+
+    In order to use this, you will need to install [PyAV](https://pyav.org/docs/stable/)
+    and [numpy](https://numpy.org/).
+
+    :var workers: the number of worker processes.
+    :vartype workers: int
+    :var slots_per_stream: the number of decoded images each stream can hold at once.
+    :vartype slots_per_stream: int
+    :var max_in_flight: the number of frames each stream can have queued up for
+                        decoding at once.
+    :vartype max_in_flight: int
+    :var slot_size: the size of each slot, i.e. the largest image that can be decoded,
+                    in bytes.
+    :vartype slot_size: int
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        slots_per_stream: int = 4,
+        max_width: int = 1920,
+        max_height: int = 1080,
+        mp_context: Optional[Any] = None,
+        max_in_flight: int = 2,
+    ) -> None:
+        """Construct a DecoderPool
+
+        The worker processes are started by `start()`, or on entering the context manager.
+
+        :param workers: the number of worker processes; defaults to the number of CPUs.
+        :param slots_per_stream: the number of decoded images each stream can hold at
+                                 once; see above.
+        :param max_width: the widest image the decoders will produce.
+        :param max_height: the tallest image the decoders will produce.  Rotated
+                           (doorbell) images fit as long as they have no more pixels
+                           than `max_width` x `max_height`.
+        :param mp_context: the `multiprocessing` context used to start the workers;
+                           defaults to "spawn", as forking a process that is running
+                           receive threads (and the TUTK library's own threads) isn't
+                           safe.
+        :param max_in_flight: the number of frames each stream can have queued up for
+                              decoding at once.
+        """
+        if av is None or np is None:
+            raise RuntimeError(
+                "DecoderPool requires PyAv and numpy. "
+                "Install with `pip install av numpy` and try again."
+            )
+        self.workers = workers or os.cpu_count() or 1
+        self.slots_per_stream = slots_per_stream
+        self.max_in_flight = max_in_flight
+        self.slot_size = max_width * max_height * 3
+        self._mp_context = mp_context or multiprocessing.get_context("spawn")
+        self._workers: List[_DecoderWorker] = []
+        self._stream_ids = itertools.count()
+
+    def __enter__(self) -> "DecoderPool":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def start(self) -> None:
+        """Start the worker processes."""
+        if self._workers:
+            return
+        # workers need to share this process's resource tracker; otherwise each one
+        # would try to clean up the shared memory it attaches to when it exits.
+        resource_tracker.ensure_running()
+        self._workers = [
+            _DecoderWorker(self._mp_context, i) for i in range(self.workers)
+        ]
+
+    def close(self) -> None:
+        """Stop the worker processes."""
+        workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.close()
+
+    def open_stream(
+        self,
+        codec_name: str,
+        format: str = "bgr24",
+        width: Optional[int] = None,
+        height: Optional[int] = None,
+        roi: Optional[Tuple[int, int, int, int]] = None,
+    ) -> "DecoderStream":
+        """Start decoding a new stream, on the least busy worker.
+
+        :param codec_name: the PyAV codec to decode with, e.g. "h264" or "hevc".
+        :param format: the pixel format of the decoded images.
+        :param width: the width of the decoded images.
+        :param height: the height of the decoded images.
+        :param roi: a region of interest to crop the decoded images to.
+                    See [frame_to_ndarray][wyzecam.decode.frame_to_ndarray] for details
+                    of these options.
+        :returns: a [DecoderStream][wyzecam.decoder_pool.DecoderStream].
+        """
+        assert self._workers, "Please call start() first!"
+        worker = min(self._workers, key=lambda w: w.streams)
+        output_options = {
+            "format": format,
+            "width": width,
+            "height": height,
+            "roi": roi,
+        }
+        return DecoderStream(
+            self, worker, next(self._stream_ids), codec_name, output_options
+        )
+
+
+class DecoderStream:
+    """
+    A single video stream being decoded by a [DecoderPool][wyzecam.decoder_pool.DecoderPool].
+
+    Constructed by [DecoderPool.open_stream][wyzecam.decoder_pool.DecoderPool.open_stream].
+
+    :var stream_id: the id of this stream, unique within its pool.
+    :vartype stream_id: int
+    :var codec_name: the PyAV codec the stream is decoded with.
+    :vartype codec_name: str
+    :var shared_memory: the block of shared memory decoded images are returned in.
+    """
+
+    def __init__(
+        self,
+        pool: DecoderPool,
+        worker: "_DecoderWorker",
+        stream_id: int,
+        codec_name: str,
+        output_options: Dict[str, Any],
+    ) -> None:
+        self.stream_id = stream_id
+        self.codec_name = codec_name
+        self._worker = worker
+        self._max_in_flight = pool.max_in_flight
+        # the worker may be writing the images of every frame in flight while the
+        # consumer still holds on to slots_per_stream earlier ones.
+        self._slots = pool.slots_per_stream + pool.max_in_flight
+        self._slot_size = pool.slot_size
+        self.shared_memory = SharedMemory(
+            create=True, size=self._slots * self._slot_size
+        )
+        self._closed = False
+        self._seq = itertools.count()
+        self._in_flight: (
+            "Deque[Future[List[Tuple[int, int, Tuple[int, ...]]]]]"
+        ) = collections.deque()
+        self._frame_infos: Dict[int, FrameInfo] = {}
+        worker.request(
+            (
+                "open",
+                stream_id,
+                codec_name,
+                self.shared_memory.name,
+                self._slots,
+                self._slot_size,
+                output_options,
+            )
+        )
+        worker.streams += 1
+
+    def __enter__(self) -> "DecoderStream":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def decode(
+        self,
+        frame_data: Union[bytes, memoryview],
+        frame_info: FrameInfo,
+        skip_frame: str = "DEFAULT",
+        output: bool = True,
+    ) -> "List[Tuple[np.ndarray[Any, Any], FrameInfo]]":
+        """Queue a compressed frame up for decoding.
+
+        This only waits for the worker if `max_in_flight` frames are already queued up;
+        the decoded image is returned by a later call, or by `flush()`.
+
+        :param frame_data: the raw frame data.
+        :param frame_info: the metadata of the frame.
+        :param skip_frame: the decoder `skip_frame` setting to decode this frame with.
+        :param output: whether the decoded image should be returned; if False, the frame
+                       is only decoded for the sake of the frames that depend on it.
+        :returns: a list of (image, frame_info) tuples for whichever frames have been
+                  decoded since the last call, with each image as a numpy array viewing
+                  this stream's shared memory.
+        """
+        assert not self._closed, "This stream has been closed!"
+        results = []
+        if len(self._in_flight) >= self._max_in_flight:
+            results += self._collect(self._in_flight.popleft())
+        seq = next(self._seq)
+        self._frame_infos[seq] = frame_info
+        self._in_flight.append(
+            self._worker.send(
+                (
+                    "decode",
+                    self.stream_id,
+                    seq,
+                    bytes(frame_data),
+                    frame_info.frame_size in (3, 4),
+                    skip_frame,
+                    output,
+                )
+            )
+        )
+        while self._in_flight and self._in_flight[0].done():
+            results += self._collect(self._in_flight.popleft())
+        return results
+
+    def flush(self) -> "List[Tuple[np.ndarray[Any, Any], FrameInfo]]":
+        """Wait for every frame in flight to be decoded, and drain the decoder.
+
+        The stream can't decode any more frames after this.
+
+        :returns: a list of (image, frame_info) tuples; see `decode()`.
+        """
+        assert not self._closed, "This stream has been closed!"
+        results = []
+        while self._in_flight:
+            results += self._collect(self._in_flight.popleft())
+        results += self._collect(self._worker.send(("flush", self.stream_id)))
+        self._frame_infos.clear()
+        return results
+
+    def _collect(
+        self, future: "Future[List[Tuple[int, int, Tuple[int, ...]]]]"
+    ) -> "List[Tuple[np.ndarray[Any, Any], FrameInfo]]":
+        results = []
+        for seq, slot, shape in future.result():
+            # frames come out in order; earlier ones that didn't were skipped
+            for pending in list(self._frame_infos):
+                if pending >= seq:
+                    break
+                del self._frame_infos[pending]
+            img: "np.ndarray[Any, Any]" = np.ndarray(
+                shape,
+                dtype=np.uint8,
+                buffer=self.shared_memory.buf,
+                offset=slot * self._slot_size,
+            )
+            results.append((img, self._frame_infos.pop(seq)))
+        return results
+
+    def close(self) -> None:
+        """Stop decoding this stream, and free its shared memory.
+
+        Any frames still in flight are dropped.  Images still referenced remain readable
+        until they are garbage collected.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._worker.streams -= 1
+        self._in_flight.clear()
+        try:
+            self._worker.request(("close", self.stream_id))
+        except (EOFError, OSError, RuntimeError):
+            pass  # the worker has already gone away.
+        self.shared_memory.unlink()
+        try:
+            self.shared_memory.close()
+        except BufferError:
+            # images are still viewing the memory; it is released along with them.
+            pass
+
+
+class _DecoderWorker:
+    # requests are answered in order, so each reply resolves the oldest pending future.
+    def __init__(self, mp_context: Any, index: int) -> None:
+        self.streams = 0
+        self._lock = threading.Lock()
+        self._pending: "Deque[Future[Any]]" = collections.deque()
+        self._alive = True
+        self._conn, child_conn = mp_context.Pipe()
+        self._process = mp_context.Process(
+            target=_worker_main,
+            args=(child_conn,),
+            name=f"wyzecam-decoder-{index}",
+            daemon=True,
+        )
+        self._process.start()
+        child_conn.close()
+        self._reader = threading.Thread(
+            target=self._read_replies,
+            name=f"wyzecam-decoder-{index}-replies",
+            daemon=True,
+        )
+        self._reader.start()
+
+    def send(self, message: Tuple[Any, ...]) -> "Future[Any]":
+        future: "Future[Any]" = Future()
+        with self._lock:
+            if not self._alive:
+                raise EOFError("The decoder process has exited")
+            self._pending.append(future)
+            self._conn.send(message)
+        return future
+
+    def request(self, message: Tuple[Any, ...]) -> Any:
+        return self.send(message).result()
+
+    def _read_replies(self) -> None:
+        try:
+            while True:
+                status, result = self._conn.recv()
+                future = self._pending.popleft()
+                if status == "error":
+                    future.set_exception(
+                        RuntimeError(f"Decoder process failed: {result}")
+                    )
+                else:
+                    future.set_result(result)
+        except (EOFError, OSError):
+            pass
+        with self._lock:
+            self._alive = False
+            while self._pending:
+                self._pending.popleft().set_exception(
+                    EOFError("The decoder process has exited")
+                )
+
+    def close(self) -> None:
+        with self._lock:
+            try:
+                self._conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        self._process.join(5)
+        if self._process.is_alive():
+            self._process.terminate()
+        self._reader.join()
+        self._conn.close()
+
+
+class _SlotRing(NdarrayRing):
+    # converts images straight into a stream's shared memory slots, round robin.
+    def __init__(
+        self, shared_memory: SharedMemory, slots: int, slot_size: int
+    ) -> None:
+        super().__init__(slots)
+        self.shared_memory = shared_memory
+        self.slot_size = slot_size
+        self.last_slot = -1
+
+    def acquire(
+        self, shape: Tuple[int, ...], dtype: Any = None
+    ) -> "np.ndarray[Any, Any]":
+        dtype = np.dtype(dtype or np.uint8)
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        if nbytes > self.slot_size:
+            raise ValueError(
+                f"{shape} image does not fit in a {self.slot_size} byte slot; "
+                "increase the pool's max_width and max_height."
+            )
+        self.last_slot = (self.last_slot + 1) % self.size
+        out: "np.ndarray[Any, Any]" = np.ndarray(
+            shape,
+            dtype=dtype,
+            buffer=self.shared_memory.buf,
+            offset=self.last_slot * self.slot_size,
+        )
+        return out
+
+
+class _WorkerStream:
+    def __init__(
+        self,
+        codec_name: str,
+        shm_name: str,
+        slots: int,
+        slot_size: int,
+        output_options: Dict[str, Any],
+    ) -> None:
+        # each frame's metadata is its (seq, rotate)
+        self.decoder: FrameDecoder[Tuple[int, bool]] = FrameDecoder(
+            av.CodecContext.create(codec_name, "r")
+        )
+        # workers share the pool's resource tracker, so attaching here doesn't
+        # register the block a second time; the pool unlinks it.
+        self.shared_memory = SharedMemory(name=shm_name)
+        self.ring = _SlotRing(self.shared_memory, slots, slot_size)
+        self.output_options = output_options
+
+    def decode(
+        self,
+        seq: int,
+        frame_data: bytes,
+        rotate: bool,
+        skip_frame: str,
+        output: bool,
+    ) -> List[Tuple[int, int, Tuple[int, ...]]]:
+        self.decoder.codec.skip_frame = skip_frame
+        return self._convert(
+            self.decoder.decode(frame_data, (seq, rotate), output)
+        )
+
+    def flush(self) -> List[Tuple[int, int, Tuple[int, ...]]]:
+        return self._convert(self.decoder.flush())
+
+    def _convert(
+        self, frames: "List[Tuple[av.VideoFrame, Tuple[int, bool]]]"
+    ) -> List[Tuple[int, int, Tuple[int, ...]]]:
+        results = []
+        for frame, (seq, rotate) in frames:
+            img = frame_to_ndarray(
+                frame, rotate=rotate, out_ring=self.ring, **self.output_options
+            )
+            results.append((seq, self.ring.last_slot, img.shape))
+        return results
+
+    def close(self) -> None:
+        del self.ring
+        self.shared_memory.close()
+
+
+def _worker_main(conn: Connection) -> None:
+    streams: Dict[int, _WorkerStream] = {}
+    try:
+        while True:
+            try:
+                message = conn.recv()
+            except EOFError:
+                break
+            if message is None:
+                break
+            op, stream_id, *args = message
+            try:
+                result: Any = None
+                if op == "open":
+                    streams[stream_id] = _WorkerStream(*args)
+                elif op == "decode":
+                    result = streams[stream_id].decode(*args)
+                elif op == "flush":
+                    result = streams[stream_id].flush()
+                elif op == "close":
+                    streams.pop(stream_id).close()
+                conn.send(("ok", result))
+            except Exception as e:
+                conn.send(("error", repr(e)))
+    finally:
+        for stream in streams.values():
+            stream.close()
+        conn.close()
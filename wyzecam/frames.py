@@ -0,0 +1,283 @@
+from typing import Any, Iterator, List, Optional, Tuple, Union
+
+import array
+import ctypes
+
+from wyzecam.tutk import tutk
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # type: ignore
+
+FrameInfo = Union[tutk.FrameInfoStruct, tutk.FrameInfo3Struct]
+
+
+def _frame_info_dtype() -> "np.dtype[Any]":
+    # numpy understands ctypes structures, and lays the fields out identically;
+    # only the mac address needs to become a proper byte string.
+    fields = np.dtype(tutk.FrameInfo3Struct).fields
+    assert fields is not None
+    names = [field[0] for field in tutk.FrameInfo3Struct._fields_]
+    return np.dtype(
+        {
+            "names": names,
+            "formats": [
+                "S12" if name == "ac_mac_addr" else fields[name][0]
+                for name in names
+            ],
+            "offsets": [fields[name][1] for name in names],
+            "itemsize": ctypes.sizeof(tutk.FrameInfo3Struct),
+        }
+    )
+
+
+FRAME_INFO_DTYPE: "Optional[np.dtype[Any]]" = None
+"""
+A numpy structured dtype mirroring [tutk.FrameInfo3Struct][wyzecam.tutk.tutk.FrameInfo3Struct]
+(and so, for its first 40 bytes, [tutk.FrameInfoStruct][wyzecam.tutk.tutk.FrameInfoStruct]).
+Frames described by a `FrameInfoStruct` have their `face_*` fields set to 0.
+None if numpy is not installed.
+"""
+if np is not None:
+    FRAME_INFO_DTYPE = _frame_info_dtype()
+
+
+class FrameBatch:
+    """
+    A batch of raw video frames, stored back to back in a single contiguous buffer.
+
+    Returned by [WyzeIOTCSession.recv_video_data_batch][wyzecam.iotc.WyzeIOTCSession.recv_video_data_batch].
+    Frame `i` occupies `payload[offsets[i]:offsets[i + 1]]`; indexing or iterating over the
+    batch yields (memoryview, frame_info) tuples without copying any frame data.
+
+    ```python
+    batch = sess.recv_video_data_batch()
+    output_file.write(batch.payload)  # all of the frames at once
+    for frame_data, frame_info in batch:
+        ...
+    ```
+
+    :var payload: the frame data of every frame in this batch, concatenated.
+    :vartype payload: bytearray
+    :var offsets: the start offset of each frame in `payload`, followed by the total
+                  length of the payload; always one longer than the number of frames.
+    :vartype offsets: array.array
+    :var frame_infos: the metadata of each frame in this batch.
+    """
+
+    def __init__(self) -> None:
+        self.payload = bytearray()
+        self.offsets = array.array("L", [0])
+        self.frame_infos: List[FrameInfo] = []
+
+    def append(
+        self, frame_data: Union[bytes, memoryview], frame_info: FrameInfo
+    ) -> None:
+        """Copy a frame onto the end of this batch.
+
+        :param frame_data: the raw frame data.
+        :param frame_info: the metadata of the frame.
+        """
+        self.payload += frame_data
+        self.offsets.append(len(self.payload))
+        self.frame_infos.append(frame_info)
+
+    @property
+    def nbytes(self) -> int:
+        """The total size of the frame data in this batch, in bytes."""
+        return len(self.payload)
+
+    def __len__(self) -> int:
+        return len(self.frame_infos)
+
+    def __getitem__(self, i: int) -> Tuple[memoryview, FrameInfo]:
+        frame_info = self.frame_infos[i]
+        if i < 0:
+            i += len(self)
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return memoryview(self.payload)[start:end], frame_info
+
+    def __iter__(self) -> Iterator[Tuple[memoryview, FrameInfo]]:
+        payload = memoryview(self.payload)
+        for i, frame_info in enumerate(self.frame_infos):
+            yield payload[self.offsets[i] : self.offsets[i + 1]], frame_info
+
+    def __repr__(self) -> str:
+        return f"<FrameBatch frames={len(self)} nbytes={self.nbytes}>"
+
+
+class FrameInfoStore:
+    """
+    A growable, compact log of frame metadata, backed by a numpy structured array
+    with the [FRAME_INFO_DTYPE][wyzecam.frames.FRAME_INFO_DTYPE] layout.
+
+    Each frame costs 48 bytes, and appending one is a single memory copy, which makes
+    this far cheaper than keeping hundreds of ctypes structs alive in a list.  Fields
+    are available as numpy arrays for windowed statistics or logging:
+
+    ```python
+    store = FrameInfoStore()
+    sess = WyzeIOTCSession(lib, account, camera, frame_info_store=store)
+    ...
+    sizes = store["frame_len"]
+    keyframes = store.array[store["is_keyframe"] == 1]
+    ```
+
+    In order to use this, you will need to install [numpy](https://numpy.org/).
+
+    :var itemsize: the size of each row, in bytes.
+    :vartype itemsize: int
+    """
+
+    def __init__(self, capacity: int = 1024) -> None:
+        """Construct an empty FrameInfoStore
+
+        :param capacity: the number of rows to preallocate; the store doubles in size
+                         whenever it runs out of room.
+        """
+        if np is None:
+            raise RuntimeError(
+                "FrameInfoStore requires numpy. "
+                "Install with `pip install numpy` and try again."
+            )
+        self.itemsize = ctypes.sizeof(tutk.FrameInfo3Struct)
+        self._rows = np.zeros(max(capacity, 1), dtype=FRAME_INFO_DTYPE)
+        self._address = self._rows.ctypes.data
+        self._len = 0
+
+    def append(self, frame_info: FrameInfo) -> None:
+        """Add a row to the end of the store.
+
+        :param frame_info: the metadata of a frame.
+        """
+        if self._len == len(self._rows):
+            self._grow()
+        row_address = self._address + self._len * self.itemsize
+        size = ctypes.sizeof(frame_info)
+        ctypes.memmove(row_address, ctypes.addressof(frame_info), size)
+        if size < self.itemsize:
+            ctypes.memset(row_address + size, 0, self.itemsize - size)
+        self._len += 1
+
+    def clear(self) -> None:
+        """Remove every row from the store, keeping the allocated memory."""
+        self._len = 0
+
+    @property
+    def array(self) -> "np.ndarray[Any, Any]":
+        """A view of every row in the store, as a numpy structured array."""
+        return self._rows[: self._len]
+
+    @property
+    def nbytes(self) -> int:
+        """The number of bytes used by the rows in this store."""
+        return self._len * self.itemsize
+
+    def _grow(self) -> None:
+        rows = np.zeros(len(self._rows) * 2, dtype=FRAME_INFO_DTYPE)
+        rows[: self._len] = self._rows[: self._len]
+        self._rows = rows
+        self._address = rows.ctypes.data
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __getitem__(self, key: Any) -> Any:
+        return self.array[key]
+
+
+class NdarrayRing:
+    """
+    A fixed ring of preallocated numpy arrays, that decoded images are converted into.
+
+    Converting every frame into a brand new 1080p array means allocating (and later
+    freeing) ~6 MB per frame.  Passing one of these to
+    [WyzeIOTCSession.recv_video_frame_ndarray][wyzecam.iotc.WyzeIOTCSession.recv_video_frame_ndarray]
+    makes steady-state decoding allocation free; arrays are only (re)allocated when the
+    size of the video changes.
+
+    ```python
+    ring = NdarrayRing(size=4)
+    for (frame, frame_info) in sess.recv_video_frame_ndarray(output_ring=ring):
+        ...
+    ```
+
+    Each array returned is owned by the ring, with one of two ownership rules:
+
+     - by default, an array is valid until `size` more frames have been converted, after
+       which it is overwritten.  Copy it if you need to keep it for longer.
+     - with `explicit_release=True`, an array is never reused until it is handed back
+       with `release()`.  Once every array is held, converting another frame raises a
+       RuntimeError.
+
+    :var size: the number of arrays in the ring.
+    :vartype size: int
+    :var explicit_release: whether arrays must be released before they are reused.
+    :vartype explicit_release: bool
+    :var allocations: the number of arrays allocated so far.
+    :vartype allocations: int
+    """
+
+    def __init__(self, size: int = 4, explicit_release: bool = False) -> None:
+        if np is None:
+            raise RuntimeError(
+                "NdarrayRing requires numpy. "
+                "Install with `pip install numpy` and try again."
+            )
+        assert size >= 1, "NdarrayRing needs at least one array"
+        self.size = size
+        self.explicit_release = explicit_release
+        self.allocations = 0
+        self._arrays: "List[Optional[np.ndarray[Any, Any]]]" = [None] * size
+        self._held = [False] * size
+        self._next = 0
+        self._scratch: "Optional[np.ndarray[Any, Any]]" = None
+
+    def acquire(
+        self, shape: Tuple[int, ...], dtype: Any = None
+    ) -> "np.ndarray[Any, Any]":
+        """Take the next array in the ring.
+
+        :param shape: the shape of the array needed.
+        :param dtype: the dtype of the array needed; defaults to uint8.
+        :returns: an array of that shape and dtype, with undefined contents.
+        """
+        dtype = np.dtype(dtype or np.uint8)
+        for _ in range(self.size):
+            i = self._next
+            self._next = (i + 1) % self.size
+            if self._held[i]:
+                continue
+            array = self._arrays[i]
+            if array is None or array.shape != shape or array.dtype != dtype:
+                array = self._arrays[i] = np.empty(shape, dtype)
+                self.allocations += 1
+            self._held[i] = self.explicit_release
+            return array
+        raise RuntimeError(
+            f"All {self.size} arrays in the ring are held! Release arrays once you "
+            "are done with them, or increase the size of the ring."
+        )
+
+    def release(self, array: "np.ndarray[Any, Any]") -> None:
+        """Hand an array back to the ring, so that it can be reused.
+
+        :param array: an array returned by this ring.
+        """
+        for i, owned in enumerate(self._arrays):
+            if owned is array:
+                self._held[i] = False
+                return
+        raise ValueError("This array does not belong to this ring")
+
+    def scratch(self, nbytes: int) -> "np.ndarray[Any, Any]":
+        """A reusable scratch buffer, for intermediate steps of a conversion.
+
+        :param nbytes: the size of the buffer needed.
+        :returns: a 1-dimensional uint8 array of that size, valid until the next call.
+        """
+        if self._scratch is None or len(self._scratch) < nbytes:
+            self._scratch = np.empty(nbytes, np.uint8)
+            self.allocations += 1
+        return self._scratch[:nbytes]
@@ -0,0 +1,415 @@
+from typing import Deque, Dict, List, Optional, Union
+
+import datetime
+import io
+import math
+import os
+import struct
+from collections import deque
+
+from wyzecam.decode import codec_name_from_frameinfo
+from wyzecam.recording import FrameInfo, _SegmentMuxer
+
+try:
+    import av
+except ImportError:
+    av = None  # type: ignore
+
+FRAGMENTED_MP4_FLAGS = "frag_keyframe+empty_moov+default_base_moof"
+"""The `movflags` used to write fragmented MP4 that starts each fragment on a keyframe."""
+
+
+class MemoryStore:
+    """
+    Keeps the files of an [HlsSegmenter][wyzecam.hls.HlsSegmenter] in memory, e.g. to
+    serve them from a web application.
+
+    :var files: the contents of each file, by name.
+    :vartype files: Dict[str, bytes]
+    """
+
+    def __init__(self) -> None:
+        self.files: Dict[str, bytes] = {}
+
+    def put(self, name: str, data: bytes) -> None:
+        """Store a file, replacing any previous version of it."""
+        self.files[name] = data
+
+    def get(self, name: str) -> bytes:
+        """The contents of a file.
+
+        Raises KeyError if it doesn't exist (anymore), e.g. a segment that has since
+        left the playlist.
+        """
+        return self.files[name]
+
+    def delete(self, name: str) -> None:
+        """Remove a file, if it exists."""
+        self.files.pop(name, None)
+
+
+class DirectoryStore:
+    """
+    Writes the files of an [HlsSegmenter][wyzecam.hls.HlsSegmenter] into a directory,
+    e.g. one served by a web server.
+
+    Each file is written under a temporary name and then renamed into place, so that a
+    client never reads a partially written playlist or segment.
+
+    :var path: the directory the files are written to.
+    :vartype path: str
+    """
+
+    def __init__(self, path: str) -> None:
+        """Construct a DirectoryStore, creating the directory if needed."""
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def put(self, name: str, data: bytes) -> None:
+        """Write a file, replacing any previous version of it."""
+        path = os.path.join(self.path, name)
+        with open(path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)
+
+    def delete(self, name: str) -> None:
+        """Remove a file, if it exists."""
+        try:
+            os.remove(os.path.join(self.path, name))
+        except FileNotFoundError:
+            pass
+
+
+Store = Union[MemoryStore, DirectoryStore]
+
+
+class HlsSegmenter:
+    """
+    Packages raw video frames as a live HLS stream of fragmented MP4, without decoding
+    or re-encoding them.
+
+    Frames from [recv_video_data][wyzecam.iotc.WyzeIOTCSession.recv_video_data] are
+    stream-copied into fragmented MP4, with one fragment per group of pictures.
+    Fragments are gathered into media segments of at least `fragment_duration`
+    seconds, so every segment starts on a keyframe; each is published to the store
+    along with a playlist of the last `window` segments, which browsers (through
+    hls.js) and most players can play directly.
+
+    ```python
+    segmenter = HlsSegmenter("/var/www/front-door", fragment_duration=2, window=6)
+    with segmenter:
+        for frame_data, frame_info in sess.recv_video_data():
+            segmenter.write(frame_data, frame_info)
+    ```
+
+    The stream is only restarted if the camera changes codec or resolution, in which
+    case a new initialization segment is written and the playlist marks a
+    discontinuity.  Segments leave the store a further `window` segments after they
+    leave the playlist, so that clients which have just loaded an older playlist can
+    still fetch them.
+
+    In order to use this, you will need to install [PyAV](https://pyav.org/docs/stable/).
+
+    :var store: where the playlist and segments are written.
+    :var fragment_duration: the minimum duration of each media segment, in seconds.
+    :vartype fragment_duration: float
+    :var window: the number of media segments listed in the playlist.
+    :vartype window: int
+    :var playlist_name: the name of the playlist in the store.
+    :vartype playlist_name: str
+    """
+
+    def __init__(
+        self,
+        store: Union[str, Store],
+        fragment_duration: float = 2.0,
+        window: int = 6,
+        playlist_name: str = "live.m3u8",
+        init_template: str = "init-{index}.mp4",
+        segment_template: str = "segment-{sequence:06d}.m4s",
+    ) -> None:
+        """Construct an HlsSegmenter
+
+        :param store: a directory to write the files to, or a
+                      [MemoryStore][wyzecam.hls.MemoryStore] or
+                      [DirectoryStore][wyzecam.hls.DirectoryStore].
+        :param fragment_duration: the duration to cut media segments at; each
+                                  segment is cut on the first keyframe after it
+                                  reaches this many seconds.
+        :param window: the number of media segments to list in the playlist.
+        :param playlist_name: the name of the playlist.
+        :param init_template: the name of each initialization segment, formatted with
+                              `index`, the number of times the stream was (re)started.
+        :param segment_template: the name of each media segment, formatted with
+                                 `sequence`, its media sequence number.
+        """
+        if av is None:
+            raise RuntimeError(
+                "HlsSegmenter requires PyAv to write video segments. "
+                "Install with `pip install av` and try again."
+            )
+        self.store: Store = (
+            DirectoryStore(store) if isinstance(store, str) else store
+        )
+        self.fragment_duration = fragment_duration
+        self.window = window
+        self.playlist_name = playlist_name
+        self.init_template = init_template
+        self.segment_template = segment_template
+
+        self._segments: Deque[_MediaSegment] = deque()
+        self._retired: Deque[_MediaSegment] = deque()
+        self._sequence = 0
+        self._discontinuity_sequence = 0
+        self._target_duration = max(math.ceil(fragment_duration), 1)
+        self._ended = False
+
+        self._init_index = 0
+        self._init_name: Optional[str] = None
+        self._discontinuity = False
+        self._muxer: Optional[_SegmentMuxer] = None
+        self._writer: Optional[_FragmentWriter] = None
+        self._keyframe_pts: Deque[int] = deque()
+        self._pending: List[bytes] = []
+        self._pending_start = 0.0
+        self._pending_duration = 0.0
+
+    def __enter__(self) -> "HlsSegmenter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def write(
+        self, frame_data: Union[bytes, memoryview], frame_info: FrameInfo
+    ) -> None:
+        """Add a frame to the stream.
+
+        Frames before the first keyframe are dropped, as they can't be decoded.
+
+        :param frame_data: the raw frame data.
+        :param frame_info: the metadata of the frame.
+        """
+        muxer = self._muxer
+        if frame_info.is_keyframe and (
+            muxer is None
+            or muxer.codec_name != codec_name_from_frameinfo(frame_info)
+            or muxer.frame_size != frame_info.frame_size
+        ):
+            self._stop()
+            muxer = self._start(frame_data, frame_info)
+        if muxer is None:
+            return
+        muxer.write(frame_data, frame_info)
+        if frame_info.is_keyframe:
+            # with frag_keyframe, the muxer completes a fragment when it is given the
+            # keyframe starting the next one, which is also where that fragment ends.
+            self._keyframe_pts.append(muxer.last_pts)
+        self._collect_fragments(muxer)
+
+    def close(self) -> None:
+        """Complete the stream, publishing the remaining frames and ending the playlist."""
+        self._stop()
+        self._ended = True
+        self._publish_playlist()
+
+    def playlist(self) -> str:
+        """The current media playlist."""
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:7",
+            f"#EXT-X-TARGETDURATION:{self._target_duration}",
+            f"#EXT-X-MEDIA-SEQUENCE:{self._sequence}",
+            f"#EXT-X-DISCONTINUITY-SEQUENCE:{self._discontinuity_sequence}",
+            "#EXT-X-INDEPENDENT-SEGMENTS",
+        ]
+        init_name = None
+        for segment in self._segments:
+            if segment.discontinuity:
+                lines.append("#EXT-X-DISCONTINUITY")
+            if segment.init_name != init_name:
+                lines.append(f'#EXT-X-MAP:URI="{segment.init_name}"')
+                init_name = segment.init_name
+            start = datetime.datetime.fromtimestamp(
+                segment.start, datetime.timezone.utc
+            )
+            lines += [
+                "#EXT-X-PROGRAM-DATE-TIME:"
+                + start.isoformat(timespec="milliseconds"),
+                f"#EXTINF:{segment.duration:.3f},",
+                segment.name,
+            ]
+        if self._ended:
+            lines.append("#EXT-X-ENDLIST")
+        return "\n".join(lines) + "\n"
+
+    def _start(
+        self, frame_data: Union[bytes, memoryview], frame_info: FrameInfo
+    ) -> _SegmentMuxer:
+        codec_name = codec_name_from_frameinfo(frame_info)
+        self._init_name = self.init_template.format(index=self._init_index)
+        self._discontinuity = self._init_index > 0
+        self._init_index += 1
+        self._writer = _FragmentWriter()
+        self._muxer = _SegmentMuxer(
+            self._writer,
+            "mp4",
+            codec_name,
+            frame_data,
+            frame_info,
+            options={"movflags": FRAGMENTED_MP4_FLAGS},
+        )
+        return self._muxer
+
+    def _stop(self) -> None:
+        muxer, self._muxer = self._muxer, None
+        if muxer is None:
+            return
+        # the last fragment is written on close, and ends with the last frame
+        muxer.close()
+        assert self._writer is not None
+        self._writer.close()
+        self._keyframe_pts.append(muxer.end_pts)
+        self._collect_fragments(muxer)
+        self._keyframe_pts.clear()
+        self._publish_segment()
+
+    def _collect_fragments(self, muxer: _SegmentMuxer) -> None:
+        assert self._writer is not None
+        if self._writer.init is not None:
+            assert self._init_name is not None
+            self.store.put(self._init_name, self._writer.init)
+            self._writer.init = None
+        while self._writer.fragments:
+            fragment = self._writer.fragments.popleft()
+            start = self._keyframe_pts.popleft()
+            end = self._keyframe_pts[0]
+            if not self._pending:
+                self._pending_start = muxer.start + start / 1000
+            self._pending.append(fragment)
+            self._pending_duration += (end - start) / 1000
+            if self._pending_duration >= self.fragment_duration:
+                self._publish_segment()
+
+    def _publish_segment(self) -> None:
+        if not self._pending:
+            return
+        assert self._init_name is not None
+        segment = _MediaSegment(
+            self.segment_template.format(
+                sequence=self._sequence + len(self._segments)
+            ),
+            self._init_name,
+            self._pending_start,
+            self._pending_duration,
+            self._discontinuity,
+        )
+        self.store.put(segment.name, b"".join(self._pending))
+        self._pending = []
+        self._pending_duration = 0.0
+        self._discontinuity = False
+
+        self._segments.append(segment)
+        # EXTINF durations, rounded, must not exceed the target duration
+        self._target_duration = max(
+            self._target_duration, int(segment.duration + 0.5)
+        )
+        while len(self._segments) > self.window:
+            removed = self._segments.popleft()
+            self._sequence += 1
+            if removed.discontinuity:
+                self._discontinuity_sequence += 1
+            self._retired.append(removed)
+        self._publish_playlist()
+        self._delete_retired()
+
+    def _publish_playlist(self) -> None:
+        self.store.put(self.playlist_name, self.playlist().encode())
+
+    def _delete_retired(self) -> None:
+        # RFC 8216 section 6.2.2: segments must stay available for a while after
+        # leaving the playlist, for clients that loaded it just before.
+        while len(self._retired) > self.window:
+            removed = self._retired.popleft()
+            self.store.delete(removed.name)
+            if removed.init_name != self._init_name and not any(
+                segment.init_name == removed.init_name
+                for segment in (*self._retired, *self._segments)
+            ):
+                self.store.delete(removed.init_name)
+
+
+class _MediaSegment:
+    __slots__ = ("name", "init_name", "start", "duration", "discontinuity")
+
+    def __init__(
+        self,
+        name: str,
+        init_name: str,
+        start: float,
+        duration: float,
+        discontinuity: bool,
+    ) -> None:
+        self.name = name
+        self.init_name = init_name
+        self.start = start
+        self.duration = duration
+        self.discontinuity = discontinuity
+
+
+class _FragmentWriter(io.RawIOBase):
+    # receives the muxer's output and splits it into top-level MP4 boxes: the
+    # ftyp and moov boxes form the initialization segment, and each moof box and the
+    # mdat box after it form a fragment.  Anything else (e.g. the mfra index written
+    # on close) is dropped.  A box with a size of 0 runs to the end of the output, so
+    # it is only added once the writer is closed.
+    def __init__(self) -> None:
+        super().__init__()
+        self.init: Optional[bytes] = None
+        self.fragments: Deque[bytes] = deque()
+        self._buffer = bytearray()
+        self._header = bytearray()
+        self._moof: Optional[bytes] = None
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b: bytes) -> int:  # type: ignore[override]
+        self._buffer += b
+        while len(self._buffer) >= 8:
+            size, box_type = struct.unpack_from(">I4s", self._buffer)
+            header_len = 8
+            if size == 0:
+                break
+            if size == 1:
+                if len(self._buffer) < 16:
+                    break
+                size = struct.unpack_from(">Q", self._buffer, 8)[0]
+                header_len = 16
+            if size < header_len:
+                raise ValueError(f"Invalid size {size} of MP4 box {box_type!r}")
+            if len(self._buffer) < size:
+                break
+            box = bytes(self._buffer[:size])
+            del self._buffer[:size]
+            self._add_box(box_type, box)
+        return len(b)
+
+    def close(self) -> None:
+        if not self.closed and len(self._buffer) >= 8:
+            size, box_type = struct.unpack_from(">I4s", self._buffer)
+            if size == 0:
+                self._add_box(box_type, bytes(self._buffer))
+            self._buffer.clear()
+        super().close()
+
+    def _add_box(self, box_type: bytes, box: bytes) -> None:
+        if box_type == b"ftyp":
+            self._header = bytearray(box)
+        elif box_type == b"moov":
+            self.init = bytes(self._header + box)
+        elif box_type == b"moof":
+            self._moof = box
+        elif box_type == b"mdat" and self._moof is not None:
+            self.fragments.append(self._moof + box)
+            self._moof = None
@@ -1,13 +1,34 @@
-from typing import Any, Dict, Iterator, Optional, Tuple, Union
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 
 import enum
+import functools
 import logging
 import pathlib
 import time
-import warnings
 from ctypes import CDLL, c_int
+from queue import Empty
 
 from wyzecam.api_models import WyzeAccount, WyzeCamera
+from wyzecam.decode import (
+    DecodedFrame,
+    DecodeMode,
+    FrameDecimator,
+    FrameDecoder,
+    codec_name_from_frameinfo,
+    frame_to_ndarray,
+)
+from wyzecam.decoder_pool import DecoderPool, DecoderStream
+from wyzecam.frames import FrameBatch, FrameInfoStore, NdarrayRing
+from wyzecam.latency import FrameLatencyTracker
+from wyzecam.metrics import MetricsRegistry, SessionMetrics
+from wyzecam.overlay import TextOverlay
+from wyzecam.receiver import (
+    DropPolicy,
+    FrameReceiver,
+    FrameRingBuffer,
+    GopCache,
+)
+from wyzecam.stats import RecvStats, StreamStats
 
 try:
     import av
@@ -15,11 +36,6 @@ try:
 except ImportError:
     av = None
 
-try:
-    import cv2
-except ImportError:
-    cv2 = None
-
 try:
     import numpy as np
 except ImportError:
@@ -33,6 +49,7 @@ from wyzecam.tutk.tutk_protocol import (
     K10056SetResolvingBit,
     respond_to_ioctrl_10001,
 )
+from wyzecam.wait_policy import AdaptiveWaitPolicy, WaitPolicy
 
 logger = logging.getLogger(__name__)
 
@@ -139,7 +156,7 @@ class WyzeIOTC:
         self.deinitialize()
 
     def connect_and_auth(
-        self, account: WyzeAccount, camera: WyzeCamera
+        self, account: WyzeAccount, camera: WyzeCamera, **kwargs: Any
     ) -> "WyzeIOTCSession":
         """Initialize a new iotc session with the specified camera, and account information.
 
@@ -156,9 +173,13 @@ class WyzeIOTC:
 
         :param account: the account object returned from [wyzecam.api.get_user_info][]
         :param camera: the camera object returned from [wyzecam.api.get_camera_list][]
+        :param kwargs: any other arguments to [WyzeIOTCSession](../iotc_session/), e.g.
+                       `metrics` or `gop_cache`.
         :returns: An object representing the Wyze IOTC Session, a [WyzeIOTCSession](../iotc_session/)
         """
-        return WyzeIOTCSession(self.tutk_platform_lib, account, camera)
+        return WyzeIOTCSession(
+            self.tutk_platform_lib, account, camera, **kwargs
+        )
 
 
 class WyzeIOTCSessionState(enum.IntEnum):
@@ -226,6 +247,32 @@ class WyzeIOTCSession:
     :var av_chan_id: The AV channel of this session, once connected.
     :var state: The current connection state of this session.  See
                 [WyzeIOTCSessionState](../iotc_session_state/).
+    :var recv_buffer_pool: The pool of preallocated buffers video frames are received
+                           into.  See [wyzecam.tutk.tutk.RecvBufferPool][].
+    :var wait_policy: Decides how long to wait when the camera has no frame ready, and
+                      records the time spent waiting vs. receiving.  See
+                      [wyzecam.wait_policy.WaitPolicy][].
+    :var receiver: The background receiver thread, if one has been started with
+                   `start_receiver()`.
+    :var frame_info_store: If set, the metadata of every frame received is appended to
+                           this [FrameInfoStore][wyzecam.frames.FrameInfoStore].
+    :var recv_stats: Counters of frames received, lost, skipped, etc.  See
+                     [wyzecam.stats.RecvStats][].
+    :var latency_tracker: If set, records per-frame receive, decode, and delivery times.
+                          See [wyzecam.latency.FrameLatencyTracker][].
+    :var gop_cache: If set, holds the most recent group of pictures, used to start
+                    decoding instantly.  See [wyzecam.receiver.GopCache][].
+    :var decoder_thread_type: The default threading mode for video decoders: "FRAME",
+                              "SLICE", or "AUTO".  If None, PyAV's default is used.
+    :var decoder_thread_count: The default number of decoder threads; 0 lets the
+                               decoder pick based on the number of CPUs.
+    :var target_fps: If set, the default maximum number of frames per second decoded
+                     and returned by `recv_video_frame` and friends.
+    :var decimator: The [FrameDecimator][wyzecam.decode.FrameDecimator] of the most
+                    recently started decoding generator, which reports its input and
+                    output frame rates.
+    :var metrics: If set, the [SessionMetrics][wyzecam.metrics.SessionMetrics] this
+                  session and its ioctrl muxes are instrumented with.
     """
 
     def __init__(
@@ -235,6 +282,16 @@ class WyzeIOTCSession:
         camera: WyzeCamera,
         frame_size: int = tutk.FRAME_SIZE_1080P,
         bitrate: int = tutk.BITRATE_HD,
+        recv_buffer_pool_size: int = 4,
+        max_frame_size: int = tutk.DEFAULT_MAX_FRAME_SIZE,
+        wait_policy: Optional[WaitPolicy] = None,
+        frame_info_store: Optional[FrameInfoStore] = None,
+        latency_tracker: Optional[FrameLatencyTracker] = None,
+        gop_cache: Optional[GopCache] = None,
+        decoder_thread_type: Optional[str] = None,
+        decoder_thread_count: Optional[int] = None,
+        target_fps: Optional[float] = None,
+        metrics: Optional[MetricsRegistry] = None,
     ) -> None:
         """Construct a wyze iotc session
 
@@ -248,6 +305,36 @@ class WyzeIOTCSession:
                            See [wyzecam.tutk.tutk.FRAME_SIZE_1080P][].
         :param bitrate: Configures the bitrate of the video stream returned by the camera.
                         See [wyzecam.tutk.tutk.BITRATE_HD][].
+        :param recv_buffer_pool_size: The maximum number of receive buffers this session
+                                      will allocate.  Buffers are only allocated when
+                                      needed, and are reused for every frame received.
+        :param max_frame_size: The size of each receive buffer, i.e. the largest video
+                               frame this session can receive, in bytes.
+        :param wait_policy: A [WaitPolicy][wyzecam.wait_policy.WaitPolicy] deciding how long
+                            to wait when no frame is ready.  Defaults to an
+                            [AdaptiveWaitPolicy][wyzecam.wait_policy.AdaptiveWaitPolicy].
+        :param frame_info_store: A [FrameInfoStore][wyzecam.frames.FrameInfoStore] to append
+                                 the metadata of every frame received to.
+        :param latency_tracker: A [FrameLatencyTracker][wyzecam.latency.FrameLatencyTracker]
+                                to record end-to-end frame latencies with.
+        :param gop_cache: A [GopCache][wyzecam.receiver.GopCache] to keep the most
+                          recent group of pictures in.
+        :param decoder_thread_type: How video decoders should use threads: "FRAME" decodes
+                                    several frames in parallel (the fastest, at the cost
+                                    of a frame of latency per extra thread), "SLICE"
+                                    decodes parts of a single frame in parallel (only
+                                    helps if the camera encodes multiple slices), and
+                                    "AUTO" uses both.
+        :param decoder_thread_count: The number of threads each video decoder may use;
+                                     0 picks a number based on the number of CPUs.
+        :param target_fps: Throttle decoding to at most this many frames per second,
+                           e.g. for a dashboard that only needs 5 of the camera's 20.
+                           Frames are dropped before they are decoded, keeping
+                           keyframes and the reference frames later frames depend on.
+                           See [FrameDecimator][wyzecam.decode.FrameDecimator].
+        :param metrics: A [MetricsRegistry][wyzecam.metrics.MetricsRegistry] to report
+                        this session's frame counts, drops, decode times, ioctl round
+                        trip times, connection phase durations, and packet counts to.
         """
         self.tutk_platform_lib: CDLL = tutk_platform_lib
         self.account: WyzeAccount = account
@@ -259,6 +346,25 @@ class WyzeIOTCSession:
         self.preferred_frame_size: int = frame_size
         self.preferred_bitrate: int = bitrate
 
+        self.recv_buffer_pool = tutk.RecvBufferPool(
+            recv_buffer_pool_size, max_frame_size
+        )
+        self.wait_policy: WaitPolicy = wait_policy or AdaptiveWaitPolicy()
+        self.receiver: Optional[FrameReceiver] = None
+        self._batch_reader: Optional[FrameRingBuffer] = None
+        self.frame_info_store: Optional[FrameInfoStore] = frame_info_store
+        self.recv_stats = RecvStats()
+        self.latency_tracker: Optional[FrameLatencyTracker] = latency_tracker
+        self.gop_cache: Optional[GopCache] = gop_cache
+        self.decoder_thread_type: Optional[str] = decoder_thread_type
+        self.decoder_thread_count: Optional[int] = decoder_thread_count
+        self.target_fps: Optional[float] = target_fps
+        self.decimator: Optional[FrameDecimator] = None
+        self.metrics: Optional[SessionMetrics] = None
+        if metrics is not None:
+            self.metrics = SessionMetrics(metrics, camera.mac)
+            self.metrics.collect_session(self)
+
     def session_check(self) -> tutk.SInfoStruct:
         """Used by a device or a client to check the IOTC session info.
 
@@ -298,7 +404,71 @@ class WyzeIOTCSession:
 
         """
         assert self.av_chan_id is not None, "Please call _connect() first!"
-        return TutkIOCtrlMux(self.tutk_platform_lib, self.av_chan_id)
+        return TutkIOCtrlMux(
+            self.tutk_platform_lib, self.av_chan_id, self.metrics
+        )
+
+    def start_receiver(
+        self,
+        max_frames: int = 100,
+        max_bytes: Optional[int] = None,
+        drop_policy: DropPolicy = DropPolicy.DROP_UNTIL_KEYFRAME,
+    ) -> FrameReceiver:
+        """Start draining video frames from the camera on a background thread.
+
+        Normally, frames are only pulled from the TUTK library when the consumer of
+        `recv_video_data` (or one of the decoding generators built on top of it) asks
+        for the next one.  If the consumer is slow, the library's internal buffer fills
+        up, and frames are lost.  Once the receiver is started, frames are instead
+        drained into a bounded [FrameRingBuffer][wyzecam.receiver.FrameRingBuffer] as
+        soon as they arrive, and `recv_video_data` reads from that buffer.  This also
+        lets several consumers read from the session at once (e.g. a recorder and a
+        live view), each getting every frame; see
+        [FrameReceiver.open_reader][wyzecam.receiver.FrameReceiver.open_reader].
+
+        When the buffer is full, frames are dropped according to `drop_policy`, always
+        in whole groups of pictures, so that the frames delivered can still be decoded.
+        See [DropPolicy][wyzecam.receiver.DropPolicy].
+
+        ```python
+        with wyze_iotc.connect_and_auth(account, camera) as sess:
+            sess.start_receiver(max_frames=60, drop_policy=DropPolicy.DROP_OLDEST)
+            for (frame, frame_info) in sess.recv_video_frame_ndarray():
+                slow_model(frame)
+                print(sess.dropped_frames)
+        ```
+
+        The receiver is stopped automatically when the session disconnects.
+
+        :param max_frames: the maximum number of frames to buffer.
+        :param max_bytes: the maximum number of bytes of frame data to buffer, if any.
+        :param drop_policy: what to do when the buffer is full.
+        :returns: the [FrameReceiver][wyzecam.receiver.FrameReceiver] thread.
+        """
+        assert self.av_chan_id is not None, "Please call _connect() first!"
+        assert self.receiver is None, "The receiver has already been started!"
+
+        ring_buffer = FrameRingBuffer(max_frames, max_bytes, drop_policy)
+        self.receiver = FrameReceiver(self, ring_buffer)
+        self.receiver.start()
+        return self.receiver
+
+    def stop_receiver(self) -> None:
+        """Stop the background receiver started by `start_receiver()`."""
+        if self.receiver is None:
+            return
+        if self._batch_reader is not None:
+            self.receiver.close_reader(self._batch_reader)
+            self._batch_reader = None
+        self.receiver.stop()
+        self.receiver = None
+
+    @property
+    def dropped_frames(self) -> int:
+        """The number of frames dropped by the background receiver, if running."""
+        if self.receiver is None:
+            return 0
+        return self.receiver.ring_buffer.dropped_frames
 
     def __enter__(self):
         self._connect()
@@ -311,9 +481,7 @@ class WyzeIOTCSession:
     def recv_video_data(
         self,
     ) -> Iterator[
-        Tuple[
-            Optional[bytes], Union[tutk.FrameInfoStruct, tutk.FrameInfo3Struct]
-        ]
+        Tuple[bytes, Union[tutk.FrameInfoStruct, tutk.FrameInfo3Struct]]
     ]:
         """A generator for returning raw video frames!
 
@@ -333,6 +501,11 @@ class WyzeIOTCSession:
         Note that the format of this data is either raw h264 or HVEC H265 video. You will
         have to introspect the frame_info object to determine the format!
 
+        Without a background receiver, frames are pulled straight from the camera, so only
+        one consumer may read from the session at a time; two overlapping consumers would
+        each get some of the frames.  Start the receiver with `start_receiver()` to read
+        from the session in several places at once.
+
 
         ```python
         with wyzecam.WyzeIOTC() as wyze_iotc:
@@ -352,38 +525,275 @@ class WyzeIOTCSession:
         """
         assert self.av_chan_id is not None, "Please call _connect() first!"
 
-        while True:
-            errno, frame_data, frame_info, frame_idx = tutk.av_recv_frame_data(
-                self.tutk_platform_lib, self.av_chan_id
+        if self.receiver is not None:
+            yield from self._recv_from_receiver(self.receiver)
+            return
+
+        recv_buffer = self.recv_buffer_pool.acquire()
+        try:
+            while True:
+                errno, frame_data, frame_info = self._poll_frame_data(
+                    recv_buffer
+                )
+                if errno == tutk.AV_ER_DATA_NOREADY:
+                    self.wait_policy.wait()
+                    continue
+                if frame_data is None or frame_info is None:
+                    continue
+                yield frame_data, frame_info
+        finally:
+            recv_buffer.release()
+
+    def recv_video_data_view(
+        self, lease_timeout: Optional[float] = 10.0
+    ) -> Iterator[
+        Tuple[
+            tutk.RecvBuffer, Union[tutk.FrameInfoStruct, tutk.FrameInfo3Struct]
+        ]
+    ]:
+        """A generator for returning raw video frames, without copying them!
+
+        This works just like `recv_video_data`, except that instead of a bytes object,
+        each frame is returned as a leased [tutk.RecvBuffer][wyzecam.tutk.tutk.RecvBuffer]
+        from this session's `recv_buffer_pool`.  The frame data is available as a
+        memoryview, `lease.data`, pointing directly into the buffer the frame was received
+        into.  This is ideal for forwarding or remuxing the video stream, where the frame
+        data never needs to be copied.
+
+        Each lease must be released once you are done with the frame, either by calling
+        `lease.release()` or by using it as a context manager.  After this point,
+        `lease.data` is no longer valid.
+
+        ```python
+        with wyzecam.WyzeIOTC() as wyze_iotc:
+            with wyze_iotc.connect_and_auth(account, camera) as sess:
+                for (lease, frame_info) in sess.recv_video_data_view():
+                    with lease:
+                        output_file.write(lease.data)
+        ```
+
+        Frames may be held on to for a while (e.g. handed off to another thread), but
+        at most `recv_buffer_pool_size` frames may be leased at once.
+
+        :param lease_timeout: the maximum number of seconds to wait for a leased buffer to
+                              be released, once all of the buffers in the pool are in use.
+                              If None, wait forever.
+        :returns: A generator, which when iterated over, yields a tuple containing a leased
+                  [tutk.RecvBuffer][wyzecam.tutk.tutk.RecvBuffer], as well as metadata about
+                  the frame (in the form of a [tutk.FrameInfoStruct][wyzecam.tutk.tutk.FrameInfoStruct]).
+        """
+        assert self.av_chan_id is not None, "Please call _connect() first!"
+        if self.receiver is not None:
+            raise RuntimeError(
+                "recv_video_data_view is not available while the background "
+                "receiver is running; use recv_video_data instead."
             )
-            if errno < 0:
+
+        recv_buffer: Optional[tutk.RecvBuffer] = None
+        try:
+            while True:
+                if recv_buffer is None:
+                    recv_buffer = self._acquire_recv_buffer(lease_timeout)
+                errno, frame_info = self._poll_frame(recv_buffer)
                 if errno == tutk.AV_ER_DATA_NOREADY:
-                    time.sleep(1.0 / 40)
+                    self.wait_policy.wait()
                     continue
-                elif errno == tutk.AV_ER_INCOMPLETE_FRAME:
-                    warnings.warn("Received incomplete frame")
+                if frame_info is None:
                     continue
-                elif errno == tutk.AV_ER_LOSED_THIS_FRAME:
-                    warnings.warn("Lost frame")
+
+                lease, recv_buffer = recv_buffer.lease(), None
+                yield lease, frame_info
+        finally:
+            if recv_buffer is not None:
+                recv_buffer.release()
+
+    def recv_video_data_batch(
+        self,
+        max_frames: int = 64,
+        max_bytes: int = 4 * 1024 * 1024,
+        block: bool = True,
+    ) -> FrameBatch:
+        """Receive every video frame that is currently available, all at once.
+
+        Frames are drained from the camera until it reports that no more are ready, or
+        until either `max_frames` or `max_bytes` is reached, and returned as a single
+        [FrameBatch][wyzecam.frames.FrameBatch] with all of the frame data in one
+        contiguous buffer.  This is far cheaper than iterating over `recv_video_data`
+        one frame at a time when catching up on a backlog of frames, e.g. after a
+        stall in processing.
+
+        ```python
+        with wyze_iotc.connect_and_auth(account, camera) as sess:
+            while True:
+                batch = sess.recv_video_data_batch()
+                for (frame_data, frame_info) in batch:
+                    ...
+        ```
+
+        While the background receiver is running (see `start_receiver()`), batches are
+        read from a reader of its own, opened on the first call and kept open until the
+        receiver is stopped, so that every frame received in between is kept for the
+        next batch.
+
+        :param max_frames: the maximum number of frames to return.
+        :param max_bytes: stop adding frames to the batch once it holds at least this
+                          many bytes of frame data.
+        :param block: if no frames are available, wait for at least one to arrive.
+                      Otherwise, an empty batch may be returned.
+        :returns: a [FrameBatch][wyzecam.frames.FrameBatch].
+        """
+        assert self.av_chan_id is not None, "Please call _connect() first!"
+
+        batch = FrameBatch()
+        if self.receiver is not None:
+            if self._batch_reader is None:
+                self._batch_reader = self.receiver.open_reader()
+            while len(batch) < max_frames and batch.nbytes < max_bytes:
+                frame = self._batch_reader.get(
+                    timeout=None if block and not batch else 0
+                )
+                if frame is None:
+                    if not batch and self.receiver.error is not None:
+                        raise self.receiver.error
+                    break
+                batch.append(*frame)
+            return batch
+
+        recv_buffer = self.recv_buffer_pool.acquire()
+        try:
+            while len(batch) < max_frames and batch.nbytes < max_bytes:
+                try:
+                    errno, frame_info = self._poll_frame(recv_buffer)
+                except tutk.TutkError:
+                    if batch:
+                        break  # return what we have; the next call will raise again
+                    raise
+                if errno == tutk.AV_ER_DATA_NOREADY:
+                    if batch or not block:
+                        break
+                    self.wait_policy.wait()
                     continue
-                else:
-                    raise tutk.TutkError(errno)
-            assert frame_info is not None, "Got no frame info without an error!"
-            if frame_info.frame_size != self.preferred_frame_size:
-                if frame_info.frame_size < 2:
-                    logger.debug(
-                        f"skipping smaller frame at start of stream (frame_size={frame_info.frame_size})"
-                    )
+                if frame_info is None:
                     continue
-                else:
-                    # wyze doorbell has weird rotated image sizes.
-                    if frame_info.frame_size - 3 != self.preferred_frame_size:
-                        continue
+                batch.append(recv_buffer.view(), frame_info)
+        finally:
+            recv_buffer.release()
+        return batch
+
+    def _recv_from_receiver(
+        self, receiver: FrameReceiver
+    ) -> Iterator[
+        Tuple[bytes, Union[tutk.FrameInfoStruct, tutk.FrameInfo3Struct]]
+    ]:
+        reader = receiver.open_reader()
+        try:
+            while True:
+                frame = reader.get()
+                if frame is None:
+                    if receiver.error is not None:
+                        raise receiver.error
+                    return
+                yield frame
+        finally:
+            receiver.close_reader(reader)
+
+    def _acquire_recv_buffer(
+        self, timeout: Optional[float] = None
+    ) -> tutk.RecvBuffer:
+        try:
+            return self.recv_buffer_pool.acquire(timeout=timeout)
+        except Empty:
+            raise RuntimeError(
+                f"All {self.recv_buffer_pool.size} receive buffers are leased! "
+                "Release frames once you are done with them, or increase "
+                "recv_buffer_pool_size."
+            )
+
+    def _poll_frame(
+        self, recv_buffer: tutk.RecvBuffer, cache: bool = True
+    ) -> Tuple[
+        int, Optional[Union[tutk.FrameInfoStruct, tutk.FrameInfo3Struct]]
+    ]:
+        """Make a single attempt at receiving a frame into `recv_buffer`.
+
+        Returns a tuple of (errno, frame_info); frame_info is None if no usable frame
+        was received.  Unrecoverable errors are raised as a TutkError.  Unless `cache`
+        is False, the frame is added to the gop cache, if any.
+        """
+        assert self.av_chan_id is not None, "Please call _connect() first!"
+
+        start = time.perf_counter()
+        errno, frame_info, frame_idx = tutk.av_recv_frame_data_into(
+            self.tutk_platform_lib, self.av_chan_id, recv_buffer
+        )
+        self.wait_policy.record_receive(time.perf_counter() - start)
+        if errno < 0:
+            if errno == tutk.AV_ER_DATA_NOREADY:
+                self.recv_stats.not_ready_polls += 1
+            elif errno == tutk.AV_ER_INCOMPLETE_FRAME:
+                self.recv_stats.frames_incomplete += 1
+            elif errno == tutk.AV_ER_LOSED_THIS_FRAME:
+                self.recv_stats.frames_lost += 1
+            else:
+                raise tutk.TutkError(errno)
+            return errno, None
+        assert frame_info is not None, "Got no frame info without an error!"
+        self.recv_stats.frames_ok += 1
+        self.recv_stats.bytes_received += recv_buffer.frame_len
+        self.wait_policy.frame_received(frame_info)
+        if not self._accept_frame_size(frame_info):
+            return 0, None
+        if self.frame_info_store is not None:
+            self.frame_info_store.append(frame_info)
+        if self.latency_tracker is not None:
+            self.latency_tracker.on_received(frame_info)
+        if cache and self.gop_cache is not None:
+            self.gop_cache.add(
+                recv_buffer.frame_data[: recv_buffer.frame_len], frame_info  # type: ignore
+            )
+        return 0, frame_info
+
+    def _poll_frame_data(self, recv_buffer: tutk.RecvBuffer) -> Tuple[
+        int,
+        Optional[bytes],
+        Optional[Union[tutk.FrameInfoStruct, tutk.FrameInfo3Struct]],
+    ]:
+        """Like `_poll_frame`, but also copies the frame data out of `recv_buffer`.
 
-            yield frame_data, frame_info
+        Returns a tuple of (errno, frame_data, frame_info).  The same bytes are added to
+        the gop cache, if any, so the frame is only copied once.
+        """
+        errno, frame_info = self._poll_frame(recv_buffer, cache=False)
+        if frame_info is None:
+            return errno, None, None
+        frame_data: bytes = recv_buffer.frame_data[: recv_buffer.frame_len]  # type: ignore
+        if self.gop_cache is not None:
+            self.gop_cache.add(frame_data, frame_info)
+        return errno, frame_data, frame_info
+
+    def _accept_frame_size(
+        self, frame_info: Union[tutk.FrameInfoStruct, tutk.FrameInfo3Struct]
+    ) -> bool:
+        if frame_info.frame_size != self.preferred_frame_size:
+            if frame_info.frame_size < 2:
+                logger.debug(
+                    f"skipping smaller frame at start of stream (frame_size={frame_info.frame_size})"
+                )
+                self.recv_stats.skipped_small_frames += 1
+                return False
+            else:
+                # wyze doorbell has weird rotated image sizes.
+                if frame_info.frame_size - 3 != self.preferred_frame_size:
+                    self.recv_stats.skipped_frame_size_mismatches += 1
+                    return False
+        return True
 
     def recv_video_frame(
         self,
+        thread_type: Optional[str] = None,
+        thread_count: Optional[int] = None,
+        decode_mode: DecodeMode = DecodeMode.ALL,
+        target_fps: Optional[float] = None,
     ) -> Iterator[
         Tuple[
             "av.VideoFrame", Union[tutk.FrameInfoStruct, tutk.FrameInfo3Struct]
@@ -409,6 +819,33 @@ class WyzeIOTCSession:
 
         In order to use this, you will need to install [PyAV](https://pyav.org/docs/stable/).
 
+        If the session has a [GopCache][wyzecam.receiver.GopCache] and its receiver is
+        running (see `start_receiver()`), the decoder is first fed the most recent group
+        of pictures from the cache, and the first frame yielded is the latest frame in the
+        cache; this means that a consumer starting on a running session doesn't have to
+        wait for the next keyframe.  Without the receiver, nothing is received while no
+        consumer is reading, so the cache would only hold stale frames, and it is not
+        used.
+
+        For thumbnails, timelapses, or anything else that doesn't need every frame, use
+        `decode_mode` to only decode what is needed:
+
+        ```python
+        for (frame, frame_info) in sess.recv_video_frame(
+            decode_mode=DecodeMode.TARGET_FPS, target_fps=0.5
+        ):
+            ...  # one frame every two seconds
+        ```
+
+        :param thread_type: How the decoder should use threads; defaults to the
+                            session's `decoder_thread_type`.
+        :param thread_count: How many threads the decoder may use; defaults to the
+                             session's `decoder_thread_count`.
+        :param decode_mode: Which frames to decode and return.  See
+                            [DecodeMode][wyzecam.decode.DecodeMode].
+        :param target_fps: The maximum number of frames per second to return; defaults
+                           to the session's `target_fps`.  If set, `DecodeMode.ALL`
+                           becomes `DecodeMode.TARGET_FPS`.
         :returns: A generator, which when iterated over, yields a tuple containing the decoded image
                  (as a [PyAV VideoFrame](https://pyav.org/docs/stable/api/video.html#av.video.frame.VideoFrame)),
                  as well as metadata about the frame (in the form of a
@@ -420,18 +857,41 @@ class WyzeIOTCSession:
                 "Install with `pip install av` and try again."
             )
 
-        codec = None
-        for frame_data, frame_info in self.recv_video_data():
-            if codec is None:
-                codec = self._av_codec_from_frameinfo(frame_info)
-            packets = codec.parse(frame_data)
-            for packet in packets:
-                frames = codec.decode(packet)
-                for frame in frames:
-                    yield frame, frame_info
+        decoding = _DecodeLoop(
+            self, thread_type, thread_count, decode_mode, target_fps
+        )
+        yield from decoding.prime()
+        try:
+            for frame_data, frame_info in self.recv_video_data():
+                yield from decoding.feed(frame_data, frame_info)
+        except Exception:
+            # the decoder still holds the last few frames received before the error
+            yield from decoding.flush()
+            raise
+        yield from decoding.flush()
+
+    def _frame_decimator(
+        self, decode_mode: DecodeMode, target_fps: Optional[float]
+    ) -> FrameDecimator:
+        target_fps = target_fps or self.target_fps
+        if decode_mode == DecodeMode.ALL and target_fps:
+            decode_mode = DecodeMode.TARGET_FPS
+        self.decimator = FrameDecimator(decode_mode, target_fps)
+        return self.decimator
 
     def recv_video_frame_ndarray(
         self,
+        thread_type: Optional[str] = None,
+        thread_count: Optional[int] = None,
+        decode_mode: DecodeMode = DecodeMode.ALL,
+        target_fps: Optional[float] = None,
+        decoder_pool: Optional[DecoderPool] = None,
+        format: str = "bgr24",
+        width: Optional[int] = None,
+        height: Optional[int] = None,
+        roi: Optional[Tuple[int, int, int, int]] = None,
+        output_ring: Optional[NdarrayRing] = None,
+        contiguous: bool = True,
     ) -> Iterator[
         Tuple[
             "np.ndarray[Any, Any]",
@@ -457,9 +917,46 @@ class WyzeIOTCSession:
                     # do something with the video data! :)
         ```
 
+        Frames are converted straight to the requested pixel format and size, in a single
+        pass; e.g. for a grayscale 640x360 image to feed to a model:
+
+        ```python
+        for (frame, frame_info) in sess.recv_video_frame_ndarray(
+            format="gray", width=640, height=360
+        ):
+            ...
+        ```
+
         In order to use this, you will need to install [PyAV](https://pyav.org/docs/stable/)
         and [numpy](https://numpy.org/).
 
+        :param thread_type: How the decoder should use threads; see `recv_video_frame`.
+        :param thread_count: How many threads the decoder may use; see `recv_video_frame`.
+        :param decode_mode: Which frames to decode and return; see `recv_video_frame`.
+        :param target_fps: The maximum number of frames per second to return; see
+                           `recv_video_frame`.
+        :param decoder_pool: If specified, frames are decoded in the pool's worker
+                             processes instead of on this thread.  Note that the images
+                             returned are then only valid until the pool's
+                             `slots_per_stream` more frames have been decoded.  See
+                             [DecoderPool][wyzecam.decoder_pool.DecoderPool].
+        :param format: The pixel format of the images: "bgr24", "rgb24", "gray", or
+                       "yuv420p".  See [wyzecam.decode.OUTPUT_FORMATS][].
+        :param width: The width of the images.  If only one of width and height are given,
+                      the other is chosen to keep the aspect ratio.
+        :param height: The height of the images.
+        :param roi: A region of interest to crop the images to before scaling, as
+                    (x, y, width, height) in full resolution coordinates.
+        :param output_ring: If specified, images are converted into the preallocated
+                            arrays of this [NdarrayRing][wyzecam.frames.NdarrayRing]
+                            rather than new arrays; see there for how long each image
+                            remains valid.  Not supported with a `decoder_pool`, which
+                            has its own ring of images.
+        :param contiguous: Whether the images must be C-contiguous arrays.  Doorbell
+                           frames are sent sideways and have to be rotated; if False,
+                           they are returned as rotated views instead, which makes the
+                           rotation free.  Ignored with a `decoder_pool` or
+                           `output_ring`, whose images are always contiguous.
         :returns: A generator, which when iterated over, yields a tuple containing the decoded image
                  (as a numpy array), as well as metadata about the frame (in the form of a
                  [tutk.FrameInfoStruct][wyzecam.tutk.tutk.FrameInfoStruct]).
@@ -470,13 +967,186 @@ class WyzeIOTCSession:
                 "Install with `pip install numpy` and try again."
             )
 
-        for frame, frame_info in self.recv_video_frame():
-            img = frame.to_ndarray(format="bgr24")
-            if frame_info.frame_size in (3, 4):
-                img = np.rot90(img, 3)
-                img = np.ascontiguousarray(img, dtype=np.uint8)
+        output_options: Dict[str, Any] = {
+            "format": format,
+            "width": width,
+            "height": height,
+            "roi": roi,
+        }
+        if decoder_pool is not None:
+            assert (
+                output_ring is None
+            ), "output_ring can't be used with a decoder_pool"
+            yield from self._recv_video_frame_ndarray_pooled(
+                decoder_pool, decode_mode, target_fps, output_options
+            )
+            return
+
+        for frame, frame_info in self.recv_video_frame(
+            thread_type, thread_count, decode_mode, target_fps
+        ):
+            img = self._frame_to_ndarray(
+                frame,
+                frame_info,
+                **output_options,
+                out_ring=output_ring,
+                contiguous=contiguous,
+            )
             yield img, frame_info
 
+    def recv_video_frame_lazy(
+        self,
+        thread_type: Optional[str] = None,
+        thread_count: Optional[int] = None,
+        decode_mode: DecodeMode = DecodeMode.ALL,
+        target_fps: Optional[float] = None,
+        format: str = "bgr24",
+        width: Optional[int] = None,
+        height: Optional[int] = None,
+        roi: Optional[Tuple[int, int, int, int]] = None,
+        contiguous: bool = True,
+    ) -> Iterator[DecodedFrame]:
+        """A generator for returning decoded video frames, converted only on demand.
+
+        This works like `recv_video_frame_ndarray`, except that each frame is yielded
+        as a [DecodedFrame][wyzecam.decode.DecodedFrame] handle carrying the frame's
+        metadata.  The conversion to a numpy array only happens when the handle's
+        `ndarray()` is called, so frames that are filtered out on their metadata cost
+        no more than decoding:
+
+        ```python
+        for frame in sess.recv_video_frame_lazy(format="gray", width=640):
+            if start <= frame.timestamp < end:
+                process(frame.ndarray())
+        ```
+
+        In order to use this, you will need to install [PyAV](https://pyav.org/docs/stable/)
+        and [numpy](https://numpy.org/).
+
+        :param thread_type: How the decoder should use threads; see `recv_video_frame`.
+        :param thread_count: How many threads the decoder may use; see `recv_video_frame`.
+        :param decode_mode: Which frames to decode and return; see `recv_video_frame`.
+        :param target_fps: The maximum number of frames per second to return; see
+                           `recv_video_frame`.
+        :param format: The pixel format `ndarray()` converts to; see
+                       `recv_video_frame_ndarray`.
+        :param width: The width of the images.
+        :param height: The height of the images.
+        :param roi: A region of interest to crop the images to before scaling.
+        :param contiguous: Whether the images must be C-contiguous arrays; see
+                           `recv_video_frame_ndarray`.
+        :returns: A generator of [DecodedFrame][wyzecam.decode.DecodedFrame]s.
+        """
+        if np is None:
+            raise RuntimeError(
+                "recv_video_frame_lazy requires numpy to convert to a numpy array. "
+                "Install with `pip install numpy` and try again."
+            )
+
+        convert = functools.partial(
+            self._frame_to_ndarray,
+            format=format,
+            width=width,
+            height=height,
+            roi=roi,
+            contiguous=contiguous,
+        )
+        for frame, frame_info in self.recv_video_frame(
+            thread_type, thread_count, decode_mode, target_fps
+        ):
+            yield DecodedFrame(frame, frame_info, convert)
+
+    def _recv_video_frame_ndarray_pooled(
+        self,
+        decoder_pool: DecoderPool,
+        decode_mode: DecodeMode,
+        target_fps: Optional[float],
+        output_options: Dict[str, Any],
+    ) -> Iterator[
+        Tuple[
+            "np.ndarray[Any, Any]",
+            Union[tutk.FrameInfoStruct, tutk.FrameInfo3Struct],
+        ]
+    ]:
+        decimator = self._frame_decimator(decode_mode, target_fps)
+        cached = (
+            self.gop_cache.frames()
+            if self.gop_cache is not None and self.receiver is not None
+            else []
+        )
+        if decode_mode == DecodeMode.KEYFRAMES:
+            cached = cached[:1]
+        last_frame_no = cached[-1][1].frame_no if cached else None
+
+        stream: Optional[DecoderStream] = None
+
+        def delivered(
+            images: "List[Tuple[np.ndarray[Any, Any], Union[tutk.FrameInfoStruct, tutk.FrameInfo3Struct]]]",
+        ) -> "List[Tuple[np.ndarray[Any, Any], Union[tutk.FrameInfoStruct, tutk.FrameInfo3Struct]]]":
+            if self.latency_tracker is not None:
+                for _, frame_info in images:
+                    self.latency_tracker.on_decoded(frame_info)
+                    self.latency_tracker.on_delivered(frame_info)
+            return images
+
+        def flush() -> "List[Tuple[np.ndarray[Any, Any], Union[tutk.FrameInfoStruct, tutk.FrameInfo3Struct]]]":
+            nonlocal stream
+            if stream is None:
+                return []
+            try:
+                return delivered(stream.flush())
+            finally:
+                stream.close()
+                stream = None
+
+        try:
+            if cached:
+                stream = decoder_pool.open_stream(
+                    codec_name_from_frameinfo(cached[0][1]), **output_options
+                )
+                for i, (frame_data, frame_info) in enumerate(cached):
+                    yield from delivered(
+                        stream.decode(
+                            frame_data, frame_info, output=i == len(cached) - 1
+                        )
+                    )
+
+            for frame_data, frame_info in self.recv_video_data():
+                if last_frame_no is not None:
+                    if frame_info.frame_no <= last_frame_no:
+                        continue
+                    last_frame_no = None
+                decode, output = decimator.plan(frame_info)
+                if not decode:
+                    continue
+                codec_name = codec_name_from_frameinfo(frame_info)
+                if (
+                    frame_info.is_keyframe
+                    and stream is not None
+                    and stream.codec_name != codec_name
+                ):
+                    yield from flush()
+                if stream is None:
+                    stream = decoder_pool.open_stream(
+                        codec_name, **output_options
+                    )
+                yield from delivered(
+                    stream.decode(
+                        frame_data,
+                        frame_info,
+                        decimator.skip_frame(output),
+                        output,
+                    )
+                )
+            yield from flush()
+        except Exception:
+            # the worker still holds the last few frames received before the error
+            yield from flush()
+            raise
+        finally:
+            if stream is not None:
+                stream.close()
+
     def recv_video_frame_ndarray_with_stats(
         self,
         stat_window_size: int = 210,
@@ -487,7 +1157,7 @@ class WyzeIOTCSession:
         Tuple[
             "np.ndarray[Any, Any]",
             Union[tutk.FrameInfoStruct, tutk.FrameInfo3Struct],
-            Dict[str, int],
+            Dict[str, Any],
         ]
     ]:
         """
@@ -512,9 +1182,16 @@ class WyzeIOTCSession:
          - "kilobytes_per_second"
          - "window_duration"
          - "frames_per_second"
+         - "gop_length"
+         - "keyframe_size"
+         - "frame_size_p50" and "frame_size_p99"
+         - "inter_arrival_p50" and "inter_arrival_p99"
          - "width"
          - "height"
 
+        See [StreamStats][wyzecam.stats.StreamStats] for what each of these means; use
+        it directly to get the same statistics from the raw stream, without decoding.
+
         This dictionary is available in the draw_stats string as arguments to a python
         str.format() call, allowing you to quickly change the debug string in the top corner
         of the video.
@@ -524,10 +1201,10 @@ class WyzeIOTCSession:
 
         :param stat_window_size: the number of consecutive frames to use as the window function
                                  for computing the above metrics.  The larger the window size,
-                                 the longer period over which the metrics are averaged.  Note that
-                                 this method is not performant for very large window sizes.
+                                 the longer period over which the metrics are averaged.
         :param draw_stats: if specified, this python format() string is used to draw some debug text
-                           in the upper right hand corner.
+                           in the upper right hand corner.  Each distinct line of text is
+                           only rendered once; see [TextOverlay][wyzecam.overlay.TextOverlay].
 
         :returns: A generator, which when iterated over, yields a 3-tuple containing the decoded image
                  (as a numpy array), metadata about the frame (in the form of a
@@ -535,85 +1212,84 @@ class WyzeIOTCSession:
                  statistics (in the form of a dict).
 
         """
-        stat_window = []
+        stream_stats = StreamStats(stat_window_size)
+        overlay = TextOverlay() if draw_stats else None
         for frame_ndarray, frame_info in self.recv_video_frame_ndarray():
-            stat_window.append(frame_info)
-            if len(stat_window) > stat_window_size:
-                stat_window = stat_window[len(stat_window) - stat_window_size :]
-
-            if len(stat_window) > 1:
-                stat_window_start = (
-                    stat_window[0].timestamp
-                    + stat_window[0].timestamp_ms / 1_000_000
-                )
-                stat_window_end = (
-                    stat_window[-1].timestamp
-                    + stat_window[-1].timestamp_ms / 1_000_000
-                )
-                stat_window_duration = stat_window_end - stat_window_start
-                if stat_window_duration <= 0:
-                    # wyze doorbell doesn't support timestamp_ms; workaround:
-                    stat_window_duration = (
-                        len(stat_window) / stat_window[-1].framerate
-                    )
-                stat_window_total_size = sum(
-                    b.frame_len for b in stat_window[:-1]
-                )  # skip the last reading
-                bytes_per_second = int(
-                    stat_window_total_size / stat_window_duration
-                )
-                frames_per_second = int(len(stat_window) / stat_window_duration)
-            else:
-                bytes_per_second = 0
-                stat_window_duration = 0
-                frames_per_second = 0
-
-            stats = {
-                "bytes_per_second": bytes_per_second,
-                "kilobytes_per_second": int(bytes_per_second / 1000),
-                "window_duration": stat_window_duration,
-                "frames_per_second": frames_per_second,
-                "width": frame_ndarray.shape[1],
-                "height": frame_ndarray.shape[0],
-            }
-
-            if draw_stats:
-                text = draw_stats.format(**stats)
-                cv2.putText(
-                    frame_ndarray,
-                    text,
-                    (50, 50),
-                    cv2.FONT_HERSHEY_DUPLEX,
-                    1,
-                    (0, 0, 0),
-                    2,
-                    cv2.LINE_AA,
-                )
-                cv2.putText(
-                    frame_ndarray,
-                    text,
-                    (50, 50),
-                    cv2.FONT_HERSHEY_DUPLEX,
-                    1,
-                    (255, 255, 255),
-                    1,
-                    cv2.LINE_AA,
-                )
+            stream_stats.add(frame_info)
+            stats = stream_stats.snapshot()
+            stats["width"] = frame_ndarray.shape[1]
+            stats["height"] = frame_ndarray.shape[0]
+
+            if overlay is not None and draw_stats:
+                overlay.draw(frame_ndarray, draw_stats.format(**stats))
 
             yield frame_ndarray, frame_info, stats
 
-    def _av_codec_from_frameinfo(self, frame_info):
-        if frame_info.codec_id == 75:
-            codec_name = "h264"
-        elif frame_info.codec_id == 78:
-            codec_name = "h264"
-        elif frame_info.codec_id == 80:
-            codec_name = "hevc"
+    def _decode(
+        self,
+        decoder: "FrameDecoder[Union[tutk.FrameInfoStruct, tutk.FrameInfo3Struct]]",
+        frame_data: Optional[bytes],
+        frame_info: Optional[
+            Union[tutk.FrameInfoStruct, tutk.FrameInfo3Struct]
+        ],
+        output: bool = True,
+    ) -> "List[Tuple[av.VideoFrame, Union[tutk.FrameInfoStruct, tutk.FrameInfo3Struct]]]":
+        # decodes a frame, or flushes the decoder if frame_data is None.
+        start = time.perf_counter()
+        if frame_data is None:
+            frames = decoder.flush()
         else:
-            codec_name = "h264"
-            warnings.warn(f"Unexpected codec! got {frame_info.codec_id}.")
+            assert frame_info is not None
+            frames = decoder.decode(frame_data, frame_info, output)
+        if self.metrics is not None:
+            self.metrics.decode_seconds.observe(time.perf_counter() - start)
+        if self.latency_tracker is not None:
+            for _, decoded_info in frames:
+                self.latency_tracker.on_decoded(decoded_info)
+        return frames
+
+    def _frame_to_ndarray(
+        self,
+        frame: "av.VideoFrame",
+        frame_info: Union[tutk.FrameInfoStruct, tutk.FrameInfo3Struct],
+        format: str = "bgr24",
+        width: Optional[int] = None,
+        height: Optional[int] = None,
+        roi: Optional[Tuple[int, int, int, int]] = None,
+        out_ring: Optional[NdarrayRing] = None,
+        contiguous: bool = True,
+    ) -> "np.ndarray[Any, Any]":
+        img = frame_to_ndarray(
+            frame,
+            format,
+            width,
+            height,
+            roi,
+            rotate=frame_info.frame_size in (3, 4),
+            out_ring=out_ring,
+            contiguous=contiguous,
+        )
+        if self.latency_tracker is not None:
+            self.latency_tracker.on_delivered(frame_info)
+        return img
+
+    def _av_codec_from_frameinfo(
+        self,
+        frame_info: Union[tutk.FrameInfoStruct, tutk.FrameInfo3Struct],
+        thread_type: Optional[str] = None,
+        thread_count: Optional[int] = None,
+    ) -> Any:
         # noinspection PyUnresolvedReferences
-        codec = av.CodecContext.create(codec_name, "r")
+        codec = av.CodecContext.create(
+            codec_name_from_frameinfo(frame_info), "r"
+        )
+        thread_type = thread_type or self.decoder_thread_type
+        if thread_type is not None:
+            codec.thread_type = thread_type
+        if thread_count is None:
+            thread_count = self.decoder_thread_count
+        if thread_count is not None:
+            codec.thread_count = thread_count
         return codec
 
     def _connect(
@@ -624,6 +1300,7 @@ class WyzeIOTCSession:
         password="888888",
         max_buf_size=5 * 1024 * 1024,
     ):
+        phase_start = time.perf_counter()
         try:
             self.state = WyzeIOTCSessionState.IOTC_CONNECTING
             session_id = tutk.iotc_get_session_id(self.tutk_platform_lib)
@@ -639,6 +1316,7 @@ class WyzeIOTCSession:
             self.session_id = session_id
 
             self.session_check()
+            phase_start = self._observe_phase("iotc_connect", phase_start)
 
             self.state = WyzeIOTCSessionState.AV_CONNECTING
             av_chan_id, pn_serv_type = tutk.av_client_start(
@@ -653,6 +1331,7 @@ class WyzeIOTCSession:
             if av_chan_id < 0:  # type: ignore
                 raise tutk.TutkError(av_chan_id)
             self.av_chan_id = av_chan_id
+            self._observe_phase("av_connect", phase_start)
             self.state = WyzeIOTCSessionState.CONNECTED
         except tutk.TutkError:
             self._disconnect()
@@ -678,6 +1357,7 @@ class WyzeIOTCSession:
         ), f"Auth expected state to be connected but not authed; state={self.state.name}"
 
         self.state = WyzeIOTCSessionState.AUTHENTICATING
+        phase_start = time.perf_counter()
         try:
             with self.iotctrl_mux() as mux:
                 challenge = mux.send_ioctl(K10000ConnectRequest())
@@ -713,6 +1393,7 @@ class WyzeIOTCSession:
                     )
 
                     mux.waitfor(resolving)
+                self._observe_phase("auth", phase_start)
                 self.state = WyzeIOTCSessionState.AUTHENTICATION_SUCCEEDED
         except tutk.TutkError:
             self._disconnect()
@@ -722,7 +1403,14 @@ class WyzeIOTCSession:
                 self.state = WyzeIOTCSessionState.AUTHENTICATION_FAILED
         return self
 
+    def _observe_phase(self, phase: str, start: float) -> float:
+        now = time.perf_counter()
+        if self.metrics is not None:
+            self.metrics.observe_phase(phase, now - start)
+        return now
+
     def _disconnect(self):
+        self.stop_receiver()
         if self.av_chan_id is not None:
             tutk.av_client_stop(self.tutk_platform_lib, self.av_chan_id)
         self.av_chan_id = None
@@ -730,3 +1418,99 @@ class WyzeIOTCSession:
             tutk.iotc_session_close(self.tutk_platform_lib, self.session_id)
         self.session_id = None
         self.state = WyzeIOTCSessionState.DISCONNECTED
+
+
+class _DecodeLoop:
+    # the decoding behind WyzeIOTCSession.recv_video_frame, shared with the asyncio
+    # session: which frames to decode, priming the decoder from the gop cache, and
+    # replacing the decoder when the camera switches codec.  Each step returns the
+    # (frame, frame_info) pairs that are ready.
+    def __init__(
+        self,
+        session: WyzeIOTCSession,
+        thread_type: Optional[str],
+        thread_count: Optional[int],
+        decode_mode: DecodeMode,
+        target_fps: Optional[float],
+    ) -> None:
+        self.session = session
+        self.thread_type = thread_type
+        self.thread_count = thread_count
+        self.decimator = session._frame_decimator(decode_mode, target_fps)
+        self.decoder: Optional[
+            FrameDecoder[Union[tutk.FrameInfoStruct, tutk.FrameInfo3Struct]]
+        ] = None
+        self._last_cached_frame_no: Optional[int] = None
+
+    def prime(
+        self,
+    ) -> "List[Tuple[av.VideoFrame, Union[tutk.FrameInfoStruct, tutk.FrameInfo3Struct]]]":
+        # feed the decoder the gop cache, so that a consumer starting on a running
+        # session gets the latest frame without waiting for the next keyframe.
+        if av is None:
+            raise RuntimeError(
+                "recv_video_frame requires PyAv to parse video frames. "
+                "Install with `pip install av` and try again."
+            )
+        # without a receiver, nothing has been received since the last consumer
+        # stopped, so the cache is out of date.
+        if self.session.gop_cache is None or self.session.receiver is None:
+            return []
+        cached = self.session.gop_cache.frames()
+        if not cached:
+            return []
+        if self.decimator.mode == DecodeMode.KEYFRAMES:
+            cached = cached[:1]
+        self._last_cached_frame_no = cached[-1][1].frame_no
+        self.decoder = self._decoder(cached[0][1])
+        frames = []
+        for i, (frame_data, frame_info) in enumerate(cached):
+            frames += self.session._decode(
+                self.decoder, frame_data, frame_info, i == len(cached) - 1
+            )
+        return frames
+
+    def feed(
+        self,
+        frame_data: bytes,
+        frame_info: Union[tutk.FrameInfoStruct, tutk.FrameInfo3Struct],
+    ) -> "List[Tuple[av.VideoFrame, Union[tutk.FrameInfoStruct, tutk.FrameInfo3Struct]]]":
+        if self._last_cached_frame_no is not None:
+            if frame_info.frame_no <= self._last_cached_frame_no:
+                return []  # already fed to the decoder from the gop cache
+            self._last_cached_frame_no = None
+        decode, output = self.decimator.plan(frame_info)
+        if not decode:
+            return []
+        frames = []
+        if (
+            frame_info.is_keyframe
+            and self.decoder is not None
+            and self.decoder.codec_name != codec_name_from_frameinfo(frame_info)
+        ):
+            frames += self.flush()
+        if self.decoder is None:
+            self.decoder = self._decoder(frame_info)
+        if self.decimator.mode == DecodeMode.TARGET_FPS:
+            self.decoder.codec.skip_frame = self.decimator.skip_frame(output)
+        frames += self.session._decode(
+            self.decoder, frame_data, frame_info, output
+        )
+        return frames
+
+    def flush(
+        self,
+    ) -> "List[Tuple[av.VideoFrame, Union[tutk.FrameInfoStruct, tutk.FrameInfo3Struct]]]":
+        decoder, self.decoder = self.decoder, None
+        if decoder is None:
+            return []
+        return self.session._decode(decoder, None, None)
+
+    def _decoder(
+        self, frame_info: Union[tutk.FrameInfoStruct, tutk.FrameInfo3Struct]
+    ) -> "FrameDecoder[Union[tutk.FrameInfoStruct, tutk.FrameInfo3Struct]]":
+        return FrameDecoder(
+            self.session._av_codec_from_frameinfo(
+                frame_info, self.thread_type, self.thread_count
+            )
+        )
@@ -0,0 +1,336 @@
+from typing import Deque, Dict, List, Optional, Tuple, Union
+
+import math
+import time
+from collections import OrderedDict, deque
+
+from wyzecam.tutk import tutk
+
+FrameInfo = Union[tutk.FrameInfoStruct, tutk.FrameInfo3Struct]
+
+
+def camera_timestamp(frame_info: FrameInfo) -> float:
+    """The time a frame was captured, according to the camera's clock.
+
+    :param frame_info: the metadata of a frame.
+    :returns: seconds since the epoch, as a float.
+    """
+    return float(frame_info.timestamp + frame_info.timestamp_ms / 1_000_000)
+
+
+class LatencyHistogram:
+    """
+    A fixed-size, HdrHistogram-style histogram of latencies, in microseconds.
+
+    Values are bucketed log-linearly: each power-of-two range is split into the same
+    number of linear sub-buckets, so that every recorded value is accurate to within
+    `significant_figures` decimal digits regardless of its magnitude.  Recording a
+    value is a couple of integer operations and never allocates.
+
+    :var highest_value: values above this (in microseconds) are recorded as this value.
+    :vartype highest_value: int
+    :var count: the number of values recorded.
+    :vartype count: int
+    :var min: the smallest value recorded.
+    :vartype min: int
+    :var max: the largest value recorded.
+    :vartype max: int
+    """
+
+    def __init__(
+        self, highest_value: int = 60_000_000, significant_figures: int = 2
+    ) -> None:
+        """Construct an empty histogram
+
+        :param highest_value: the largest value to track, in microseconds.
+        :param significant_figures: the number of significant decimal digits to keep.
+        """
+        self.highest_value = highest_value
+        self._sub_bucket_bits = math.ceil(
+            math.log2(2 * 10**significant_figures)
+        )
+        self._sub_bucket_half_count = 1 << (self._sub_bucket_bits - 1)
+        bucket_count = 1
+        while (1 << self._sub_bucket_bits) << (
+            bucket_count - 1
+        ) <= highest_value:
+            bucket_count += 1
+        self._counts = [0] * ((bucket_count + 1) * self._sub_bucket_half_count)
+        self.count = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+
+    def record(self, value: int) -> None:
+        """Record a single value.
+
+        :param value: the value to record, in microseconds.  Negative values are
+                      recorded as 0.
+        """
+        value = min(max(int(value), 0), self.highest_value)
+        self._counts[self._index_of(value)] += 1
+        if self.count == 0 or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.count += 1
+        self.total += value
+
+    def record_seconds(self, seconds: float) -> None:
+        """Record a single value, given in seconds.
+
+        :param seconds: the value to record.
+        """
+        self.record(int(seconds * 1_000_000))
+
+    def percentile(self, percentile: float) -> int:
+        """The value below which `percentile` percent of the recorded values fall.
+
+        :param percentile: a number between 0 and 100.
+        :returns: the value, in microseconds, to within the histogram's precision.
+        """
+        if self.count == 0:
+            return 0
+        target = max(1, math.ceil(percentile / 100 * self.count))
+        seen = 0
+        for index, count in enumerate(self._counts):
+            seen += count
+            if seen >= target:
+                return min(self._highest_equivalent(index), self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        """The mean of the recorded values, in microseconds."""
+        return self.total / self.count if self.count else 0.0
+
+    def reset(self) -> None:
+        """Forget every recorded value."""
+        self._counts = [0] * len(self._counts)
+        self.count = self.total = self.min = self.max = 0
+
+    def snapshot(self) -> Dict[str, float]:
+        """A summary of the recorded values.
+
+        :returns: a dict with the keys "count", "min", "mean", "p50", "p90", "p99",
+                  "p999", and "max"; all values are in microseconds.
+        """
+        return {
+            "count": self.count,
+            "min": self.min,
+            "mean": self.mean,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "p999": self.percentile(99.9),
+            "max": self.max,
+        }
+
+    def _index_of(self, value: int) -> int:
+        bucket = max(0, value.bit_length() - self._sub_bucket_bits)
+        sub_bucket = value >> bucket
+        return ((bucket + 1) << (self._sub_bucket_bits - 1)) + (
+            sub_bucket - self._sub_bucket_half_count
+        )
+
+    def _highest_equivalent(self, index: int) -> int:
+        bucket = (index >> (self._sub_bucket_bits - 1)) - 1
+        sub_bucket = (index & (self._sub_bucket_half_count - 1)) + (
+            self._sub_bucket_half_count
+        )
+        if bucket < 0:
+            sub_bucket -= self._sub_bucket_half_count
+            bucket = 0
+        return (sub_bucket << bucket) + (1 << bucket) - 1
+
+
+class ClockOffsetEstimator:
+    """
+    Estimates the offset between the camera's clock and the host's clock.
+
+    Every frame gives a sample of `host receive time - camera timestamp`, which is
+    the clock offset plus however long that frame took to arrive.  The least delayed
+    frame in a recent window is the best estimate of the offset, so this tracks a
+    sliding-window minimum of the samples.  The window lets the estimate follow clock
+    drift, and recover if either clock is adjusted.
+
+    Note that any constant delay (e.g. encoding time on the camera) is indistinguishable
+    from clock offset, so latencies corrected with this estimate are relative to the
+    fastest frame seen recently.
+
+    :var window: the number of samples the minimum is taken over.
+    :vartype window: int
+    """
+
+    def __init__(self, window: int = 600) -> None:
+        self.window = window
+        self._samples: Deque[Tuple[int, float]] = deque()
+        self._n = 0
+
+    def add_sample(self, camera_time: float, host_time: float) -> float:
+        """Add a sample, and return the current offset estimate.
+
+        :param camera_time: the camera's timestamp for a frame, in seconds.
+        :param host_time: the host's time when that frame was received, in seconds.
+        :returns: the estimated offset, in seconds (host clock minus camera clock).
+        """
+        sample = host_time - camera_time
+        # keep a monotonically increasing deque, so the minimum is always at the front
+        while self._samples and self._samples[-1][1] >= sample:
+            self._samples.pop()
+        self._samples.append((self._n, sample))
+        if self._samples[0][0] <= self._n - self.window:
+            self._samples.popleft()
+        self._n += 1
+        return self._samples[0][1]
+
+    @property
+    def offset(self) -> Optional[float]:
+        """The current offset estimate in seconds, or None if no samples were added."""
+        return self._samples[0][1] if self._samples else None
+
+
+class FrameTimes:
+    """
+    When a single frame reached each stage of the pipeline.
+
+    :var camera_time: the camera's timestamp for the frame, translated to the host's
+                      clock using the current clock offset estimate.
+    :var received: the host time the frame was received.
+    :var decoded: the host time the frame was decoded, if it has been.
+    :var delivered: the host time the frame was delivered as a numpy array, if it has been.
+    """
+
+    def __init__(self, camera_time: float, received: float) -> None:
+        self.camera_time = camera_time
+        self.received = received
+        self.decoded: Optional[float] = None
+        self.delivered: Optional[float] = None
+
+    def __repr__(self) -> str:
+        return (
+            f"<FrameTimes camera_time={self.camera_time} received={self.received} "
+            f"decoded={self.decoded} delivered={self.delivered}>"
+        )
+
+
+class FrameLatencyTracker:
+    """
+    Records when each frame was received, decoded, and delivered, and keeps latency
+    histograms for each step:
+
+     - "camera_to_receive": from the camera's timestamp to the frame being received,
+       with the clock offset between the camera and host removed.
+       See [ClockOffsetEstimator][wyzecam.latency.ClockOffsetEstimator].
+     - "receive_to_decoded": from the frame being received to it being decoded.
+     - "decoded_to_delivered": from decoding to the frame being converted to a numpy array.
+
+    Pass one of these to a [WyzeIOTCSession][wyzecam.iotc.WyzeIOTCSession] to enable it:
+
+    ```python
+    tracker = FrameLatencyTracker()
+    with WyzeIOTCSession(lib, account, camera, latency_tracker=tracker) as sess:
+        for frame, frame_info in sess.recv_video_frame_ndarray():
+            print(tracker.times(frame_info), tracker.snapshot())
+    ```
+
+    All times are in seconds, on the host's wall clock (`time.time()`).
+
+    :var histograms: a dict of [LatencyHistogram][wyzecam.latency.LatencyHistogram]s,
+                     keyed by the names above.
+    :var clock_offset: the [ClockOffsetEstimator][wyzecam.latency.ClockOffsetEstimator]
+                       used to correct camera timestamps.
+    """
+
+    STAGES: List[str] = [
+        "camera_to_receive",
+        "receive_to_decoded",
+        "decoded_to_delivered",
+    ]
+
+    def __init__(
+        self, max_pending: int = 256, offset_window: int = 600
+    ) -> None:
+        """Construct a FrameLatencyTracker
+
+        :param max_pending: the number of recent frames to remember the times of.
+        :param offset_window: the number of frames the clock offset is estimated over.
+        """
+        self.max_pending = max_pending
+        self.histograms: Dict[str, LatencyHistogram] = {
+            stage: LatencyHistogram() for stage in self.STAGES
+        }
+        self.clock_offset = ClockOffsetEstimator(offset_window)
+        self._frames: "OrderedDict[int, FrameTimes]" = OrderedDict()
+
+    def on_received(
+        self, frame_info: FrameInfo, now: Optional[float] = None
+    ) -> None:
+        """Record that a frame was received from the camera.
+
+        :param frame_info: the metadata of the frame.
+        :param now: the time the frame was received; defaults to `time.time()`.
+        """
+        now = time.time() if now is None else now
+        camera_time = camera_timestamp(frame_info)
+        offset = self.clock_offset.add_sample(camera_time, now)
+        self.histograms["camera_to_receive"].record_seconds(
+            now - (camera_time + offset)
+        )
+
+        self._frames[frame_info.frame_no] = FrameTimes(
+            camera_time + offset, now
+        )
+        if len(self._frames) > self.max_pending:
+            self._frames.popitem(last=False)
+
+    def on_decoded(
+        self, frame_info: FrameInfo, now: Optional[float] = None
+    ) -> None:
+        """Record that a frame was decoded.
+
+        :param frame_info: the metadata of the frame.
+        :param now: the time the frame was decoded; defaults to `time.time()`.
+        """
+        times = self._frames.get(frame_info.frame_no)
+        if times is None:
+            return
+        times.decoded = time.time() if now is None else now
+        self.histograms["receive_to_decoded"].record_seconds(
+            times.decoded - times.received
+        )
+
+    def on_delivered(
+        self, frame_info: FrameInfo, now: Optional[float] = None
+    ) -> None:
+        """Record that a decoded frame was delivered to the consumer.
+
+        :param frame_info: the metadata of the frame.
+        :param now: the time the frame was delivered; defaults to `time.time()`.
+        """
+        times = self._frames.get(frame_info.frame_no)
+        if times is None or times.decoded is None:
+            return
+        times.delivered = time.time() if now is None else now
+        self.histograms["decoded_to_delivered"].record_seconds(
+            times.delivered - times.decoded
+        )
+
+    def times(self, frame_info: FrameInfo) -> Optional[FrameTimes]:
+        """The recorded times for a recent frame.
+
+        :param frame_info: the metadata of the frame.
+        :returns: a [FrameTimes][wyzecam.latency.FrameTimes], or None if the frame is
+                  not one of the last `max_pending` frames received.
+        """
+        return self._frames.get(frame_info.frame_no)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """A summary of every latency histogram.
+
+        :returns: a dict of `LatencyHistogram.snapshot()` results, keyed by stage name.
+        """
+        return {
+            stage: histogram.snapshot()
+            for stage, histogram in self.histograms.items()
+        }
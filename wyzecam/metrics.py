@@ -0,0 +1,571 @@
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+import bisect
+import threading
+import weakref
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from wyzecam.tutk import tutk
+
+if TYPE_CHECKING:
+    from wyzecam.iotc import WyzeIOTCSession
+
+Sample = Tuple[str, str, str, Dict[str, str], float]
+"""A single sample from a collector: (name, type, help, labels, value)."""
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+"""The default histogram buckets, in seconds."""
+
+
+class Counter:
+    """
+    A monotonically increasing counter that can be incremented from any thread without
+    taking a lock.
+
+    Each thread increments its own cell, so increments never race; reading the value
+    sums the cells.  Cells of threads that have exited are kept, so the total never
+    goes backwards.
+    """
+
+    def __init__(self) -> None:
+        self._local = threading.local()
+        self._cells: List[List[float]] = []
+
+    def inc(self, amount: float = 1) -> None:
+        """Increment the counter.
+
+        :param amount: the amount to add; must not be negative.
+        """
+        try:
+            cell = self._local.cell
+        except AttributeError:
+            cell = self._local.cell = [0]
+            self._cells.append(cell)
+        cell[0] += amount
+
+    @property
+    def value(self) -> float:
+        """The current value of the counter."""
+        return sum(cell[0] for cell in list(self._cells))
+
+
+class Histogram:
+    """
+    A histogram of observed values with fixed buckets, that can be updated from any
+    thread without taking a lock, like a [Counter][wyzecam.metrics.Counter].
+
+    :var buckets: the upper bounds of the buckets, in increasing order.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        self._local = threading.local()
+        self._cells: List[List[float]] = []
+
+    def observe(self, value: float) -> None:
+        """Record a single value.
+
+        :param value: the value to record.
+        """
+        try:
+            cell = self._local.cell
+        except AttributeError:
+            # one count per bucket, then +Inf, then the sum
+            cell = self._local.cell = [0] * (len(self.buckets) + 2)
+            self._cells.append(cell)
+        cell[bisect.bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        """The current state of the histogram.
+
+        :returns: a tuple of (cumulative counts, sum); the counts are of the values at
+                  most each bucket's upper bound, followed by the total count.
+        """
+        counts = [0] * (len(self.buckets) + 1)
+        total = 0.0
+        for cell in list(self._cells):
+            for i in range(len(counts)):
+                counts[i] += int(cell[i])
+            total += cell[-1]
+        for i in range(1, len(counts)):
+            counts[i] += counts[i - 1]
+        return counts, total
+
+
+class MetricFamily:
+    """
+    A named metric, with one [Counter][wyzecam.metrics.Counter] or
+    [Histogram][wyzecam.metrics.Histogram] per combination of label values.
+
+    Constructed by [MetricsRegistry.counter][wyzecam.metrics.MetricsRegistry.counter]
+    and [MetricsRegistry.histogram][wyzecam.metrics.MetricsRegistry.histogram].
+
+    :var name: the name of the metric.
+    :var type: "counter" or "histogram".
+    :var help: a description of the metric.
+    :var label_names: the names of the metric's labels.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        type: str,
+        help: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.type = type
+        self.help = help
+        self.label_names = tuple(label_names)
+        self._buckets = tuple(buckets)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+
+    def labels(self, *values: Any) -> Any:
+        """The metric for a combination of label values, created on first use.
+
+        Look these up once and keep them, rather than on every update.
+
+        :param values: a value for each of the family's labels, in order.
+        :returns: a [Counter][wyzecam.metrics.Counter] or
+                  [Histogram][wyzecam.metrics.Histogram].
+        """
+        key = tuple(str(value) for value in values)
+        assert len(key) == len(
+            self.label_names
+        ), f"{self.name} expects labels {self.label_names}"
+        child = self._children.get(key)
+        if child is None:
+            new = (
+                Counter()
+                if self.type == "counter"
+                else Histogram(self._buckets)
+            )
+            # setdefault is atomic, so racing threads all get the same child
+            child = self._children.setdefault(key, new)
+        return child
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {_escape_help(self.help)}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        for key, child in list(self._children.items()):
+            labels = dict(zip(self.label_names, key))
+            if self.type == "counter":
+                lines.append(_sample_line(self.name, labels, child.value))
+                continue
+            counts, total = child.snapshot()
+            for bound, count in zip(self._buckets + (float("inf"),), counts):
+                lines.append(
+                    _sample_line(
+                        f"{self.name}_bucket",
+                        {**labels, "le": _format_value(bound)},
+                        count,
+                    )
+                )
+            lines.append(_sample_line(f"{self.name}_sum", labels, total))
+            lines.append(_sample_line(f"{self.name}_count", labels, counts[-1]))
+        return lines
+
+
+class MetricsRegistry:
+    """
+    A set of metrics, rendered in the
+    [Prometheus text format](https://prometheus.io/docs/instrumenting/exposition_formats/).
+
+    Pass one of these to [WyzeIOTCSession][wyzecam.iotc.WyzeIOTCSession] (or
+    [WyzeIOTC.connect_and_auth][wyzecam.iotc.WyzeIOTC.connect_and_auth]) to instrument
+    it, and serve it over HTTP for Prometheus to scrape:
+
+    ```python
+    registry = MetricsRegistry()
+    server = registry.serve(port=9464)
+    with wyze_iotc.connect_and_auth(account, camera, metrics=registry) as sess:
+        for (frame, frame_info) in sess.recv_video_frame_ndarray():
+            ...
+    server.close()
+    ```
+
+    Metrics updated on every frame are lock-free; anything that can be read from
+    existing counters (such as the session's [RecvStats][wyzecam.stats.RecvStats]) or
+    queried from the library (such as packet counts) is only read when the metrics are
+    rendered, by a collector.
+    """
+
+    def __init__(self) -> None:
+        self._families: Dict[str, MetricFamily] = {}
+        self._collectors: Dict[Any, Callable[[], Iterable[Sample]]] = {}
+        self._lock = threading.Lock()
+
+    def counter(
+        self, name: str, help: str, label_names: Sequence[str] = ()
+    ) -> MetricFamily:
+        """Get or create a counter metric.
+
+        :param name: the name of the metric; by convention, ending in "_total".
+        :param help: a description of the metric.
+        :param label_names: the names of the metric's labels.
+        :returns: a [MetricFamily][wyzecam.metrics.MetricFamily] of counters.
+        """
+        return self._family(name, "counter", help, label_names, DEFAULT_BUCKETS)
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> MetricFamily:
+        """Get or create a histogram metric.
+
+        :param name: the name of the metric, including its unit, e.g. "_seconds".
+        :param help: a description of the metric.
+        :param label_names: the names of the metric's labels.
+        :param buckets: the upper bounds of the histogram's buckets.
+        :returns: a [MetricFamily][wyzecam.metrics.MetricFamily] of histograms.
+        """
+        return self._family(name, "histogram", help, label_names, buckets)
+
+    def set_collector(
+        self, key: Any, collector: Optional[Callable[[], Iterable[Sample]]]
+    ) -> None:
+        """Add, replace, or remove a function called to collect samples on every render.
+
+        :param key: identifies the collector; setting a collector with the same key
+                    replaces the previous one.
+        :param collector: a function returning samples, as tuples of (name, type, help,
+                          labels, value); or None to remove the collector.
+        """
+        with self._lock:
+            if collector is None:
+                self._collectors.pop(key, None)
+            else:
+                self._collectors[key] = collector
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text format.
+
+        :returns: the metrics, as a string.
+        """
+        with self._lock:
+            families = list(self._families.values())
+            collectors = list(self._collectors.values())
+
+        lines: List[str] = []
+        for family in families:
+            lines.extend(family.render())
+
+        collected: Dict[str, Tuple[str, str, List[str]]] = {}
+        for collector in collectors:
+            for name, type, help, labels, value in collector():
+                if name not in collected:
+                    collected[name] = (type, help, [])
+                collected[name][2].append(_sample_line(name, labels, value))
+        for name, (type, help, samples) in collected.items():
+            lines.append(f"# HELP {name} {_escape_help(help)}")
+            lines.append(f"# TYPE {name} {type}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+    def serve(
+        self, host: str = "127.0.0.1", port: int = 9464
+    ) -> "MetricsServer":
+        """Start serving the metrics over HTTP, on a background thread.
+
+        :param host: the address to listen on; only the local machine by default.
+        :param port: the port to listen on; 0 picks a free one.
+        :returns: the running [MetricsServer][wyzecam.metrics.MetricsServer].
+        """
+        return MetricsServer(self, host, port)
+
+    def _family(
+        self,
+        name: str,
+        type: str,
+        help: str,
+        label_names: Sequence[str],
+        buckets: Sequence[float],
+    ) -> MetricFamily:
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = MetricFamily(name, type, help, label_names, buckets)
+                self._families[name] = family
+        assert family.type == type and family.label_names == tuple(
+            label_names
+        ), f"{name} is already registered as a different metric"
+        return family
+
+
+class MetricsServer:
+    """
+    A tiny HTTP server exposing a [MetricsRegistry][wyzecam.metrics.MetricsRegistry]
+    at `/metrics`, on a daemon thread.
+
+    Constructed by [MetricsRegistry.serve][wyzecam.metrics.MetricsRegistry.serve].
+
+    :var port: the port the server is listening on.
+    :vartype port: int
+    """
+
+    def __init__(self, registry: MetricsRegistry, host: str, port: int) -> None:
+        handler = type(
+            "MetricsHandler", (_MetricsHandler,), {"registry": registry}
+        )
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        self.port: int = self._server.server_address[1]
+        self._thread = threading.Thread(
+            target=self._server.serve_forever,
+            name="wyzecam-metrics",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def __enter__(self) -> "MetricsServer":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self) -> None:
+        """Stop the server."""
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry: MetricsRegistry
+
+    def do_GET(self) -> None:
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header(
+            "Content-Type", "text/plain; version=0.0.4; charset=utf-8"
+        )
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass  # don't write a line to stderr for every scrape
+
+
+class SessionMetrics:
+    """
+    The metrics of a single [WyzeIOTCSession][wyzecam.iotc.WyzeIOTCSession], and of the
+    [TutkIOCtrlMux][wyzecam.tutk.tutk_ioctl_mux.TutkIOCtrlMux]es it creates.
+
+    Created by the session when it is given a registry.  Every metric is labelled with
+    the camera's mac address, so many sessions can share a registry; a new session for
+    the same camera carries on the same metrics.
+
+    :var camera: the value of the "camera" label.
+    :var decode_seconds: a [Histogram][wyzecam.metrics.Histogram] of the time taken to
+                         decode each frame.
+    """
+
+    def __init__(self, registry: MetricsRegistry, camera: str) -> None:
+        self.registry = registry
+        self.camera = camera
+        self.decode_seconds: Histogram = registry.histogram(
+            "wyzecam_decode_seconds",
+            "Time taken to decode a video frame.",
+            ("camera",),
+        ).labels(camera)
+        self._phase_seconds = registry.histogram(
+            "wyzecam_session_phase_seconds",
+            "Time taken by each phase of connecting to a camera.",
+            ("camera", "phase"),
+            buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+        )
+        self._ioctl_rtt_seconds = registry.histogram(
+            "wyzecam_ioctl_rtt_seconds",
+            "Round trip time of ioctl commands, by command code.",
+            ("camera", "code"),
+        )
+        self._ioctl_errors = registry.counter(
+            "wyzecam_ioctl_errors_total",
+            "ioctl commands that failed to send, by command code.",
+            ("camera", "code"),
+        )
+
+    def observe_phase(self, phase: str, seconds: float) -> None:
+        """Record how long a phase of connecting took.
+
+        :param phase: "iotc_connect", "av_connect", or "auth".
+        :param seconds: the duration of the phase.
+        """
+        self._phase_seconds.labels(self.camera, phase).observe(seconds)
+
+    def observe_ioctl(self, code: int, seconds: float) -> None:
+        """Record the round trip time of an ioctl command.
+
+        :param code: the command code of the request.
+        :param seconds: the time from sending the request to receiving its response.
+        """
+        self._ioctl_rtt_seconds.labels(self.camera, code).observe(seconds)
+
+    def ioctl_failed(self, code: int) -> None:
+        """Record that an ioctl command could not be sent.
+
+        :param code: the command code of the request.
+        """
+        self._ioctl_errors.labels(self.camera, code).inc()
+
+    def collect_session(self, session: "WyzeIOTCSession") -> None:
+        """Report a session's receive counters and packet counts on every render.
+
+        Only a weak reference to the session is kept.  This replaces any previous
+        session's collector for the same camera.
+
+        :param session: the session.
+        """
+        session_ref = weakref.ref(session)
+        camera = {"camera": self.camera}
+
+        def collect() -> Iterable[Sample]:
+            session = session_ref()
+            if session is None:
+                return []
+            stats = session.recv_stats.snapshot()
+            samples: List[Sample] = [
+                (
+                    "wyzecam_frames_received_total",
+                    "counter",
+                    "Complete video frames received.",
+                    camera,
+                    stats["frames_ok"],
+                ),
+                (
+                    "wyzecam_received_bytes_total",
+                    "counter",
+                    "Bytes of video frame data received.",
+                    camera,
+                    stats["bytes_received"],
+                ),
+                (
+                    "wyzecam_not_ready_polls_total",
+                    "counter",
+                    "Polls for a frame when none was ready.",
+                    camera,
+                    stats["not_ready_polls"],
+                ),
+            ]
+            for code, value in (
+                (tutk.AV_ER_INCOMPLETE_FRAME, stats["frames_incomplete"]),
+                (tutk.AV_ER_LOSED_THIS_FRAME, stats["frames_lost"]),
+            ):
+                samples.append(
+                    (
+                        "wyzecam_frames_dropped_total",
+                        "counter",
+                        "Video frames dropped by the library, by error code.",
+                        {**camera, "code": str(code)},
+                        value,
+                    )
+                )
+            for reason, value in (
+                ("small_frame", stats["skipped_small_frames"]),
+                ("frame_size_mismatch", stats["skipped_frame_size_mismatches"]),
+                ("receiver_overflow", session.dropped_frames),
+            ):
+                samples.append(
+                    (
+                        "wyzecam_frames_skipped_total",
+                        "counter",
+                        "Video frames received but not delivered, by reason.",
+                        {**camera, "reason": reason},
+                        value,
+                    )
+                )
+            samples.extend(_session_info_samples(session, camera))
+            return samples
+
+        self.registry.set_collector(("session", self.camera), collect)
+
+
+def _session_info_samples(
+    session: "WyzeIOTCSession", labels: Dict[str, str]
+) -> List[Sample]:
+    if session.session_id is None:
+        return []
+    try:
+        info = session.session_check()
+    except tutk.TutkError:
+        return []
+    return [
+        (
+            "wyzecam_session_tx_packets_total",
+            "counter",
+            "Packets sent during the IOTC session.",
+            labels,
+            info.tx_packet_count,
+        ),
+        (
+            "wyzecam_session_rx_packets_total",
+            "counter",
+            "Packets received during the IOTC session.",
+            labels,
+            info.rx_packet_count,
+        ),
+    ]
+
+
+def _sample_line(
+    name: str, labels: Dict[str, str], value: Union[int, float]
+) -> str:
+    if labels:
+        label_str = ",".join(
+            f'{key}="{_escape_label(value)}"' for key, value in labels.items()
+        )
+        name = f"{name}{{{label_str}}}"
+    return f"{name} {_format_value(value)}"
+
+
+def _format_value(value: Union[int, float]) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _escape_help(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n")
@@ -44,11 +44,26 @@ class MockTutkLibrary:
         self.got_hello = None
         self.got_auth = None
         self.got_resolving_bit = None
+        self.frames = []
+        self.frames_sent = 0
+
+    def queue_frame(self, data, frame_info_cls=tutk.FrameInfoStruct, **fields):
+        """Queue up a video frame to be returned by avRecvFrameData2"""
+        fields.setdefault("codec_id", 78)
+        fields.setdefault("framerate", 20)
+        fields.setdefault("frame_len", len(data))
+        fields.setdefault("frame_no", len(self.frames))
+        self.frames.append((data, frame_info_cls(**fields)))
+
+    def queue_error(self, errno):
+        """Queue up an error to be returned by avRecvFrameData2"""
+        self.frames.append(errno)
 
     def avRecvFrameData2(
         self,
+        av_chan_id,
         frame_data_ptr,
-        frame_data_max_ptr,
+        frame_data_max_len,
         frame_data_actual_len_ptr,
         frame_data_expected_len_ptr,
         frame_info_ptr,
@@ -56,7 +71,25 @@ class MockTutkLibrary:
         frame_info_actual_len_ptr,
         frame_index_ptr,
     ):
-        pass
+        if not self.frames:
+            return tutk.AV_ER_SESSION_CLOSE_BY_REMOTE
+        frame = self.frames.pop(0)
+        if isinstance(frame, int):
+            return frame
+
+        data, frame_info = frame
+        if len(data) > frame_data_max_len.value:
+            return tutk.AV_ER_BUFPARA_MAXSIZE_INSUFF
+        ctypes.memmove(frame_data_ptr, data, len(data))
+        frame_data_actual_len_ptr.contents.value = len(data)
+        frame_data_expected_len_ptr.contents.value = len(data)
+        ctypes.memmove(
+            frame_info_ptr, bytes(frame_info), len(bytes(frame_info))
+        )
+        frame_info_actual_len_ptr.contents.value = ctypes.sizeof(frame_info)
+        frame_index_ptr.contents.value = self.frames_sent
+        self.frames_sent += 1
+        return len(data)
 
     def avRecvIOCtrl(
         self,
@@ -0,0 +1,178 @@
+from typing import Any, Dict, Optional, Tuple
+
+from collections import OrderedDict
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None  # type: ignore
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # type: ignore
+
+
+class TextOverlay:
+    """
+    Draws a line of outlined text onto video frames, rendering each distinct string
+    only once.
+
+    Anti-aliased text is expensive to rasterize, but overlays like the stats line of
+    [recv_video_frame_ndarray_with_stats][wyzecam.iotc.WyzeIOTCSession.recv_video_frame_ndarray_with_stats]
+    only change every now and then.  The first time a string is drawn, it is rendered
+    into a small patch, stored as fixed-point blending weights; after that, drawing it
+    is a single integer blend over the pixels the patch covers.  The most recently used
+    `cache_size` strings are kept.
+
+    ```python
+    overlay = TextOverlay()
+    for (frame, frame_info) in sess.recv_video_frame_ndarray():
+        overlay.draw(frame, f"frame {frame_info.frame_no // 20}")
+    ```
+
+    Text can also be drawn onto "gray" and "yuv420p" images, where only the luma is
+    blended; this is a third of the work of drawing onto a BGR image.
+
+    In order to use this, you will need to install [numpy](https://numpy.org/) and
+    [PyOpenCV](https://pypi.org/project/opencv-python/).
+
+    :var origin: the position of the bottom-left corner of the text, in pixels.
+    :vartype origin: Tuple[int, int]
+    :var renders: the number of times a string had to be rendered.
+    :vartype renders: int
+    """
+
+    def __init__(
+        self,
+        origin: Tuple[int, int] = (50, 50),
+        font_face: Optional[int] = None,
+        font_scale: float = 1,
+        cache_size: int = 8,
+    ) -> None:
+        """Construct a TextOverlay
+
+        :param origin: the position of the bottom-left corner of the text, as in
+                       `cv2.putText`.
+        :param font_face: the OpenCV font to use; defaults to `cv2.FONT_HERSHEY_DUPLEX`.
+        :param font_scale: the OpenCV font scale.
+        :param cache_size: the number of rendered strings to keep.
+        """
+        if cv2 is None or np is None:
+            raise RuntimeError(
+                "TextOverlay requires numpy and PyOpenCV. "
+                "Install with `pip install numpy opencv-python` and try again."
+            )
+        self.origin = origin
+        self.font_face = (
+            cv2.FONT_HERSHEY_DUPLEX if font_face is None else font_face
+        )
+        self.font_scale = font_scale
+        self.cache_size = cache_size
+        self.renders = 0
+        self._patches: "OrderedDict[str, _Patch]" = OrderedDict()
+
+    def draw(
+        self, img: "np.ndarray[Any, Any]", text: str, format: str = "bgr24"
+    ) -> "np.ndarray[Any, Any]":
+        """Draw text onto an image, in place.
+
+        :param img: the image, as returned by
+                    [frame_to_ndarray][wyzecam.decode.frame_to_ndarray].
+        :param text: the text to draw.
+        :param format: the pixel format of `img`: "bgr24", "rgb24", "gray" or
+                       "yuv420p".  For "yuv420p", the text is drawn onto the Y plane.
+        :returns: `img`.
+        """
+        patch = self._patch(text)
+        if format == "yuv420p":
+            # limited range luma: black is 16, white is 235
+            luma = img[: img.shape[0] * 2 // 3]
+            patch.blend(luma, self.origin, 16, 235)
+        else:
+            patch.blend(img, self.origin, 0, 255)
+        return img
+
+    def _patch(self, text: str) -> "_Patch":
+        patch = self._patches.get(text)
+        if patch is not None:
+            self._patches.move_to_end(text)
+            return patch
+        patch = _Patch(text, self.font_face, self.font_scale)
+        self.renders += 1
+        self._patches[text] = patch
+        if len(self._patches) > self.cache_size:
+            self._patches.popitem(last=False)
+        return patch
+
+
+class _Patch:
+    # an outlined string, rendered as coverage masks and turned into the weights of
+    # `out = img * keep / 255 + add`, which OpenCV does in two vectorized passes.
+    def __init__(self, text: str, font_face: int, font_scale: float) -> None:
+        outline_thickness = 2
+        (width, height), baseline = cv2.getTextSize(
+            text, font_face, font_scale, outline_thickness
+        )
+        pad = outline_thickness
+        self.width = width + 2 * pad
+        self.height = height + baseline + 2 * pad
+        self.offset = (pad, pad + height)
+
+        outline = np.zeros((self.height, self.width), np.uint8)
+        fill = np.zeros((self.height, self.width), np.uint8)
+        for mask, thickness in ((outline, outline_thickness), (fill, 1)):
+            cv2.putText(
+                mask,
+                text,
+                self.offset,
+                font_face,
+                font_scale,
+                255,
+                thickness,
+                cv2.LINE_AA,
+            )
+        # a black outline, then white text over it
+        self._outline = outline.astype(np.float32) / 255
+        self._fill = fill.astype(np.float32) / 255
+        self._weights: "Dict[Tuple[int, int, int], Tuple[Any, Any]]" = {}
+
+    def blend(
+        self,
+        img: "np.ndarray[Any, Any]",
+        origin: Tuple[int, int],
+        black: int,
+        white: int,
+    ) -> None:
+        # clip the patch to the image
+        x = origin[0] - self.offset[0]
+        y = origin[1] - self.offset[1]
+        x0, y0 = max(x, 0), max(y, 0)
+        x1 = min(x + self.width, img.shape[1])
+        y1 = min(y + self.height, img.shape[0])
+        if x0 >= x1 or y0 >= y1:
+            return
+        channels = img.shape[2] if img.ndim == 3 else 1
+        keep, add = self._weights_for(black, white, channels)
+        rows = slice(y0 - y, y1 - y)
+        cols = slice(x0 - x, x1 - x)
+        region = img[y0:y1, x0:x1]
+        cv2.multiply(region, keep[rows, cols], dst=region, scale=1 / 255)
+        cv2.add(region, add[rows, cols], dst=region)
+
+    def _weights_for(
+        self, black: int, white: int, channels: int
+    ) -> "Tuple[np.ndarray[Any, Any], np.ndarray[Any, Any]]":
+        weights = self._weights.get((black, white, channels))
+        if weights is None:
+            keep = (1 - self._outline) * (1 - self._fill)
+            add = self._outline * (1 - self._fill) * black + self._fill * white
+            if channels > 1:
+                keep = np.repeat(keep[:, :, None], channels, axis=2)
+                add = np.repeat(add[:, :, None], channels, axis=2)
+            weights = (
+                np.round(keep * 255).astype(np.uint8),
+                np.round(add).astype(np.uint8),
+            )
+            self._weights[(black, white, channels)] = weights
+        return weights
@@ -0,0 +1,479 @@
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Deque,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+import enum
+import logging
+import threading
+from collections import deque
+
+from wyzecam.tutk import tutk
+
+if TYPE_CHECKING:
+    from wyzecam.iotc import WyzeIOTCSession
+
+logger = logging.getLogger(__name__)
+
+FrameInfo = Union[tutk.FrameInfoStruct, tutk.FrameInfo3Struct]
+
+
+class DropPolicy(enum.Enum):
+    """What a [FrameRingBuffer][wyzecam.receiver.FrameRingBuffer] does when it is full.
+
+    None of these policies will ever deliver a P-frame whose keyframe has been dropped;
+    whenever a frame has to be dropped, every frame depending on it is dropped too.
+    """
+
+    DROP_OLDEST = "drop_oldest"
+    """Evict the oldest group of pictures (a keyframe and the frames following it)"""
+
+    DROP_UNTIL_KEYFRAME = "drop_until_keyframe"
+    """Drop new frames until the next keyframe arrives, keeping what is buffered"""
+
+    BLOCK = "block"
+    """Wait for the consumer to make room.  Note that this lets the library's own
+    buffer fill up instead, which may cause frames to be lost there."""
+
+
+class FrameRingBuffer:
+    """
+    A bounded, thread-safe queue of compressed video frames, which drops frames
+    in whole groups of pictures so that the frames it delivers can always be decoded.
+
+    :var max_frames: the maximum number of frames held in the buffer.
+    :vartype max_frames: int
+    :var max_bytes: the maximum number of bytes of frame data held in the buffer, or None.
+    :vartype max_bytes: int
+    :var drop_policy: what to do when the buffer is full.
+                      See [DropPolicy][wyzecam.receiver.DropPolicy].
+    :var buffered_bytes: the number of bytes of frame data currently buffered.
+    :vartype buffered_bytes: int
+    :var dropped_frames: the total number of frames dropped by this buffer.
+    :vartype dropped_frames: int
+    :var dropped_keyframes: how many of the dropped frames were keyframes.
+    :vartype dropped_keyframes: int
+    :var dropped_bytes: the total number of bytes of frame data dropped by this buffer.
+    :vartype dropped_bytes: int
+    """
+
+    def __init__(
+        self,
+        max_frames: int = 100,
+        max_bytes: Optional[int] = None,
+        drop_policy: DropPolicy = DropPolicy.DROP_UNTIL_KEYFRAME,
+    ) -> None:
+        assert (
+            max_frames >= 1
+        ), "FrameRingBuffer needs room for at least one frame"
+        self.max_frames = max_frames
+        self.max_bytes = max_bytes
+        self.drop_policy = drop_policy
+        self.frames: Deque[Tuple[bytes, FrameInfo]] = deque()
+        self.buffered_bytes = 0
+        self.dropped_frames = 0
+        self.dropped_keyframes = 0
+        self.dropped_bytes = 0
+        self.closed = False
+        self._waiting_for_keyframe = False
+        # whether DropPolicy.BLOCK may block; see FrameReceiver
+        self._blocking = True
+        # bumped by clear(), to abandon puts that are waiting for room
+        self._generation = 0
+        self._cond = threading.Condition()
+        self._listeners: List[Callable[[], None]] = []
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    def put(self, frame_data: bytes, frame_info: FrameInfo) -> bool:
+        """Add a frame to the buffer, dropping frames according to `drop_policy` if full.
+
+        With `DropPolicy.BLOCK`, this waits until there is room for the frame (unless
+        the buffer is one of several readers of a
+        [FrameReceiver][wyzecam.receiver.FrameReceiver], in which case a full buffer
+        drops frames until the next keyframe).
+
+        :param frame_data: the raw frame data.
+        :param frame_info: the metadata of the frame.
+        :returns: True if the frame was buffered, False if it was dropped.
+        """
+        is_keyframe = bool(frame_info.is_keyframe)
+        with self._cond:
+            generation = self._generation
+            if self.closed:
+                return False
+            if self._waiting_for_keyframe:
+                if not is_keyframe:
+                    self._count_drop(frame_data, frame_info)
+                    return False
+                self._waiting_for_keyframe = False
+
+            while self._is_full(len(frame_data)):
+                if self.drop_policy == DropPolicy.BLOCK and self._blocking:
+                    self._cond.wait()
+                    if self.closed or self._generation != generation:
+                        return False
+                elif self.drop_policy == DropPolicy.DROP_OLDEST or is_keyframe:
+                    self._evict_oldest_gop()
+                    if not self.frames and not is_keyframe:
+                        # we just evicted the frames this one depends on.
+                        self._count_drop(frame_data, frame_info)
+                        self._waiting_for_keyframe = True
+                        return False
+                else:
+                    self._count_drop(frame_data, frame_info)
+                    self._waiting_for_keyframe = True
+                    return False
+
+            self.frames.append((frame_data, frame_info))
+            self.buffered_bytes += len(frame_data)
+            self._notify()
+            return True
+
+    def get(
+        self, timeout: Optional[float] = None
+    ) -> Optional[Tuple[bytes, FrameInfo]]:
+        """Remove and return the oldest frame in the buffer, waiting for one if empty.
+
+        :param timeout: the maximum number of seconds to wait for a frame.
+        :returns: a tuple of (frame_data, frame_info), or None if the buffer was closed
+                  (or the timeout expired) before a frame was available.
+        """
+        with self._cond:
+            if not self._cond.wait_for(
+                lambda: self.frames or self.closed, timeout
+            ):
+                return None
+            if not self.frames:
+                return None
+            frame_data, frame_info = self.frames.popleft()
+            self.buffered_bytes -= len(frame_data)
+            self._cond.notify_all()
+            return frame_data, frame_info
+
+    def close(self) -> None:
+        """Stop accepting frames, and wake up anyone waiting on this buffer.
+
+        Frames already buffered can still be retrieved with `get()`.
+        """
+        with self._cond:
+            self.closed = True
+            self._notify()
+
+    def add_listener(self, callback: Callable[[], None]) -> None:
+        """Call `callback` whenever a frame is added, or the buffer is closed.
+
+        This lets a consumer that can't block on `get()`, such as an event loop, wait
+        for frames without polling.  The callback is called from the producing thread,
+        with the buffer locked, so it should only hand off to the consumer (e.g. with
+        `loop.call_soon_threadsafe`).
+
+        :param callback: a function taking no arguments.
+        """
+        with self._cond:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[], None]) -> None:
+        """Stop calling a callback added with `add_listener()`."""
+        with self._cond:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def _notify(self) -> None:
+        self._cond.notify_all()
+        for callback in self._listeners:
+            callback()
+
+    def clear(self) -> None:
+        """Discard every buffered frame, without counting them as dropped.
+
+        The next frame accepted is a keyframe, and a `put()` waiting for room gives up.
+        """
+        with self._cond:
+            self.frames.clear()
+            self.buffered_bytes = 0
+            self._waiting_for_keyframe = True
+            self._generation += 1
+            self._cond.notify_all()
+
+    def _set_blocking(self, blocking: bool) -> None:
+        with self._cond:
+            self._blocking = blocking
+            self._cond.notify_all()
+
+    def _is_full(self, incoming_len: int) -> bool:
+        if not self.frames:
+            return False
+        if len(self.frames) >= self.max_frames:
+            return True
+        return (
+            self.max_bytes is not None
+            and self.buffered_bytes + incoming_len > self.max_bytes
+        )
+
+    def _evict_oldest_gop(self) -> None:
+        frame_data, frame_info = self.frames.popleft()
+        self.buffered_bytes -= len(frame_data)
+        self._count_drop(frame_data, frame_info)
+        while self.frames and not self.frames[0][1].is_keyframe:
+            frame_data, frame_info = self.frames.popleft()
+            self.buffered_bytes -= len(frame_data)
+            self._count_drop(frame_data, frame_info)
+
+    def _count_drop(self, frame_data: bytes, frame_info: FrameInfo) -> None:
+        self.dropped_frames += 1
+        self.dropped_bytes += len(frame_data)
+        if frame_info.is_keyframe:
+            self.dropped_keyframes += 1
+
+
+class GopCache:
+    """
+    A bounded, thread-safe cache of the most recent group of pictures: the latest
+    keyframe, and every frame received after it.
+
+    A decoder fed the contents of this cache is immediately caught up with the live
+    stream, so a consumer that starts reading from a running session can show its first
+    frame right away, rather than waiting for the camera's next keyframe.
+    [WyzeIOTCSession.recv_video_frame][wyzecam.iotc.WyzeIOTCSession.recv_video_frame]
+    does this automatically, if the session has a `gop_cache` and its receiver is
+    running:
+
+    ```python
+    sess = WyzeIOTCSession(lib, account, camera, gop_cache=GopCache())
+    ```
+
+    The same goes for a consumer joining a session that is already being read, through
+    [FrameReceiver.open_reader][wyzecam.receiver.FrameReceiver.open_reader].
+
+    If the group of pictures grows past `max_frames` or `max_bytes`, the cache is
+    emptied until the next keyframe arrives, as a partial group of pictures can't be
+    used to catch up with the stream.
+
+    :var max_frames: the maximum number of frames held in the cache.
+    :vartype max_frames: int
+    :var max_bytes: the maximum number of bytes of frame data held in the cache.
+    :vartype max_bytes: int
+    :var cached_bytes: the number of bytes of frame data currently cached.
+    :vartype cached_bytes: int
+    """
+
+    def __init__(
+        self, max_frames: int = 300, max_bytes: int = 8 * 1024 * 1024
+    ) -> None:
+        self.max_frames = max_frames
+        self.max_bytes = max_bytes
+        self.cached_bytes = 0
+        self._frames: List[Tuple[bytes, FrameInfo]] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def add(self, frame_data: bytes, frame_info: FrameInfo) -> None:
+        """Add a frame to the cache.
+
+        A keyframe replaces the contents of the cache; any other frame is appended to
+        the current group of pictures, if there is one.
+
+        :param frame_data: the raw frame data.
+        :param frame_info: the metadata of the frame.
+        """
+        with self._lock:
+            if frame_info.is_keyframe:
+                self._frames = []
+                self.cached_bytes = 0
+            elif not self._frames:
+                return
+            if (
+                len(self._frames) >= self.max_frames
+                or self.cached_bytes + len(frame_data) > self.max_bytes
+            ):
+                self._frames = []
+                self.cached_bytes = 0
+                return
+            self._frames.append((frame_data, frame_info))
+            self.cached_bytes += len(frame_data)
+
+    def frames(self) -> List[Tuple[bytes, FrameInfo]]:
+        """A snapshot of the cached frames, starting with a keyframe.
+
+        :returns: a list of (frame_data, frame_info) tuples, or an empty list if no
+                  keyframe has been received yet.
+        """
+        with self._lock:
+            return list(self._frames)
+
+    def clear(self) -> None:
+        """Empty the cache, until the next keyframe arrives."""
+        with self._lock:
+            self._frames = []
+            self.cached_bytes = 0
+
+
+class FrameReceiver(threading.Thread):
+    """
+    A background thread that continuously drains video frames from a
+    [WyzeIOTCSession][wyzecam.iotc.WyzeIOTCSession] into a
+    [FrameRingBuffer][wyzecam.receiver.FrameRingBuffer], so that a slow consumer does
+    not cause the TUTK library's own buffer to overflow.
+
+    This is generally started with
+    [WyzeIOTCSession.start_receiver][wyzecam.iotc.WyzeIOTCSession.start_receiver].
+
+    Several consumers can read from the same receiver at once, each getting every frame;
+    see `open_reader()`.  With `DropPolicy.BLOCK`, a reader only holds up the receiver
+    while it is the only one; once there are several, a reader that falls behind drops
+    frames until the next keyframe instead, so it can't stall the others.
+
+    :var session: the session frames are received from.
+    :var ring_buffer: the buffer frames are received into, read by the first reader.
+    :var error: the error that stopped this receiver, if any.
+    """
+
+    def __init__(
+        self, session: "WyzeIOTCSession", ring_buffer: FrameRingBuffer
+    ) -> None:
+        super().__init__(
+            name=f"wyzecam-receiver-{session.camera.nickname}", daemon=True
+        )
+        self.session = session
+        self.ring_buffer = ring_buffer
+        self.error: Optional[BaseException] = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._ring_buffer_claimed = False
+        # the buffers being fed, and for each, the frame_no of the last cached frame it
+        # was primed with, until that has been passed.  ring_buffer is fed from the
+        # start, so that its first reader gets everything received before it started.
+        self._readers: Dict[FrameRingBuffer, Optional[int]] = {
+            ring_buffer: None
+        }
+
+    def open_reader(self) -> FrameRingBuffer:
+        """Start reading frames from this receiver.
+
+        The first reader reads `ring_buffer` itself, including any frames buffered
+        before it started.  A reader that starts while another is still reading gets a
+        buffer of its own, with the same limits, fed every frame received from then on;
+        it starts with the session's [GopCache][wyzecam.receiver.GopCache] if it has
+        one, or otherwise at the next keyframe.  So does a reader that takes over
+        `ring_buffer` after its previous reader has finished.
+
+        :returns: the [FrameRingBuffer][wyzecam.receiver.FrameRingBuffer] to read
+                  from; pass it to `close_reader()` once done.
+        """
+        with self._lock:
+            if not self._ring_buffer_claimed:
+                self._ring_buffer_claimed = True
+                reader = self.ring_buffer
+                if reader in self._readers:
+                    return reader
+            else:
+                reader = FrameRingBuffer(
+                    self.ring_buffer.max_frames,
+                    self.ring_buffer.max_bytes,
+                    self.ring_buffer.drop_policy,
+                )
+                reader.clear()
+            self._readers[reader] = self._prime(reader)
+            self._update_blocking()
+            if self.ring_buffer.closed:
+                reader.close()
+            return reader
+
+    def close_reader(self, reader: FrameRingBuffer) -> None:
+        """Stop reading frames from this receiver.
+
+        Frames are no longer put into the reader's buffer; if it is `ring_buffer`, the
+        frames left in it are discarded.
+
+        :param reader: a buffer returned by `open_reader()`.
+        """
+        with self._lock:
+            self._readers.pop(reader, None)
+            self._update_blocking()
+            if reader is self.ring_buffer:
+                self._ring_buffer_claimed = False
+                reader.clear()
+                return
+        reader.close()
+
+    def _prime(self, reader: FrameRingBuffer) -> Optional[int]:
+        # fill an empty reader with the gop cache, if it fits.  Returns the frame_no of
+        # the last cached frame, if any.
+        gop_cache = self.session.gop_cache
+        cached = gop_cache.frames() if gop_cache is not None else []
+        if not cached:
+            return None
+        if len(cached) > reader.max_frames or (
+            reader.max_bytes is not None
+            and sum(len(frame_data) for frame_data, _ in cached)
+            > reader.max_bytes
+        ):
+            # it wouldn't fit; start at the next keyframe instead
+            return None
+        reader._set_blocking(False)
+        for frame_data, frame_info in cached:
+            reader.put(frame_data, frame_info)
+        return int(cached[-1][1].frame_no)
+
+    def _update_blocking(self) -> None:
+        blocking = len(self._readers) == 1
+        for reader in self._readers:
+            reader._set_blocking(blocking)
+
+    def run(self) -> None:
+        recv_buffer = self.session.recv_buffer_pool.acquire()
+        try:
+            while not self._stopping.is_set():
+                errno, frame_data, frame_info = self.session._poll_frame_data(
+                    recv_buffer
+                )
+                if errno == tutk.AV_ER_DATA_NOREADY:
+                    self.session.wait_policy.wait()
+                    continue
+                if frame_data is None or frame_info is None:
+                    continue
+                self._put_readers(frame_data, frame_info)
+        except Exception as e:
+            logger.warning(f"Frame receiver stopped: {e}")
+            self.error = e
+        finally:
+            recv_buffer.release()
+            self._close_buffers()
+
+    def _put_readers(self, frame_data: bytes, frame_info: FrameInfo) -> None:
+        with self._lock:
+            readers = list(self._readers.items())
+        for reader, last_cached_frame_no in readers:
+            if last_cached_frame_no is not None:
+                if frame_info.frame_no <= last_cached_frame_no:
+                    continue  # the reader already has it from the gop cache
+                with self._lock:
+                    if reader in self._readers:
+                        self._readers[reader] = None
+            reader.put(frame_data, frame_info)
+
+    def _close_buffers(self) -> None:
+        with self._lock:
+            self.ring_buffer.close()
+            for reader in self._readers:
+                reader.close()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop receiving frames, and wait for the thread to exit.
+
+        :param timeout: the maximum number of seconds to wait for the thread to exit.
+        """
+        self._stopping.set()
+        self._close_buffers()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout)
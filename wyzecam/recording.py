@@ -0,0 +1,510 @@
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple, Union
+
+import datetime
+import io
+import os
+from collections import deque
+from fractions import Fraction
+
+from wyzecam.decode import codec_name_from_frameinfo
+from wyzecam.latency import camera_timestamp
+from wyzecam.tutk import tutk
+
+try:
+    import av
+except ImportError:
+    av = None  # type: ignore
+
+FrameInfo = Union[tutk.FrameInfoStruct, tutk.FrameInfo3Struct]
+
+CONTAINER_FORMATS = {".mp4": "mp4", ".mkv": "matroska"}
+"""The container formats chosen for each file extension, by default."""
+
+TIME_BASE = Fraction(1, 1000)
+"""The time base of recorded packets; timestamps are in milliseconds."""
+
+
+class SegmentRecorder:
+    """
+    Records raw video frames into a series of MP4 or MKV files, without decoding or
+    re-encoding them.
+
+    Frames from [recv_video_data][wyzecam.iotc.WyzeIOTCSession.recv_video_data] are
+    already compressed, so they are simply stream-copied into the container, with
+    timestamps taken from the camera's `timestamp` and `timestamp_ms`.  A new segment is
+    started on the first keyframe after the current one reaches `segment_duration`
+    seconds or `segment_bytes` bytes, so every segment starts with a keyframe and
+    plays on its own.
+
+    ```python
+    with SegmentRecorder("front-door-{start:%Y%m%d-%H%M%S}.mkv") as recorder:
+        for frame_data, frame_info in sess.recv_video_data():
+            recorder.write(frame_data, frame_info)
+    ```
+
+    MKV files remain playable if the recording is interrupted; MP4 files are only
+    complete once their segment has been closed.
+
+    In order to use this, you will need to install [PyAV](https://pyav.org/docs/stable/).
+
+    :var path_template: the path of each segment, as a `str.format` template.
+    :vartype path_template: str
+    :var segment_duration: the duration to cut segments at, in seconds, if any.
+    :var segment_bytes: the size to cut segments at, in bytes, if any.
+    :var segments: the paths of the segments that have been completed.
+    :vartype segments: List[str]
+    :var path: the path of the segment being written, if any.
+    """
+
+    def __init__(
+        self,
+        path_template: str,
+        segment_duration: Optional[float] = 60.0,
+        segment_bytes: Optional[int] = None,
+        format: Optional[str] = None,
+        on_segment: Optional[Callable[[str], None]] = None,
+    ) -> None:
+        """Construct a SegmentRecorder
+
+        :param path_template: the path of each segment.  It is formatted with `index`,
+                              the number of the segment starting from 0, and `start`,
+                              the camera's time at the start of the segment, as a
+                              datetime; e.g. "clip-{index:04d}.mp4".
+        :param segment_duration: start a new segment once the current one is this many
+                                 seconds long; None to only cut on size.
+        :param segment_bytes: start a new segment once the current one holds this many
+                              bytes of video; None to only cut on duration.
+        :param format: the container format, e.g. "mp4" or "matroska".  Defaults to
+                       one chosen from the file extension; see
+                       [CONTAINER_FORMATS][wyzecam.recording.CONTAINER_FORMATS].
+        :param on_segment: a function called with the path of each segment once it
+                           has been completed.
+        """
+        if av is None:
+            raise RuntimeError(
+                "SegmentRecorder requires PyAv to write video files. "
+                "Install with `pip install av` and try again."
+            )
+        self.path_template = path_template
+        self.segment_duration = segment_duration
+        self.segment_bytes = segment_bytes
+        self.format = format
+        self.on_segment = on_segment
+        self.segments: List[str] = []
+        self.path: Optional[str] = None
+        self._index = 0
+        self._muxer: Optional[_SegmentMuxer] = None
+
+    def __enter__(self) -> "SegmentRecorder":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def write(
+        self, frame_data: Union[bytes, memoryview], frame_info: FrameInfo
+    ) -> None:
+        """Add a frame to the recording.
+
+        Frames before the first keyframe are dropped, as they can't be decoded.
+
+        :param frame_data: the raw frame data.
+        :param frame_info: the metadata of the frame.
+        """
+        muxer = self._muxer
+        if frame_info.is_keyframe and (
+            muxer is None or self._should_cut(muxer, frame_info)
+        ):
+            self._close_segment()
+            muxer = self._open_segment(frame_data, frame_info)
+        if muxer is None:
+            return
+        muxer.write(frame_data, frame_info)
+
+    def close(self) -> None:
+        """Complete the current segment."""
+        self._close_segment()
+
+    def _should_cut(
+        self, muxer: "_SegmentMuxer", keyframe_info: FrameInfo
+    ) -> bool:
+        if (
+            muxer.codec_name != codec_name_from_frameinfo(keyframe_info)
+            or muxer.frame_size != keyframe_info.frame_size
+        ):
+            # the stream's parameters have changed
+            return True
+        if (
+            self.segment_duration is not None
+            and muxer.duration >= self.segment_duration
+        ):
+            return True
+        return (
+            self.segment_bytes is not None and muxer.bytes >= self.segment_bytes
+        )
+
+    def _open_segment(
+        self, frame_data: Union[bytes, memoryview], frame_info: FrameInfo
+    ) -> "_SegmentMuxer":
+        start = camera_timestamp(frame_info)
+        path = self.path_template.format(
+            index=self._index, start=datetime.datetime.fromtimestamp(start)
+        )
+        self._index += 1
+        format = self.format or CONTAINER_FORMATS.get(
+            os.path.splitext(path)[1].lower()
+        )
+        codec_name = codec_name_from_frameinfo(frame_info)
+        self._muxer = _SegmentMuxer(
+            path,
+            format,
+            codec_name,
+            frame_data,
+            frame_info,
+        )
+        self.path = path
+        return self._muxer
+
+    def _close_segment(self) -> None:
+        muxer, self._muxer = self._muxer, None
+        if muxer is None:
+            return
+        muxer.close()
+        self.path = None
+        assert muxer.path is not None
+        self.segments.append(muxer.path)
+        if self.on_segment is not None:
+            self.on_segment(muxer.path)
+
+
+class EventRecorder:
+    """
+    Keeps the last few seconds of raw video frames in memory, so that clips of events
+    can start before the event was detected.
+
+    Frames are held compressed, as received from
+    [recv_video_data][wyzecam.iotc.WyzeIOTCSession.recv_video_data], in a buffer that
+    always starts on a keyframe and covers at least `pre_event` seconds, dropping whole
+    groups of pictures as newer ones arrive.  Calling
+    [trigger][wyzecam.recording.EventRecorder.trigger] writes the buffered frames to a
+    new clip, which then carries on until `post_event` seconds after the trigger;
+    triggering again while a clip is being written extends it.  Frames are
+    stream-copied into the clip, just like [SegmentRecorder][wyzecam.recording.SegmentRecorder],
+    so a camera only costs a few megabytes of memory and no decoding.
+
+    ```python
+    with EventRecorder("event-{start:%Y%m%d-%H%M%S}.mp4", pre_event=5) as recorder:
+        for frame_data, frame_info in sess.recv_video_data():
+            recorder.write(frame_data, frame_info)
+            if motion_detected():
+                recorder.trigger()
+    ```
+
+    In order to use this, you will need to install [PyAV](https://pyav.org/docs/stable/).
+
+    :var path_template: the path of each clip, as a `str.format` template.
+    :vartype path_template: str
+    :var pre_event: the number of seconds of video kept from before a trigger.
+    :vartype pre_event: float
+    :var post_event: the number of seconds of video recorded after a trigger.
+    :vartype post_event: float
+    :var max_bytes: the most bytes of video to keep in memory.
+    :vartype max_bytes: int
+    :var clips: the paths of the clips that have been completed.
+    :vartype clips: List[str]
+    :var path: the path of the clip being written, if any.
+    """
+
+    def __init__(
+        self,
+        path_template: str,
+        pre_event: float = 10.0,
+        post_event: float = 10.0,
+        max_bytes: int = 8 * 1024 * 1024,
+        format: Optional[str] = None,
+        on_clip: Optional[Callable[[str], None]] = None,
+    ) -> None:
+        """Construct an EventRecorder
+
+        :param path_template: the path of each clip.  It is formatted with `index`,
+                              the number of the clip starting from 0, and `start`, the
+                              camera's time at the start of the clip, as a datetime;
+                              e.g. "event-{index:04d}.mp4".
+        :param pre_event: keep at least this many seconds of video from before a
+                          trigger, when it fits in `max_bytes`.
+        :param post_event: carry on recording for this many seconds after a trigger.
+        :param max_bytes: drop the oldest buffered frames once they add up to more
+                          than this many bytes.  This takes priority over
+                          `pre_event`, and bounds the memory used for each camera.
+        :param format: the container format, e.g. "mp4" or "matroska".  Defaults to
+                       one chosen from the file extension; see
+                       [CONTAINER_FORMATS][wyzecam.recording.CONTAINER_FORMATS].
+        :param on_clip: a function called with the path of each clip once it has been
+                        completed.
+        """
+        if av is None:
+            raise RuntimeError(
+                "EventRecorder requires PyAv to write video files. "
+                "Install with `pip install av` and try again."
+            )
+        self.path_template = path_template
+        self.pre_event = pre_event
+        self.post_event = post_event
+        self.max_bytes = max_bytes
+        self.format = format
+        self.on_clip = on_clip
+        self.clips: List[str] = []
+        self.path: Optional[str] = None
+        self._index = 0
+        self._gops: Deque[_GroupOfPictures] = deque()
+        self._bytes = 0
+        self._now: Optional[float] = None
+        self._triggered = False
+        self._clip_end = 0.0
+        self._muxer: Optional[_SegmentMuxer] = None
+
+    def __enter__(self) -> "EventRecorder":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def buffered_bytes(self) -> int:
+        """The number of bytes of video held in memory."""
+        return self._bytes
+
+    @property
+    def buffered_duration(self) -> float:
+        """The number of seconds of video held in memory."""
+        if not self._gops or self._now is None:
+            return 0.0
+        return self._now - self._gops[0].start
+
+    def write(
+        self, frame_data: Union[bytes, memoryview], frame_info: FrameInfo
+    ) -> None:
+        """Add a frame to the buffer, and to the current clip, if any.
+
+        Frames before the first keyframe are dropped, as they can't be decoded.
+
+        :param frame_data: the raw frame data.
+        :param frame_info: the metadata of the frame.
+        """
+        frame = (bytes(frame_data), frame_info)
+        now = camera_timestamp(frame_info)
+        if self._muxer is not None and now >= self._clip_end:
+            self._close_clip()
+        self._now = now
+
+        if frame_info.is_keyframe:
+            if self._gops and self._gops[-1].changed(frame_info):
+                # older frames can't go into the same file as newer ones
+                self._gops.clear()
+                self._bytes = 0
+                if self._muxer is not None:
+                    self._close_clip()
+                    self._triggered = True
+            self._gops.append(_GroupOfPictures(now))
+        if self._muxer is not None:
+            self._muxer.write(*frame)
+        if not self._gops:
+            return
+        gop = self._gops[-1]
+        gop.frames.append(frame)
+        gop.bytes += len(frame[0])
+        self._bytes += len(frame[0])
+        self._trim()
+        if self._muxer is None and self._triggered and self._gops:
+            self._open_clip()
+
+    def trigger(self) -> None:
+        """Start a clip with the buffered frames, or extend the current one.
+
+        The clip ends `post_event` seconds after the camera time of the latest frame.
+        If no keyframe has been received yet, the clip starts at the next one.
+        """
+        if self._now is None:
+            self._triggered = True
+            return
+        self._clip_end = self._now + self.post_event
+        if self._muxer is None:
+            self._triggered = True
+            if self._gops:
+                self._open_clip()
+
+    def close(self) -> None:
+        """Complete the current clip, if any."""
+        self._triggered = False
+        self._close_clip()
+
+    def _trim(self) -> None:
+        gops = self._gops
+        # drop the oldest group of pictures while the rest still covers pre_event
+        while (
+            len(gops) > 1
+            and self._now is not None
+            and self._now - gops[1].start >= self.pre_event
+        ):
+            self._bytes -= gops.popleft().bytes
+        while gops and self._bytes > self.max_bytes:
+            self._bytes -= gops.popleft().bytes
+
+    def _open_clip(self) -> None:
+        frame_data, frame_info = self._gops[0].frames[0]
+        start = camera_timestamp(frame_info)
+        if self._now is not None and self._clip_end <= self._now:
+            # triggered before any keyframe was received
+            self._clip_end = self._now + self.post_event
+        path = self.path_template.format(
+            index=self._index, start=datetime.datetime.fromtimestamp(start)
+        )
+        self._index += 1
+        format = self.format or CONTAINER_FORMATS.get(
+            os.path.splitext(path)[1].lower()
+        )
+        codec_name = codec_name_from_frameinfo(frame_info)
+        self._muxer = _SegmentMuxer(
+            path,
+            format,
+            codec_name,
+            frame_data,
+            frame_info,
+        )
+        self.path = path
+        self._triggered = False
+        for gop in self._gops:
+            for frame in gop.frames:
+                self._muxer.write(*frame)
+
+    def _close_clip(self) -> None:
+        muxer, self._muxer = self._muxer, None
+        if muxer is None:
+            return
+        muxer.close()
+        self.path = None
+        assert muxer.path is not None
+        self.clips.append(muxer.path)
+        if self.on_clip is not None:
+            self.on_clip(muxer.path)
+
+
+class _GroupOfPictures:
+    __slots__ = ("start", "frames", "bytes")
+
+    def __init__(self, start: float) -> None:
+        self.start = start
+        self.frames: List[Tuple[bytes, FrameInfo]] = []
+        self.bytes = 0
+
+    def changed(self, keyframe_info: FrameInfo) -> bool:
+        frame_info = self.frames[0][1]
+        return (
+            codec_name_from_frameinfo(frame_info)
+            != codec_name_from_frameinfo(keyframe_info)
+            or frame_info.frame_size != keyframe_info.frame_size
+        )
+
+
+def probe_picture_size(
+    codec_name: str, keyframe: Union[bytes, memoryview]
+) -> Optional[Tuple[int, int]]:
+    """The size of the pictures in a stream, found by decoding a single keyframe.
+
+    :param codec_name: the PyAV codec of the stream, e.g. "h264" or "hevc".
+    :param keyframe: the raw data of a keyframe.
+    :returns: a tuple of (width, height), or None if the keyframe could not be decoded.
+    """
+    codec: Any = av.CodecContext.create(codec_name, "r")
+    packet = av.Packet(len(keyframe))
+    memoryview(packet)[:] = keyframe
+    try:
+        frames = codec.decode(packet) + codec.decode(None)
+    except av.FFmpegError:
+        return None
+    if not frames:
+        return None
+    return frames[0].width, frames[0].height
+
+
+def _add_copy_stream(
+    container: Any, codec_name: str, keyframe: Union[bytes, memoryview]
+) -> Any:
+    # container headers want the picture size and parameter sets, which are only in
+    # the bitstream.  They're taken from the keyframe by the raw stream demuxer and its
+    # decoder, rather than from an encoder, which FFmpeg builds without libx264 or
+    # libx265 don't have.
+    try:
+        with av.open(
+            io.BytesIO(keyframe), format=codec_name
+        ) as template_container:
+            if template_container.streams.video:
+                template = template_container.streams.video[0]
+                if hasattr(container, "add_stream_from_template"):
+                    # PyAV 14 and later; opaque keeps the template's decoder
+                    return container.add_stream_from_template(
+                        template, opaque=True
+                    )
+                return container.add_stream(template=template)
+    except av.FFmpegError:
+        pass
+    # the keyframe couldn't be parsed; fall back on an encoder's parameters
+    return container.add_stream(codec_name)
+
+
+class _SegmentMuxer:
+    # stream-copies frames into a single container, with timestamps in milliseconds
+    # since its first frame.
+    def __init__(
+        self,
+        file: Union[str, io.IOBase],
+        format: Optional[str],
+        codec_name: str,
+        keyframe: Union[bytes, memoryview],
+        frame_info: FrameInfo,
+        options: Optional[Dict[str, str]] = None,
+    ) -> None:
+        self.path = file if isinstance(file, str) else None
+        self.codec_name = codec_name
+        self.frame_size = frame_info.frame_size
+        self.bytes = 0
+        self.duration = 0.0
+        self.start = camera_timestamp(frame_info)
+        self.last_pts = -1
+        self.end_pts = 0
+        self._container = av.open(file, "w", format=format, options=options)
+        self._stream = _add_copy_stream(self._container, codec_name, keyframe)
+        self._stream.time_base = TIME_BASE
+        if codec_name == "hevc" and self._container.format.name.startswith(
+            "mp4"
+        ):
+            # the tag browsers and Apple devices expect for HEVC in MP4
+            self._stream.codec_context.codec_tag = "hvc1"
+
+    def write(
+        self, frame_data: Union[bytes, memoryview], frame_info: FrameInfo
+    ) -> None:
+        interval = max(1000 // (frame_info.framerate or 20), 1)
+        pts = int(round((camera_timestamp(frame_info) - self.start) * 1000))
+        if pts <= self.last_pts:
+            # the doorbell doesn't send timestamp_ms, and timestamps can jitter;
+            # fall back on the nominal frame rate to keep them increasing.
+            pts = self.last_pts + interval
+        self.last_pts = pts
+        self.end_pts = pts + interval
+
+        packet = av.Packet(len(frame_data))
+        memoryview(packet)[:] = frame_data
+        packet.stream = self._stream
+        packet.time_base = TIME_BASE
+        packet.pts = packet.dts = pts
+        # without it, the muxer has no frame rate to give the last frame a duration
+        packet.duration = interval
+        packet.is_keyframe = bool(frame_info.is_keyframe)
+        self._container.mux(packet)
+
+        self.bytes += len(frame_data)
+        self.duration = pts / 1000
+
+    def close(self) -> None:
+        self._container.close()
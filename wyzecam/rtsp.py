@@ -0,0 +1,736 @@
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+import base64
+import logging
+import random
+import socket
+import socketserver
+import struct
+import threading
+import urllib.parse
+
+from wyzecam.decode import codec_name_from_frameinfo
+from wyzecam.latency import camera_timestamp
+from wyzecam.receiver import (
+    DropPolicy,
+    FrameReceiver,
+    FrameRingBuffer,
+    GopCache,
+)
+from wyzecam.tutk import tutk
+
+if TYPE_CHECKING:
+    from wyzecam.iotc import WyzeIOTCSession
+
+logger = logging.getLogger(__name__)
+
+FrameInfo = Union[tutk.FrameInfoStruct, tutk.FrameInfo3Struct]
+
+RTP_PAYLOAD_TYPE = 96
+"""The dynamic RTP payload type used for video."""
+
+RTP_CLOCK_RATE = 90000
+"""The RTP clock rate of video, in Hz."""
+
+MAX_RTP_PAYLOAD = 1400
+"""The largest RTP payload sent; larger NAL units are split into fragmentation units."""
+
+PUMP_POLL_INTERVAL = 0.1
+"""
+How often a session's pump thread checks whether the server has been closed, while
+waiting for frames, in seconds.
+"""
+
+_H264_SPS, _H264_PPS = 7, 8
+_HEVC_VPS, _HEVC_SPS, _HEVC_PPS = 32, 33, 34
+
+
+class RtspServer:
+    """
+    A small RTSP server that rebroadcasts cameras to any number of clients, on a
+    background thread.
+
+    Every camera costs a single [WyzeIOTCSession][wyzecam.iotc.WyzeIOTCSession], however
+    many clients are watching it: the raw H.264 or H.265 from
+    [recv_video_data][wyzecam.iotc.WyzeIOTCSession.recv_video_data] is packetized into
+    RTP (RFC 6184 and RFC 7798) for each client, and sent either interleaved on the RTSP
+    connection (RTP over TCP) or over UDP.
+
+    ```python
+    with RtspServer(host="0.0.0.0") as server:
+        server.add_session("front-door", sess)
+        print(server.url("front-door"))  # rtsp://0.0.0.0:8554/front-door
+        ...
+    ```
+
+    A client that connects to a running stream is first sent the stream's latest group
+    of pictures, starting with the keyframe and the parameter sets before it, so it can
+    show a picture right away.  Each client has its own bounded
+    [FrameRingBuffer][wyzecam.receiver.FrameRingBuffer] and sending thread; a client
+    that can't keep up drops frames until the next keyframe, without holding up the
+    camera or the other clients.
+
+    :var host: the address the server listens on.
+    :vartype host: str
+    :var port: the port the server listens on.
+    :vartype port: int
+    :var streams: the streams being served, by name.
+    :vartype streams: Dict[str, RtspStream]
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 8554,
+        queue_frames: int = 100,
+        queue_bytes: Optional[int] = 4 * 1024 * 1024,
+    ) -> None:
+        """Construct an RtspServer, and start listening
+
+        :param host: the address to listen on; only the local machine by default.
+        :param port: the port to listen on; 0 picks a free one.
+        :param queue_frames: the most frames queued for each client.
+        :param queue_bytes: the most bytes of frame data queued for each client.
+        """
+        self.host = host
+        self.queue_frames = queue_frames
+        self.queue_bytes = queue_bytes
+        self.streams: Dict[str, RtspStream] = {}
+        self._closed = threading.Event()
+        self._pumps: List[threading.Thread] = []
+        # sessions whose receivers were started by add_session, to stop on close
+        self._started_receivers: List["WyzeIOTCSession"] = []
+
+        # RTP over UDP is sent from a single pair of sockets, to every client
+        self._rtp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._rtp_socket.bind((host, 0))
+        self._rtcp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._rtcp_socket.bind((host, 0))
+
+        handler = type("RtspHandler", (_RtspHandler,), {"rtsp": self})
+        self._server = socketserver.ThreadingTCPServer(
+            (host, port), handler, bind_and_activate=False
+        )
+        self._server.daemon_threads = True
+        self._server.allow_reuse_address = True
+        self._server.server_bind()
+        self._server.server_activate()
+        self.port: int = self._server.server_address[1]
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="wyzecam-rtsp", daemon=True
+        )
+        self._thread.start()
+
+    def __enter__(self) -> "RtspServer":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def url(self, name: str) -> str:
+        """The URL clients can play a stream from."""
+        return f"rtsp://{self.host}:{self.port}/{urllib.parse.quote(name)}"
+
+    def add_stream(self, name: str) -> "RtspStream":
+        """Add a stream, which frames are then written to by the caller.
+
+        The stream's gop cache is limited to `queue_frames` and `queue_bytes`, so that a
+        client starting to play gets the whole of the latest group of pictures in its
+        queue.
+
+        :param name: the path of the stream, e.g. "front-door".
+        :returns: the new [RtspStream][wyzecam.rtsp.RtspStream].
+        """
+        assert name not in self.streams, f"{name} is already being served"
+        gop_cache = (
+            GopCache(self.queue_frames)
+            if self.queue_bytes is None
+            else GopCache(self.queue_frames, self.queue_bytes)
+        )
+        stream = RtspStream(name, gop_cache)
+        self.streams[name] = stream
+        return stream
+
+    def add_session(
+        self, name: str, session: "WyzeIOTCSession"
+    ) -> "RtspStream":
+        """Add a stream fed by a session, on a background thread.
+
+        The session must already be connected and authenticated.  Frames are read from
+        the session's background receiver until the server is closed, or the session
+        fails.  If the receiver isn't running, it is started here, and stopped again
+        when the server is closed; other consumers can keep reading from the session
+        alongside the server (see
+        [FrameReceiver.open_reader][wyzecam.receiver.FrameReceiver.open_reader]).
+
+        :param name: the path of the stream, e.g. "front-door".
+        :param session: the session to receive frames from.
+        :returns: the new [RtspStream][wyzecam.rtsp.RtspStream].
+        """
+        stream = self.add_stream(name)
+        if session.receiver is None:
+            session.start_receiver()
+            self._started_receivers.append(session)
+        assert session.receiver is not None
+        pump = threading.Thread(
+            target=self._pump,
+            args=(session.receiver, stream),
+            name=f"wyzecam-rtsp-{name}",
+            daemon=True,
+        )
+        self._pumps.append(pump)
+        pump.start()
+        return stream
+
+    def close(self) -> None:
+        """Stop the server, disconnecting every client."""
+        self._closed.set()
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+        pumps, self._pumps = self._pumps, []
+        for pump in pumps:
+            pump.join()
+        sessions, self._started_receivers = self._started_receivers, []
+        for session in sessions:
+            session.stop_receiver()
+        for stream in self.streams.values():
+            stream.disconnect_clients()
+        self._rtp_socket.close()
+        self._rtcp_socket.close()
+
+    def _pump(self, receiver: FrameReceiver, stream: "RtspStream") -> None:
+        reader = receiver.open_reader()
+        try:
+            while not self._closed.is_set():
+                frame = reader.get(timeout=PUMP_POLL_INTERVAL)
+                if frame is not None:
+                    stream.write(*frame)
+                elif reader.closed:
+                    if receiver.error is not None:
+                        logger.warning(
+                            f"Stopped receiving frames for {stream.name}: "
+                            f"{receiver.error}"
+                        )
+                    break
+        finally:
+            receiver.close_reader(reader)
+            stream.disconnect_clients()
+
+    def _client(
+        self,
+        stream: "RtspStream",
+        send: Callable[[List[bytes]], None],
+        on_stop: Callable[["_RtpClient"], None],
+    ) -> "_RtpClient":
+        return _RtpClient(
+            stream,
+            send,
+            on_stop,
+            FrameRingBuffer(
+                self.queue_frames,
+                self.queue_bytes,
+                DropPolicy.DROP_UNTIL_KEYFRAME,
+            ),
+        )
+
+
+class RtspStream:
+    """
+    A single camera's video, as served by an [RtspServer][wyzecam.rtsp.RtspServer].
+
+    Created by [RtspServer.add_stream][wyzecam.rtsp.RtspServer.add_stream] or
+    [RtspServer.add_session][wyzecam.rtsp.RtspServer.add_session].  Clients can only
+    start playing once a keyframe has been written, as the stream's description needs
+    the parameter sets that come with it.  If the camera switches codec, every client
+    is disconnected so that it reconnects with the new description.
+
+    :var name: the path of the stream.
+    :vartype name: str
+    :var codec_name: the codec of the stream, "h264" or "hevc", once known.
+    :var parameter_sets: the latest parameter sets, by NAL unit type.
+    :vartype parameter_sets: Dict[int, bytes]
+    :var gop_cache: the latest group of pictures, sent to new clients.
+    :vartype gop_cache: GopCache
+    """
+
+    def __init__(self, name: str, gop_cache: Optional[GopCache] = None) -> None:
+        self.name = name
+        self.codec_name: Optional[str] = None
+        self.parameter_sets: Dict[int, bytes] = {}
+        self.gop_cache = gop_cache if gop_cache is not None else GopCache()
+        self._clients: List[_RtpClient] = []
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+
+    @property
+    def clients(self) -> int:
+        """The number of clients currently playing the stream."""
+        return len(self._clients)
+
+    def write(self, frame_data: bytes, frame_info: FrameInfo) -> None:
+        """Send a frame to every client.
+
+        :param frame_data: the raw frame data.
+        :param frame_info: the metadata of the frame.
+        """
+        with self._lock:
+            if frame_info.is_keyframe:
+                self._add_keyframe(frame_data, frame_info)
+            self.gop_cache.add(frame_data, frame_info)
+            # a full queue drops the frame rather than blocking, so this is quick
+            for client in self._clients:
+                client.ring_buffer.put(frame_data, frame_info)
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Wait for the first keyframe, which clients need to start playing.
+
+        :param timeout: the maximum number of seconds to wait.
+        :returns: True if the stream is ready.
+        """
+        return self._ready.wait(timeout)
+
+    def sdp(self, host: str = "0.0.0.0") -> str:
+        """The session description of the stream, returned to DESCRIBE requests."""
+        lines = [
+            "v=0",
+            f"o=- 0 0 IN IP4 {host}",
+            f"s={self.name}",
+            f"c=IN IP4 {host}",
+            "t=0 0",
+            "a=control:*",
+            f"m=video 0 RTP/AVP {RTP_PAYLOAD_TYPE}",
+        ]
+        params = {
+            k: base64.b64encode(v).decode("ascii")
+            for k, v in self.parameter_sets.items()
+        }
+        if self.codec_name == "hevc":
+            lines.append(f"a=rtpmap:{RTP_PAYLOAD_TYPE} H265/{RTP_CLOCK_RATE}")
+            fmtp = [
+                f"sprop-{name}={params[nal_type]}"
+                for name, nal_type in (
+                    ("vps", _HEVC_VPS),
+                    ("sps", _HEVC_SPS),
+                    ("pps", _HEVC_PPS),
+                )
+                if nal_type in params
+            ]
+        else:
+            lines.append(f"a=rtpmap:{RTP_PAYLOAD_TYPE} H264/{RTP_CLOCK_RATE}")
+            fmtp = ["packetization-mode=1"]
+            sps = self.parameter_sets.get(_H264_SPS)
+            if sps is not None and len(sps) >= 4:
+                fmtp.append(f"profile-level-id={sps[1:4].hex()}")
+            if _H264_SPS in params and _H264_PPS in params:
+                fmtp.append(
+                    f"sprop-parameter-sets={params[_H264_SPS]},{params[_H264_PPS]}"
+                )
+        if fmtp:
+            lines.append(f"a=fmtp:{RTP_PAYLOAD_TYPE} {';'.join(fmtp)}")
+        lines.append("a=control:trackID=0")
+        return "\r\n".join(lines) + "\r\n"
+
+    def disconnect_clients(self) -> None:
+        """Disconnect every client; they can reconnect once there is a new keyframe."""
+        with self._lock:
+            clients, self._clients = self._clients, []
+        for client in clients:
+            client.close()
+
+    def _add_keyframe(self, frame_data: bytes, frame_info: FrameInfo) -> None:
+        codec_name = codec_name_from_frameinfo(frame_info)
+        if self.codec_name is not None and codec_name != self.codec_name:
+            clients, self._clients = self._clients, []
+            for client in clients:
+                client.close()
+            self.parameter_sets = {}
+        self.codec_name = codec_name
+        for nal in split_nal_units(frame_data):
+            nal_type = _nal_type(codec_name, nal)
+            if nal_type in (
+                _H264_SPS,
+                _H264_PPS,
+                _HEVC_VPS,
+                _HEVC_SPS,
+                _HEVC_PPS,
+            ):
+                self.parameter_sets[nal_type] = bytes(nal)
+        self._ready.set()
+
+    def _attach(self, client: "_RtpClient") -> None:
+        # under the lock, so the client gets every frame exactly once: first the cached
+        # group of pictures, then live frames.
+        with self._lock:
+            for frame_data, frame_info in self.gop_cache.frames():
+                client.ring_buffer.put(frame_data, frame_info)
+            self._clients.append(client)
+
+    def _detach(self, client: "_RtpClient") -> None:
+        with self._lock:
+            if client in self._clients:
+                self._clients.remove(client)
+
+
+def split_nal_units(data: bytes) -> List[memoryview]:
+    """Split an Annex B byte stream, as sent by the cameras, into NAL units.
+
+    :param data: the raw frame data.
+    :returns: a list of NAL units, without their start codes.
+    """
+    view = memoryview(data)
+    start = data.find(b"\x00\x00\x01")
+    if start == -1:
+        return [view] if data else []
+    units = []
+    while start != -1:
+        start += 3
+        next_start = data.find(b"\x00\x00\x01", start)
+        end = len(data) if next_start == -1 else next_start
+        # the leading zero of a four byte start code
+        while next_start != -1 and end > start and data[end - 1] == 0:
+            end -= 1
+        if end > start:
+            units.append(view[start:end])
+        start = next_start
+    return units
+
+
+def packetize(
+    codec_name: str,
+    frame_data: bytes,
+    max_payload: int = MAX_RTP_PAYLOAD,
+) -> List[bytes]:
+    """Split a frame into RTP payloads.
+
+    NAL units that fit are sent whole; larger ones are split into FU-A (H.264) or FU
+    (H.265) fragmentation units.
+
+    :param codec_name: "h264" or "hevc".
+    :param frame_data: the raw frame data.
+    :param max_payload: the size of the largest payload.
+    :returns: the payloads of the frame's RTP packets, in order.
+    """
+    header_len = 2 if codec_name == "hevc" else 1
+    payloads = []
+    for nal in split_nal_units(frame_data):
+        if len(nal) <= max_payload:
+            payloads.append(bytes(nal))
+            continue
+        if codec_name == "hevc":
+            nal_type = (nal[0] >> 1) & 0x3F
+            fu_indicator = bytes([(49 << 1) | (nal[0] & 0x81), nal[1]])
+        else:
+            nal_type = nal[0] & 0x1F
+            fu_indicator = bytes([(nal[0] & 0xE0) | 28])
+        chunk = max_payload - header_len - 1
+        body = nal[header_len:]
+        for offset in range(0, len(body), chunk):
+            fu_header = nal_type
+            if offset == 0:
+                fu_header |= 0x80
+            if offset + chunk >= len(body):
+                fu_header |= 0x40
+            payloads.append(
+                fu_indicator
+                + bytes([fu_header])
+                + body[offset : offset + chunk]
+            )
+    return payloads
+
+
+def _nal_type(codec_name: str, nal: memoryview) -> int:
+    if codec_name == "hevc":
+        return (nal[0] >> 1) & 0x3F
+    return nal[0] & 0x1F
+
+
+class _RtpClient:
+    # a playing client: frames are queued by the stream, and packetized and sent from
+    # this client's own thread.
+    def __init__(
+        self,
+        stream: RtspStream,
+        send: Callable[[List[bytes]], None],
+        on_stop: Callable[["_RtpClient"], None],
+        ring_buffer: FrameRingBuffer,
+    ) -> None:
+        self.stream = stream
+        self.ring_buffer = ring_buffer
+        self.ssrc = random.getrandbits(32)
+        self._send = send
+        self._on_stop = on_stop
+        self._sequence = random.getrandbits(16)
+        self._timestamp_offset = random.getrandbits(32)
+        self._last_timestamp: Optional[int] = None
+        self.started = False
+        self._thread = threading.Thread(
+            target=self._run, name=f"wyzecam-rtsp-{stream.name}", daemon=True
+        )
+
+    def start(self) -> None:
+        self.started = True
+        self.stream._attach(self)
+        self._thread.start()
+
+    def close(self) -> None:
+        self.ring_buffer.close()
+
+    def _run(self) -> None:
+        try:
+            while True:
+                frame = self.ring_buffer.get()
+                if frame is None:
+                    break
+                self._send(self._packets(*frame))
+        except OSError as e:
+            logger.debug(f"RTSP client of {self.stream.name} went away: {e}")
+        finally:
+            self.ring_buffer.close()
+            self.stream._detach(self)
+            self._on_stop(self)
+
+    def _packets(self, frame_data: bytes, frame_info: FrameInfo) -> List[bytes]:
+        timestamp = int(camera_timestamp(frame_info) * RTP_CLOCK_RATE)
+        if (
+            self._last_timestamp is not None
+            and timestamp <= self._last_timestamp
+        ):
+            # the doorbell doesn't send timestamp_ms; keep timestamps increasing
+            timestamp = self._last_timestamp + RTP_CLOCK_RATE // (
+                frame_info.framerate or 20
+            )
+        self._last_timestamp = timestamp
+        rtp_timestamp = (timestamp + self._timestamp_offset) & 0xFFFFFFFF
+
+        codec_name = codec_name_from_frameinfo(frame_info)
+        payloads = packetize(codec_name, frame_data)
+        packets = []
+        for i, payload in enumerate(payloads):
+            marker = 0x80 if i == len(payloads) - 1 else 0
+            header = struct.pack(
+                ">BBHII",
+                0x80,
+                marker | RTP_PAYLOAD_TYPE,
+                self._sequence,
+                rtp_timestamp,
+                self.ssrc,
+            )
+            self._sequence = (self._sequence + 1) & 0xFFFF
+            packets.append(header + payload)
+        return packets
+
+
+class _RtspHandler(socketserver.StreamRequestHandler):
+    rtsp: RtspServer
+
+    def setup(self) -> None:
+        super().setup()
+        self.session_id = "%016x" % random.getrandbits(64)
+        self.stream: Optional[RtspStream] = None
+        self.client: Optional[_RtpClient] = None
+        self.write_lock = threading.Lock()
+
+    def handle(self) -> None:
+        try:
+            while True:
+                first = self.rfile.read(1)
+                if not first:
+                    break
+                if first == b"$":
+                    # RTCP interleaved on the connection, e.g. receiver reports
+                    channel_len = self.rfile.read(3)
+                    if len(channel_len) < 3:
+                        break
+                    self.rfile.read(struct.unpack(">xH", channel_len)[0])
+                    continue
+                request_line = (first + self.rfile.readline()).decode("latin-1")
+                headers = self._read_headers()
+                if int(headers.get("content-length", 0)):
+                    self.rfile.read(int(headers["content-length"]))
+                self._dispatch(request_line.split(), headers)
+        except (OSError, ValueError) as e:
+            logger.debug(f"RTSP connection closed: {e}")
+
+    def finish(self) -> None:
+        if self.client is not None:
+            self.client.close()
+        super().finish()
+
+    def _read_headers(self) -> Dict[str, str]:
+        headers: Dict[str, str] = {}
+        while True:
+            line = self.rfile.readline().decode("latin-1").strip()
+            if not line:
+                return headers
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+    def _dispatch(self, request: List[str], headers: Dict[str, str]) -> None:
+        if len(request) != 3:
+            self._respond(headers, 400, "Bad Request")
+            return
+        method, url, _ = request
+        handler = getattr(self, f"_{method.lower()}", None)
+        if handler is None:
+            self._respond(headers, 501, "Not Implemented")
+            return
+        handler(url, headers)
+
+    def _options(self, url: str, headers: Dict[str, str]) -> None:
+        self._respond(
+            headers,
+            200,
+            "OK",
+            {
+                "Public": "OPTIONS, DESCRIBE, SETUP, PLAY, TEARDOWN, GET_PARAMETER"
+            },
+        )
+
+    def _describe(self, url: str, headers: Dict[str, str]) -> None:
+        stream = self._find_stream(url)
+        if stream is None:
+            self._respond(headers, 404, "Not Found")
+            return
+        if not stream.wait_ready(10):
+            self._respond(headers, 503, "Service Unavailable")
+            return
+        body = stream.sdp(self.connection.getsockname()[0]).encode("ascii")
+        self._respond(
+            headers,
+            200,
+            "OK",
+            {
+                "Content-Base": url.rstrip("/") + "/",
+                "Content-Type": "application/sdp",
+            },
+            body,
+        )
+
+    def _setup(self, url: str, headers: Dict[str, str]) -> None:
+        stream = self._find_stream(url)
+        if stream is None:
+            self._respond(headers, 404, "Not Found")
+            return
+        if self.client is not None:
+            self._respond(headers, 459, "Aggregate Operation Not Allowed")
+            return
+        transport = headers.get("transport", "")
+        params: Dict[str, str] = {}
+        for part in transport.split(";"):
+            name, _, value = part.partition("=")
+            params[name.strip()] = value.strip()
+        if "TCP" in transport.split(";")[0].upper():
+            channels = params.get("interleaved") or "0-1"
+            channel = int(channels.split("-")[0])
+            send = self._interleaved_sender(channel)
+            reply = f"RTP/AVP/TCP;unicast;interleaved={channels}"
+        elif "client_port" in params:
+            rtp_port = int(params["client_port"].split("-")[0])
+            send = self._udp_sender((self.client_address[0], rtp_port))
+            reply = (
+                f"RTP/AVP;unicast;client_port={params['client_port']};"
+                f"server_port={self.rtsp._rtp_socket.getsockname()[1]}-"
+                f"{self.rtsp._rtcp_socket.getsockname()[1]}"
+            )
+        else:
+            self._respond(headers, 461, "Unsupported Transport")
+            return
+        self.stream = stream
+        self.client = self.rtsp._client(stream, send, self._client_stopped)
+        self._respond(
+            headers,
+            200,
+            "OK",
+            {"Transport": f"{reply};ssrc={self.client.ssrc:08X}"},
+        )
+
+    def _play(self, url: str, headers: Dict[str, str]) -> None:
+        if self.client is None:
+            self._respond(headers, 455, "Method Not Valid in This State")
+            return
+        self._respond(headers, 200, "OK", {"Range": "npt=0.000-"})
+        # a repeated PLAY (e.g. to resume) leaves an already playing client as it is
+        if not self.client.started:
+            self.client.start()
+
+    def _teardown(self, url: str, headers: Dict[str, str]) -> None:
+        self._respond(headers, 200, "OK")
+        # cleared first, so _client_stopped knows this was a teardown
+        client, self.client = self.client, None
+        if client is not None:
+            client.close()
+
+    def _get_parameter(self, url: str, headers: Dict[str, str]) -> None:
+        self._respond(headers, 200, "OK")  # used as a keep-alive
+
+    def _client_stopped(self, client: _RtpClient) -> None:
+        if client is not self.client:
+            return  # torn down
+        # the stream stopped, or changed codec: hang up, so the client reconnects
+        try:
+            self.connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def _find_stream(self, url: str) -> Optional[RtspStream]:
+        path = urllib.parse.unquote(urllib.parse.urlsplit(url).path).strip("/")
+        if path.endswith("trackID=0"):
+            path = path[: -len("trackID=0")].rstrip("/")
+        return self.rtsp.streams.get(path)
+
+    def _interleaved_sender(
+        self, channel: int
+    ) -> Callable[[List[bytes]], None]:
+        def send(packets: List[bytes]) -> None:
+            data = b"".join(
+                struct.pack(">cBH", b"$", channel, len(packet)) + packet
+                for packet in packets
+            )
+            with self.write_lock:
+                self.wfile.write(data)
+
+        return send
+
+    def _udp_sender(
+        self, address: Tuple[str, int]
+    ) -> Callable[[List[bytes]], None]:
+        rtp_socket = self.rtsp._rtp_socket
+
+        def send(packets: List[bytes]) -> None:
+            for packet in packets:
+                rtp_socket.sendto(packet, address)
+
+        return send
+
+    def _respond(
+        self,
+        request_headers: Dict[str, str],
+        code: int,
+        reason: str,
+        headers: Optional[Dict[str, Any]] = None,
+        body: bytes = b"",
+    ) -> None:
+        lines = [
+            f"RTSP/1.0 {code} {reason}",
+            f"CSeq: {request_headers.get('cseq', '0')}",
+            "Server: wyzecam",
+        ]
+        if self.client is not None:
+            lines.append(f"Session: {self.session_id};timeout=60")
+        for name, value in (headers or {}).items():
+            lines.append(f"{name}: {value}")
+        if body:
+            lines.append(f"Content-Length: {len(body)}")
+        data = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+        with self.write_lock:
+            self.wfile.write(data)
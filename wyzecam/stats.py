@@ -0,0 +1,223 @@
+from typing import Any, Dict, List, Optional, Union
+
+import time
+
+from wyzecam.latency import LatencyHistogram, camera_timestamp
+from wyzecam.tutk import tutk
+
+FrameInfo = Union[tutk.FrameInfoStruct, tutk.FrameInfo3Struct]
+
+
+class RecvStats:
+    """
+    Counters describing the frames received by a
+    [WyzeIOTCSession][wyzecam.iotc.WyzeIOTCSession].
+
+    These are updated with plain integer increments on every receive attempt, so they
+    are cheap enough to leave on all the time.  Use `snapshot()` to read a consistent
+    copy of them, e.g. for periodic logging or monitoring.
+
+    :var frames_ok: the number of complete frames received from the camera, including
+                    any that were then skipped.
+    :vartype frames_ok: int
+    :var bytes_received: the number of bytes of frame data in those frames.
+    :vartype bytes_received: int
+    :var frames_incomplete: the number of times the library reported an incomplete frame
+                            (`AV_ER_INCOMPLETE_FRAME`).
+    :vartype frames_incomplete: int
+    :var frames_lost: the number of times the library reported a lost frame
+                      (`AV_ER_LOSED_THIS_FRAME`).
+    :vartype frames_lost: int
+    :var not_ready_polls: the number of polls for which no frame was ready yet
+                          (`AV_ER_DATA_NOREADY`).
+    :vartype not_ready_polls: int
+    :var skipped_small_frames: the number of frames skipped because they were sent at a
+                               smaller frame size at the start of the stream.
+    :vartype skipped_small_frames: int
+    :var skipped_frame_size_mismatches: the number of frames skipped because their
+                                        frame size did not match the requested one.
+    :vartype skipped_frame_size_mismatches: int
+    """
+
+    def __init__(self) -> None:
+        self.frames_ok = 0
+        self.bytes_received = 0
+        self.frames_incomplete = 0
+        self.frames_lost = 0
+        self.not_ready_polls = 0
+        self.skipped_small_frames = 0
+        self.skipped_frame_size_mismatches = 0
+
+    def snapshot(self) -> Dict[str, int]:
+        """A copy of the current values of every counter.
+
+        :returns: a dict mapping each counter's name to its value.
+        """
+        return {
+            "frames_ok": self.frames_ok,
+            "bytes_received": self.bytes_received,
+            "frames_incomplete": self.frames_incomplete,
+            "frames_lost": self.frames_lost,
+            "not_ready_polls": self.not_ready_polls,
+            "skipped_small_frames": self.skipped_small_frames,
+            "skipped_frame_size_mismatches": self.skipped_frame_size_mismatches,
+        }
+
+    def reset(self) -> None:
+        """Set every counter back to zero."""
+        for name in self.snapshot():
+            setattr(self, name, 0)
+
+    def __repr__(self) -> str:
+        counters = " ".join(f"{k}={v}" for k, v in self.snapshot().items())
+        return f"<RecvStats {counters}>"
+
+
+class StreamStats:
+    """
+    Rolling statistics about a video stream, computed from frame metadata alone.
+
+    Only each frame's [tutk.FrameInfoStruct][wyzecam.tutk.tutk.FrameInfoStruct] is
+    needed, so this works just as well on the raw stream as on decoded frames:
+
+    ```python
+    stream_stats = StreamStats(window_size=210)
+    for frame_data, frame_info in sess.recv_video_data():
+        stream_stats.add(frame_info)
+        print(stream_stats.snapshot()["kilobytes_per_second"])
+    ```
+
+    The window of recent frames is kept in fixed-size ring buffers along with running
+    sums, and frame sizes and inter-arrival times are counted into fixed-size
+    histograms, so `add()` takes constant time however large the window is.
+
+    :var window_size: the number of consecutive frames the statistics cover.
+    :vartype window_size: int
+    :var gop_length: the number of frames in the last complete group of pictures,
+                     i.e. between the last two keyframes; 0 until two have been seen.
+    :vartype gop_length: int
+    :var keyframe_size: the size of the last keyframe, in bytes.
+    :vartype keyframe_size: int
+    """
+
+    def __init__(self, window_size: int = 210) -> None:
+        """Construct an empty StreamStats
+
+        :param window_size: the number of consecutive frames to compute the statistics
+                            over.
+        """
+        assert window_size > 0, "window_size must be positive"
+        self.window_size = window_size
+        self.gop_length = 0
+        self.keyframe_size = 0
+        self._sizes: List[int] = [0] * window_size
+        self._times: List[float] = [0.0] * window_size
+        self._gaps: List[Optional[int]] = [None] * window_size
+        self._next = 0
+        self._count = 0
+        self._bytes = 0
+        self._framerate = 0
+        self._last_arrival: Optional[float] = None
+        self._frames_since_keyframe: Optional[int] = None
+        self._size_histogram = _WindowHistogram(highest_value=64 * 1024 * 1024)
+        self._gap_histogram = _WindowHistogram(highest_value=60_000_000)
+
+    def add(self, frame_info: FrameInfo, now: Optional[float] = None) -> None:
+        """Add a frame to the window, evicting the oldest one if it is full.
+
+        :param frame_info: the metadata of the frame.
+        :param now: when the frame arrived, in seconds; defaults to `time.monotonic()`.
+        """
+        now = time.monotonic() if now is None else now
+        i = self._next
+        if self._count == self.window_size:
+            self._bytes -= self._sizes[i]
+            self._size_histogram.remove(self._sizes[i])
+            old_gap = self._gaps[i]
+            if old_gap is not None:
+                self._gap_histogram.remove(old_gap)
+        else:
+            self._count += 1
+
+        frame_len = int(frame_info.frame_len)
+        self._sizes[i] = frame_len
+        self._times[i] = camera_timestamp(frame_info)
+        self._bytes += frame_len
+        self._size_histogram.record(frame_len)
+        gap = None
+        if self._last_arrival is not None:
+            gap = int((now - self._last_arrival) * 1_000_000)
+            self._gap_histogram.record(gap)
+        self._gaps[i] = gap
+        self._last_arrival = now
+        self._framerate = frame_info.framerate
+        self._next = (i + 1) % self.window_size
+
+        if frame_info.is_keyframe:
+            if self._frames_since_keyframe is not None:
+                self.gop_length = self._frames_since_keyframe
+            self._frames_since_keyframe = 1
+            self.keyframe_size = frame_len
+        elif self._frames_since_keyframe is not None:
+            self._frames_since_keyframe += 1
+
+    @property
+    def frames(self) -> int:
+        """The number of frames currently in the window."""
+        return self._count
+
+    def snapshot(self) -> Dict[str, Any]:
+        """The current statistics.
+
+        :returns: a dict with the following keys:
+
+                  - "bytes_per_second", "kilobytes_per_second": the bitrate.
+                  - "window_duration": the time the window covers, by the camera's
+                    timestamps, in seconds.
+                  - "frames_per_second": the frame rate.
+                  - "gop_length": see above.
+                  - "keyframe_size": see above.
+                  - "frame_size_p50", "frame_size_p99": percentiles of the frame
+                    sizes in the window, in bytes.
+                  - "inter_arrival_p50", "inter_arrival_p99": percentiles of the time
+                    between frames arriving, in seconds.
+        """
+        bytes_per_second = 0
+        frames_per_second = 0
+        duration: float = 0
+        if self._count > 1:
+            start = self._times[(self._next - self._count) % self.window_size]
+            duration = self._times[self._next - 1] - start
+            if duration <= 0 and self._framerate:
+                # wyze doorbell doesn't support timestamp_ms; workaround:
+                duration = self._count / self._framerate
+            if duration > 0:
+                # skip the last reading
+                newest_size = self._sizes[self._next - 1]
+                bytes_per_second = int((self._bytes - newest_size) / duration)
+                frames_per_second = int(self._count / duration)
+        return {
+            "bytes_per_second": bytes_per_second,
+            "kilobytes_per_second": int(bytes_per_second / 1000),
+            "window_duration": duration,
+            "frames_per_second": frames_per_second,
+            "gop_length": self.gop_length,
+            "keyframe_size": self.keyframe_size,
+            "frame_size_p50": self._size_histogram.percentile(50),
+            "frame_size_p99": self._size_histogram.percentile(99),
+            "inter_arrival_p50": self._gap_histogram.percentile(50) / 1_000_000,
+            "inter_arrival_p99": self._gap_histogram.percentile(99) / 1_000_000,
+        }
+
+
+class _WindowHistogram(LatencyHistogram):
+    # a histogram values can be removed from again, for a sliding window; a single
+    # significant figure keeps reading percentiles cheap enough to do every frame.
+    def __init__(self, highest_value: int) -> None:
+        super().__init__(highest_value, significant_figures=1)
+
+    def remove(self, value: int) -> None:
+        value = min(max(int(value), 0), self.highest_value)
+        self._counts[self._index_of(value)] -= 1
+        self.count -= 1
+        self.total -= value
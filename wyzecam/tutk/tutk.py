@@ -2,6 +2,7 @@ import typing
 from typing import Optional, Union
 
 import pathlib
+import threading
 from ctypes import (
     CDLL,
     Array,
@@ -19,6 +20,7 @@ from ctypes import (
     pointer,
     sizeof,
 )
+from queue import Empty, LifoQueue
 
 BITRATE_360P = 0x1E
 """
@@ -70,6 +72,11 @@ portrait 480 x 640.
 
 IOTYPE_USER_DEFINED_START = 256
 
+AV_ER_BUFPARA_MAXSIZE_INSUFF = -20001
+"""
+An error raised when a receive buffer is too small for the frame being received.
+"""
+
 AV_ER_TIMEOUT = -20011
 """
 An error raised when the AV library times out.
@@ -95,6 +102,11 @@ AV_ER_LOSED_THIS_FRAME = -20014
 An error sent during video streaming if the frame was lost in transmission.
 """
 
+DEFAULT_MAX_FRAME_SIZE = 5 * 1024 * 1024
+"""
+The default size, in bytes, of the buffer video frames are received into.
+"""
+
 project_root = pathlib.Path(__file__).parent
 
 
@@ -361,8 +373,207 @@ class FrameInfo3Struct(FormattedStructure):
     ]
 
 
+FRAME_INFO_MAX_LEN = max(sizeof(FrameInfo3Struct), sizeof(FrameInfoStruct))
+
+
+class RecvBuffer:
+    """
+    A preallocated set of buffers that video frames are received into by
+    [av_recv_frame_data_into][wyzecam.tutk.tutk.av_recv_frame_data_into].
+
+    Allocating (and zeroing) a multi-megabyte buffer for every frame is expensive,
+    so a RecvBuffer is meant to be reused for many consecutive calls.  Buffers are
+    usually handed out by a [RecvBufferPool][wyzecam.tutk.tutk.RecvBufferPool].
+
+    :var max_frame_size: the size of `frame_data`, i.e. the largest frame that can
+                         be received into this buffer, in bytes.
+    :vartype max_frame_size: int
+    :var frame_data: the raw buffer the frame data is written to.
+    :var frame_info: the raw buffer the frame info struct is written to.
+    :var frame_data_actual_len: the size of the most recently received frame.
+    :var pool: the pool this buffer should be returned to by `release()`, if any.
+    :var data: while leased (see `lease()`), a zero-copy memoryview of the most
+               recently received frame.  It is released along with the buffer.
+    """
+
+    def __init__(
+        self,
+        max_frame_size: int = DEFAULT_MAX_FRAME_SIZE,
+        pool: Optional["RecvBufferPool"] = None,
+    ) -> None:
+        self.max_frame_size = max_frame_size
+        self.pool = pool
+        self.frame_data = (c_char * max_frame_size)()
+        self.frame_data_actual_len = c_int()
+        self.frame_data_expected_len = c_int()
+        self.frame_info = (c_char * FRAME_INFO_MAX_LEN)()
+        self.frame_info_actual_len = c_int()
+        self.frame_index = c_uint()
+        self.data: Optional[memoryview] = None
+        self.in_use = False
+        self._data_view = memoryview(self.frame_data).cast("B")
+
+        # the pointers passed to avRecvFrameData2 never change, so build them once.
+        self.call_args = (
+            pointer(self.frame_data),
+            c_int(max_frame_size),
+            pointer(self.frame_data_actual_len),
+            pointer(self.frame_data_expected_len),
+            pointer(self.frame_info),
+            c_int(FRAME_INFO_MAX_LEN),
+            pointer(self.frame_info_actual_len),
+            pointer(self.frame_index),
+        )
+
+    @property
+    def frame_len(self) -> int:
+        """The size of the most recently received frame, in bytes."""
+        return self.frame_data_actual_len.value
+
+    def view(self) -> memoryview:
+        """A memoryview of the most recently received frame, valid until the next receive.
+
+        :returns: a memoryview of the first `frame_len` bytes of `frame_data`.
+        """
+        return self._data_view[: self.frame_len]
+
+    def lease(self) -> "RecvBuffer":
+        """Expose the most recently received frame as `data`, without copying it.
+
+        The buffer must not be reused for receiving until `release()` is called.
+
+        :returns: this buffer, for use as a context manager.
+        """
+        self.data = self.view()
+        return self
+
+    def release(self) -> None:
+        """Return this buffer to the pool it was acquired from.
+
+        Any `data` view handed out by `lease()` is invalidated.  Releasing a buffer
+        that is not in use has no effect.
+        """
+        if self.data is not None:
+            self.data.release()
+            self.data = None
+        if self.pool is not None and self.in_use:
+            self.pool.release(self)
+
+    def __enter__(self) -> "RecvBuffer":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+
+class RecvBufferPool:
+    """
+    A bounded pool of [RecvBuffer][wyzecam.tutk.tutk.RecvBuffer]s.
+
+    Buffers are allocated lazily, the first time they are needed, up to `size`
+    buffers in total.  Once that many buffers are in use, `acquire()` waits for
+    one of them to be released.
+
+    :var size: the maximum number of buffers this pool will allocate.
+    :vartype size: int
+    :var max_frame_size: the size of each buffer's frame data, in bytes.
+    :vartype max_frame_size: int
+    """
+
+    def __init__(
+        self, size: int = 4, max_frame_size: int = DEFAULT_MAX_FRAME_SIZE
+    ) -> None:
+        assert size >= 1, "RecvBufferPool needs room for at least one buffer"
+        self.size = size
+        self.max_frame_size = max_frame_size
+        self.allocated = 0
+        self._free: "LifoQueue[RecvBuffer]" = LifoQueue()
+        self._lock = threading.Lock()
+
+    def acquire(
+        self, block: bool = True, timeout: Optional[float] = None
+    ) -> RecvBuffer:
+        """Take a buffer out of the pool, allocating one if the pool is not yet full.
+
+        :param block: if the pool is exhausted, wait for a buffer to be released.
+                      If False, raise queue.Empty instead.
+        :param timeout: the maximum number of seconds to wait for a buffer before
+                        raising queue.Empty.
+        :returns: a [RecvBuffer][wyzecam.tutk.tutk.RecvBuffer]; call `release()` on it
+                  when finished.
+        """
+        recv_buffer: Optional[RecvBuffer]
+        try:
+            recv_buffer = self._free.get_nowait()
+        except Empty:
+            recv_buffer = self._allocate()
+            if recv_buffer is None:
+                recv_buffer = self._free.get(block=block, timeout=timeout)
+        recv_buffer.in_use = True
+        return recv_buffer
+
+    def _allocate(self) -> Optional[RecvBuffer]:
+        with self._lock:
+            if self.allocated >= self.size:
+                return None
+            self.allocated += 1
+        return RecvBuffer(self.max_frame_size, pool=self)
+
+    def release(self, recv_buffer: RecvBuffer) -> None:
+        """Return a buffer to the pool, so that it can be reused.
+
+        :param recv_buffer: a buffer previously returned by `acquire()`.
+        """
+        recv_buffer.in_use = False
+        self._free.put(recv_buffer)
+
+
+def av_recv_frame_data_into(
+    tutk_platform_lib: CDLL, av_chan_id: c_int, recv_buffer: RecvBuffer
+) -> typing.Tuple[
+    int,
+    Optional[Union[FrameInfoStruct, FrameInfo3Struct]],
+    Optional[int],
+]:
+    """Receive frame data from an AV server into a preallocated buffer.
+
+    This is the allocation-free variant of
+    [av_recv_frame_data][wyzecam.tutk.tutk.av_recv_frame_data]; the frame data is
+    left in `recv_buffer.frame_data`, and is `recv_buffer.frame_len` bytes long.
+    The returned frame info is a copy, and stays valid after the buffer is reused.
+
+    :param tutk_platform_lib: the c library loaded from the 'load_library' call.
+    :param av_chan_id: The channel ID of the AV channel to recv data on.
+    :param recv_buffer: the buffer to receive the frame into.
+    :return: a 3-tuple of errno, frame_info, and frame_index
+    """
+    errno = tutk_platform_lib.avRecvFrameData2(
+        av_chan_id, *recv_buffer.call_args
+    )
+
+    if errno < 0:
+        return errno, None, None
+
+    frame_info_len = recv_buffer.frame_info_actual_len.value
+    frame_info: Union[FrameInfoStruct, FrameInfo3Struct]
+    if frame_info_len == sizeof(FrameInfo3Struct):
+        frame_info = FrameInfo3Struct.from_buffer_copy(recv_buffer.frame_info)
+    elif frame_info_len == sizeof(FrameInfoStruct):
+        frame_info = FrameInfoStruct.from_buffer_copy(recv_buffer.frame_info)
+    else:
+        from wyzecam.tutk.tutk_protocol import TutkWyzeProtocolError
+
+        raise TutkWyzeProtocolError(
+            f"Unknown frame info structure format! len={frame_info_len}"
+        )
+
+    return 0, frame_info, recv_buffer.frame_index.value
+
+
 def av_recv_frame_data(
-    tutk_platform_lib: CDLL, av_chan_id: c_int
+    tutk_platform_lib: CDLL,
+    av_chan_id: c_int,
+    recv_buffer: Optional[RecvBuffer] = None,
 ) -> typing.Tuple[
     int,
     Optional[bytes],
@@ -375,52 +586,22 @@ def av_recv_frame_data(
 
     :param tutk_platform_lib: the c library loaded from the 'load_library' call.
     :param av_chan_id: The channel ID of the AV channel to recv data on.
+    :param recv_buffer: an optional [RecvBuffer][wyzecam.tutk.tutk.RecvBuffer] to
+                        receive into.  If not specified, a new (large) buffer is
+                        allocated for this call.
     :return: a 4-tuple of errno, frame_data, frame_info, and frame_index
     """
-    frame_data_max_len = 5 * 1024 * 1024
-    frame_data_actual_len = c_int()
-    frame_data_expected_len = c_int()
-    frame_data = (c_char * frame_data_max_len)()
-    frame_info_actual_len = c_int()
-    frame_index = c_uint()
+    if recv_buffer is None:
+        recv_buffer = RecvBuffer()
 
-    frame_info_max_len = max(sizeof(FrameInfo3Struct), sizeof(FrameInfoStruct))
-    frame_info = (c_char * frame_info_max_len)()
-
-    errno = tutk_platform_lib.avRecvFrameData2(
-        av_chan_id,
-        pointer(frame_data),
-        c_int(frame_data_max_len),
-        pointer(frame_data_actual_len),
-        pointer(frame_data_expected_len),
-        pointer(frame_info),
-        c_int(frame_info_max_len),
-        pointer(frame_info_actual_len),
-        pointer(frame_index),
+    errno, frame_info, frame_index = av_recv_frame_data_into(
+        tutk_platform_lib, av_chan_id, recv_buffer
     )
-
     if errno < 0:
         return errno, None, None, None
-    else:
-        frame_data_actual: bytes = frame_data[: frame_data_actual_len.value]  # type: ignore
-        frame_info_actual: Union[FrameInfoStruct, FrameInfo3Struct]
-        if frame_info_actual_len.value == sizeof(FrameInfo3Struct):
-            frame_info_actual = FrameInfo3Struct.from_buffer(frame_info)
-        elif frame_info_actual_len.value == sizeof(FrameInfoStruct):
-            frame_info_actual = FrameInfoStruct.from_buffer(frame_info)
-        else:
-            from wyzecam.tutk.tutk_protocol import TutkWyzeProtocolError
-
-            raise TutkWyzeProtocolError(
-                f"Unknown frame info structure format! len={frame_info_actual_len}"
-            )
-
-        return (
-            0,
-            frame_data_actual,
-            frame_info_actual,
-            frame_index.value,
-        )
+
+    frame_data: bytes = recv_buffer.frame_data[: recv_buffer.frame_len]  # type: ignore
+    return 0, frame_data, frame_info, frame_index
 
 
 def av_recv_io_ctrl(
@@ -1,15 +1,28 @@
-from typing import Any, DefaultDict, Dict, List, Optional, Tuple, Union
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    DefaultDict,
+    Deque,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
 import logging
 import threading
 import time
-from collections import defaultdict
+from collections import defaultdict, deque
 from ctypes import CDLL, c_int
 from queue import Empty, Queue
 
 from . import tutk, tutk_protocol
 from .tutk_protocol import TutkWyzeProtocolMessage
 
+if TYPE_CHECKING:
+    from wyzecam.metrics import SessionMetrics
+
 STOP_SENTINEL = object()
 CONTROL_CHANNEL = "CONTROL"
 
@@ -106,20 +119,36 @@ class TutkIOCtrlMux:
     See: [wyzecam.iotc.WyzeIOTCSession.iotctrl_mux][]
     """
 
-    def __init__(self, tutk_platform_lib: CDLL, av_chan_id: c_int) -> None:
+    def __init__(
+        self,
+        tutk_platform_lib: CDLL,
+        av_chan_id: c_int,
+        metrics: Optional["SessionMetrics"] = None,
+    ) -> None:
         """Initialize the mux channel.
 
         :param tutk_platform_lib: the underlying c library used to communicate with the wyze
                                 device; see [tutk.load_library][wyzecam.tutk.tutk.load_library].
         :param av_chan_id: the channel id of the session this mux is created on.
+        :param metrics: if set, the round trip time of every command is recorded here.
+                        See [SessionMetrics][wyzecam.metrics.SessionMetrics].
         """
         self.tutk_platform_lib = tutk_platform_lib
         self.av_chan_id = av_chan_id
+        self.metrics = metrics
         self.queues: DefaultDict[
             Union[str, int], "Queue[Union[object, Tuple[int, int, int, bytes]]]"
         ] = defaultdict(Queue)
+        # (request code, send time) of the requests awaiting each response code
+        self.pending: DefaultDict[int, Deque[Tuple[int, float]]] = defaultdict(
+            deque
+        )
         self.listener = TutkIOCtrlMuxListener(
-            tutk_platform_lib, av_chan_id, self.queues
+            tutk_platform_lib,
+            av_chan_id,
+            self.queues,
+            self.pending if metrics is not None else None,
+            metrics,
         )
 
     def start_listening(self) -> None:
@@ -185,10 +214,20 @@ class TutkIOCtrlMux:
             )
         )
         logger.debug("SEND %s %s %s", msg, encoded_msg_header, encoded_msg[16:])
+        pending = None
+        response_code = msg.expected_response_code
+        if self.metrics is not None and response_code:
+            # registered before sending, as the response may arrive before we return
+            pending = (msg.code, time.perf_counter())
+            self.pending[response_code].append(pending)
         errcode = tutk.av_send_io_ctrl(
             self.tutk_platform_lib, self.av_chan_id, ctrl_type, encoded_msg
         )
         if errcode:
+            if self.metrics is not None:
+                self.metrics.ioctl_failed(msg.code)
+                if response_code and pending is not None:
+                    self.pending[response_code].remove(pending)
             return TutkIOCtrlFuture(msg, errcode=errcode)
         if not msg.expected_response_code:
             logger.warning("no expected response code found")
@@ -263,11 +302,15 @@ class TutkIOCtrlMuxListener(threading.Thread):
         queues: DefaultDict[
             Union[int, str], "Queue[Union[object, Tuple[int, int, int, bytes]]]"
         ],
+        pending: Optional[DefaultDict[int, Deque[Tuple[int, float]]]] = None,
+        metrics: Optional["SessionMetrics"] = None,
     ):
         super().__init__()
         self.tutk_platform_lib = tutk_platform_lib
         self.av_chan_id = av_chan_id
         self.queues = queues
+        self.pending = pending
+        self.metrics = metrics
 
     def run(self) -> None:
         timeout_ms = 1000
@@ -301,7 +344,20 @@ class TutkIOCtrlMuxListener(threading.Thread):
 
             header, payload = tutk_protocol.decode(data)
             logger.debug(f"RECV {header}: {repr(payload)}")
+            self._record_round_trip(header.code)
 
             self.queues[header.code].put(
                 (actual_len, io_ctl_type, header.protocol, payload)
             )
+
+    def _record_round_trip(self, response_code: int) -> None:
+        if self.pending is None or self.metrics is None:
+            return
+        waiting = self.pending.get(response_code)
+        if not waiting:
+            return
+        try:
+            request_code, sent = waiting.popleft()
+        except IndexError:
+            return
+        self.metrics.observe_ioctl(request_code, time.perf_counter() - sent)
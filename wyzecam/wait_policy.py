@@ -0,0 +1,215 @@
+from typing import Dict, Optional, Union
+
+import abc
+import asyncio
+import time
+
+from wyzecam.tutk import tutk
+
+
+class WaitPolicy(abc.ABC):
+    """
+    Decides how long a [WyzeIOTCSession][wyzecam.iotc.WyzeIOTCSession] waits before
+    polling the camera again, whenever the TUTK library reports that no frame is
+    ready yet (`AV_ER_DATA_NOREADY`).
+
+    Subclasses implement `next_delay()`.  Every policy also keeps track of how much
+    time the session spent waiting for frames, versus actually receiving them.
+
+    Wait policies keep track of the state of the stream they are used with, so a
+    single instance should not be shared between sessions.
+
+    :var time_waiting: total number of seconds spent waiting for a frame to be ready.
+    :vartype time_waiting: float
+    :var time_receiving: total number of seconds spent receiving frames from the library.
+    :vartype time_receiving: float
+    :var wait_count: the number of times the session has waited for a frame.
+    :vartype wait_count: int
+    """
+
+    def __init__(self) -> None:
+        self.time_waiting = 0.0
+        self.time_receiving = 0.0
+        self.wait_count = 0
+
+    @abc.abstractmethod
+    def next_delay(self) -> float:
+        """The number of seconds to wait before polling again.
+
+        :returns: a delay in seconds; 0 means only yield to other threads.
+        """
+
+    def frame_received(
+        self,
+        frame_info: Union[tutk.FrameInfoStruct, tutk.FrameInfo3Struct],
+        now: Optional[float] = None,
+    ) -> None:
+        """Called by the session every time a frame is received.
+
+        :param frame_info: the metadata of the frame that was just received.
+        :param now: the time the frame was received, according to `time.monotonic()`.
+        """
+
+    def wait(self) -> None:
+        """Wait for `next_delay()` seconds, recording the time spent doing so."""
+        delay = self.next_delay()
+        start = time.perf_counter()
+        time.sleep(delay)
+        self.time_waiting += time.perf_counter() - start
+        self.wait_count += 1
+
+    async def wait_async(self) -> None:
+        """Like `wait()`, but sleeps without blocking the running event loop."""
+        delay = self.next_delay()
+        start = time.perf_counter()
+        await asyncio.sleep(delay)
+        self.time_waiting += time.perf_counter() - start
+        self.wait_count += 1
+
+    def record_receive(self, duration: float) -> None:
+        """Record time spent receiving data from the library.
+
+        :param duration: the number of seconds spent in the receive call.
+        """
+        self.time_receiving += duration
+
+    def stats(self) -> Dict[str, float]:
+        """A summary of the time spent waiting for, and receiving, frames.
+
+        :returns: a dict with the keys "time_waiting", "time_receiving", "wait_count",
+                  and "wait_ratio" (the fraction of time spent waiting).
+        """
+        total = self.time_waiting + self.time_receiving
+        return {
+            "time_waiting": self.time_waiting,
+            "time_receiving": self.time_receiving,
+            "wait_count": self.wait_count,
+            "wait_ratio": self.time_waiting / total if total else 0.0,
+        }
+
+
+class FixedWaitPolicy(WaitPolicy):
+    """
+    Always waits the same amount of time.  The default interval of 1/40th of a
+    second matches the behavior of earlier versions of wyzecam.
+
+    :var interval: the number of seconds to wait between polls.
+    :vartype interval: float
+    """
+
+    def __init__(self, interval: float = 1.0 / 40) -> None:
+        super().__init__()
+        self.interval = interval
+
+    def next_delay(self) -> float:
+        return self.interval
+
+
+class SpinThenSleepWaitPolicy(WaitPolicy):
+    """
+    Polls as fast as possible (only yielding to other threads) for a short period
+    after the stream runs dry, then falls back to sleeping for a fixed interval.
+
+    This gives the lowest latency while frames are arriving back to back, at the
+    cost of a little CPU.
+
+    :var spin_duration: the number of seconds to spin for before sleeping.
+    :vartype spin_duration: float
+    :var sleep_interval: the number of seconds to sleep for once spinning has ended.
+    :vartype sleep_interval: float
+    """
+
+    def __init__(
+        self, spin_duration: float = 0.002, sleep_interval: float = 0.005
+    ) -> None:
+        super().__init__()
+        self.spin_duration = spin_duration
+        self.sleep_interval = sleep_interval
+        self._spin_started: Optional[float] = None
+
+    def frame_received(
+        self,
+        frame_info: Union[tutk.FrameInfoStruct, tutk.FrameInfo3Struct],
+        now: Optional[float] = None,
+    ) -> None:
+        self._spin_started = None
+
+    def next_delay(self) -> float:
+        now = time.monotonic()
+        if self._spin_started is None:
+            self._spin_started = now
+        if now - self._spin_started < self.spin_duration:
+            return 0.0
+        return self.sleep_interval
+
+
+class AdaptiveWaitPolicy(WaitPolicy):
+    """
+    Uses the framerate reported by the camera to predict when the next frame will
+    arrive, and sleeps until just before then.  If the frame is late, polls again
+    with an exponentially increasing delay: capped at a fraction of the frame
+    interval while the stream is live, and at `max_delay` once the camera has gone
+    quiet, so that an idle camera costs almost nothing.
+
+    :var min_delay: the shortest delay between polls, in seconds.
+    :vartype min_delay: float
+    :var max_delay: the longest delay between polls, in seconds.
+    :vartype max_delay: float
+    :var early: how early to wake up before a frame is due, as a fraction of the
+                frame interval.
+    :vartype early: float
+    :var framerate: the most recent framerate reported by the camera.
+    :vartype framerate: int
+    """
+
+    def __init__(
+        self,
+        min_delay: float = 0.001,
+        max_delay: float = 0.1,
+        early: float = 0.25,
+        default_framerate: int = 20,
+    ) -> None:
+        super().__init__()
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.early = early
+        self.framerate = default_framerate
+        self.last_frame_time: Optional[float] = None
+        self._backoff = 0
+        self._predicted = False
+
+    def frame_received(
+        self,
+        frame_info: Union[tutk.FrameInfoStruct, tutk.FrameInfo3Struct],
+        now: Optional[float] = None,
+    ) -> None:
+        if frame_info.framerate > 0:
+            self.framerate = frame_info.framerate
+        self.last_frame_time = time.monotonic() if now is None else now
+        self._backoff = 0
+        self._predicted = False
+
+    def next_delay(self) -> float:
+        now = time.monotonic()
+        interval = 1.0 / self.framerate
+
+        if not self._predicted and self.last_frame_time is not None:
+            self._predicted = True
+            due = self.last_frame_time + interval * (1 - self.early)
+            if due - now > self.min_delay:
+                return min(due - now, self.max_delay)
+
+        delay = self.min_delay * (1 << self._backoff)
+        if delay < self.max_delay:
+            self._backoff += 1
+
+        live = (
+            self.last_frame_time is not None
+            and now - self.last_frame_time < 2 * interval
+        )
+        limit = (
+            max(interval * self.early, self.min_delay)
+            if live
+            else self.max_delay
+        )
+        return min(delay, limit)